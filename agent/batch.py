@@ -0,0 +1,156 @@
+import asyncio
+import contextvars
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterable, Iterator, Optional
+
+from agent import tracing
+from tools.polygon import ratelimit
+
+# Fields a JSONL record may carry its id and question in, most specific first
+ID_FIELDS = ("id", "query_id", "request_id")
+QUERY_FIELDS = ("user_query", "query", "question", "body")
+
+NUMBERED = re.compile(r"\s*(\d+)\.\s+(.*\S)")
+
+
+def read_queries(path: str) -> Iterator[tuple[str, str]]:
+    """(id, query) pairs from a JSONL file, a text file or stdin ("-").
+
+    JSONL records take their id and question from the first of ID_FIELDS/QUERY_FIELDS
+    present. In text input, numbered lines ("3. What was ...") are the queries when
+    there are any, as in user_queries_examples.txt; otherwise every non-empty line is
+    one, keyed by line number.
+    """
+    lines = sys.stdin.read().splitlines() if path == "-" else open(path, "r").read().splitlines()
+    records = [line for line in lines if line.strip()]
+    if records and all(line.lstrip().startswith("{") for line in records):
+        for number, line in enumerate(records, 1):
+            record = json.loads(line)
+            key = next((str(record[f]) for f in ID_FIELDS if record.get(f) is not None), str(number))
+            query = next((record[f] for f in QUERY_FIELDS if record.get(f)), None)
+            if query:
+                yield key, query
+        return
+
+    numbered = [NUMBERED.match(line) for line in lines]
+    if any(numbered):
+        for match in numbered:
+            if match:
+                yield match.group(1), match.group(2)
+        return
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            yield str(number), line.strip()
+
+
+def completed_ids(path: str) -> set[str]:
+    """Ids already answered without error in a previous run's output."""
+    done = set()
+    if path == "-" or not os.path.exists(path):
+        return done
+    with open(path, "r") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            if not isinstance(record, dict) or record.get("id") is None:
+                continue
+            if not record.get("error"):
+                done.add(record["id"])
+    return done
+
+
+def _ends_mid_line(path: str) -> bool:
+    with open(path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        if not file.tell():
+            return False
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) != b"\n"
+
+
+async def run_batch(chain, queries: Iterable[tuple[str, str]], concurrency: int = 4) -> AsyncIterator[dict]:
+    """Run queries through the graph, at most `concurrency` at a time, yielding results as they finish."""
+    # Graph nodes are sync, so each query runs the graph in a thread of this batch's own pool
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def invoke(query: str) -> dict:
+        # Batch work takes the Polygon quota interactive queries leave spare
+        with ratelimit.scope(ratelimit.BATCH):
+            return chain.invoke({"user_query": query})
+
+    async def run(key: str, query: str) -> dict:
+        start = time.perf_counter()
+        try:
+            state = await loop.run_in_executor(executor, contextvars.copy_context().run, invoke, query)
+        except Exception as e:
+            return {"id": key, "query": query, "error": f"{type(e).__name__}: {e}",
+                    "seconds": round(time.perf_counter() - start, 3)}
+        result = {
+            "id": key,
+            "query": query,
+            "route": state.get("route"),
+            "output": state.get("output"),
+            "tool_calls": [
+                {"name": tc["name"], "args": tc["args"], **({"error": tc["validation_error"]} if tc.get("validation_error") else {})}
+                for tc in state.get("tool_calls") or []
+            ],
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        if state.get("trace"):
+            result["trace"] = tracing.finish(state["trace"])
+        return result
+
+    pending = set()
+    try:
+        for key, query in queries:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            pending.add(asyncio.ensure_future(run(key, query)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # The consumer stopped early: drop queries still running and free the pool
+        for task in pending:
+            task.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def write_batch(chain, path: str, output: str = "-", concurrency: int = 4, resume: bool = False,
+                      on_result: Optional[Callable[[dict], None]] = None) -> dict:
+    """Stream batch results to `output` as JSONL, one flushed line per query; returns a summary."""
+    skip = completed_ids(output) if resume else set()
+    queries = list(read_queries(path))
+    skipped = sum(key in skip for key, _ in queries)
+    queries = [(key, query) for key, query in queries if key not in skip]
+    file = sys.stdout if output == "-" else open(output, "a" if resume else "w")
+    if resume and file is not sys.stdout and _ends_mid_line(output):
+        # Finish the line an interrupted run cut short, so the next record starts its own
+        file.write("\n")
+    summary = {"queries": len(queries), "skipped": skipped, "errors": 0}
+    start = time.perf_counter()
+    try:
+        async for result in run_batch(chain, queries, concurrency):
+            file.write(json.dumps(result, default=str) + "\n")
+            file.flush()
+            summary["errors"] += 1 if result.get("error") else 0
+            if on_result:
+                on_result(result)
+    finally:
+        if file is not sys.stdout:
+            file.close()
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    summary["queries_per_second"] = round(len(queries) / summary["seconds"], 3) if summary["seconds"] else 0.0
+    return summary
@@ -0,0 +1,178 @@
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from tools.router import ToolRouter, tokenize, tool_document
+from tools.shaping import shape_output
+
+# Words that carry no routing signal beyond what the tool schema already explains
+FILLER = {
+    "about", "help", "tell", "give", "need", "want", "know", "let", "like", "would", "now", "right",
+    "latest", "last", "current", "recent", "number", "calculate", "much", "result", "stock", "share",
+}
+
+# Answer templates by tool; {result} is the shaped tool output, other fields are the args
+TEMPLATES = {
+    "multiply": "{a} multiplied by {b} is {result}.",
+    "current_time": "The current time is {result}.",
+}
+
+NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+SYMBOL = re.compile(r"\b[A-Z][A-Z0-9]*\b")
+
+
+def _schema(prop: dict) -> dict:
+    # Optional pydantic fields come through as anyOf [<type>, null]
+    for option in prop.get("anyOf", []):
+        if option.get("type") != "null":
+            return {**option, **{k: v for k, v in prop.items() if k != "anyOf"}}
+    return prop
+
+
+@dataclass
+class FastPathStats:
+    hits: int = 0
+    fallbacks: int = 0
+    fast_seconds: float = 0.0
+    graph_seconds: float = 0.0
+    per_tool: dict = field(default_factory=dict)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.fallbacks
+        return self.hits / total if total else 0.0
+
+    @property
+    def seconds_saved(self) -> float:
+        """Estimated latency saved: each hit would otherwise have cost an average graph run."""
+        if not self.hits or not self.fallbacks:
+            return 0.0
+        return self.hits * (self.graph_seconds / self.fallbacks - self.fast_seconds / self.hits)
+
+    def as_dict(self) -> dict:
+        return {"hits": self.hits, "fallbacks": self.fallbacks, "hit_rate": round(self.hit_rate, 3),
+                "seconds_saved": round(self.seconds_saved, 3), "per_tool": dict(self.per_tool)}
+
+
+class FastPath:
+    """Answers trivially-routable queries without the LLM.
+
+    Routing and argument extraction are derived from the tool schemas: the top BM25
+    tool must clearly beat the runner-up, every query word has to be explained by
+    that tool's schema or an extracted argument, and every required argument has
+    to be extracted unambiguously (numbers by type, symbols by pattern). Anything
+    else is left to the graph.
+    """
+
+    def __init__(self, registry, router: Optional[ToolRouter] = None, min_score: float = 1.0, margin: float = 2.0):
+        self.registry = registry
+        self.router = router or ToolRouter(registry.specs())
+        self.min_score = min_score
+        self.margin = margin
+        self.stats = FastPathStats()
+        self._lock = threading.Lock()
+        self._vocabulary = {
+            name: set(tokenize(tool_document(registry.spec(name)["function"]))) | FILLER
+            for name in registry.names()
+        }
+
+    def match(self, query: str) -> Optional[dict]:
+        """The tool call for a high-confidence query, or None to fall back to the graph."""
+        ranked = self.router.rank(query)
+        if not ranked or ranked[0][1] < self.min_score:
+            return None
+        if len(ranked) > 1 and ranked[0][1] < self.margin * ranked[1][1]:
+            return None
+        name = ranked[0][0]
+        args, consumed = self._extract(query, self.registry.spec(name)["function"]["parameters"])
+        if args is None:
+            return None
+
+        remaining = query
+        for value in consumed:
+            remaining = remaining.replace(value, " ", 1)
+        if NUMBER.search(remaining):
+            return None
+        if any(token not in self._vocabulary[name] for token in tokenize(remaining)):
+            return None
+        return {"name": name, "args": args, "id": "fast_path", "type": "tool_call"}
+
+    def _extract(self, query: str, parameters: dict) -> tuple[Optional[dict], list[str]]:
+        args, consumed = {}, []
+        required = set(parameters.get("required", []))
+        numbers = NUMBER.findall(query)
+        numeric = [name for name, prop in parameters.get("properties", {}).items()
+                   if name in required and _schema(prop).get("type") in ("integer", "number")]
+        if numeric and len(numbers) != len(numeric):
+            return None, []
+        for name, value in zip(numeric, numbers):
+            if _schema(parameters["properties"][name])["type"] == "integer":
+                if "." in value:
+                    return None, []
+                args[name] = int(value)
+            else:
+                args[name] = float(value)
+            consumed.append(value)
+
+        for name, prop in parameters.get("properties", {}).items():
+            prop = _schema(prop)
+            if name in args or prop.get("type") != "string":
+                continue
+            value = self._extract_string(query, prop)
+            if value is None:
+                if name in required:
+                    return None, []
+                continue
+            args[name], matched = value
+            consumed.append(matched)
+        return args, consumed
+
+    def _extract_string(self, query: str, prop: dict) -> Optional[tuple[str, str]]:
+        if prop.get("enum"):
+            found = [value for value in prop["enum"] if re.search(rf"\b{re.escape(value)}\b", query, re.IGNORECASE)]
+            return (found[0], found[0]) if len(found) == 1 else None
+        if not prop.get("pattern"):
+            return None
+        pattern = re.compile(prop["pattern"])
+        lo, hi = prop.get("minLength", 1), prop.get("maxLength", 10)
+        symbols = {s for s in SYMBOL.findall(query) if pattern.fullmatch(s) and lo <= len(s) <= hi and len(s) > 1}
+        if len(symbols) == 1:
+            symbol = symbols.pop()
+            return symbol, symbol
+        if symbols or "ticker" not in (prop.get("description") or "").lower():
+            return None
+        # No symbol given: accept a capitalised word that exactly names one company
+        from tools.polygon.ticker_index import get_index
+        index = get_index()
+        resolved = set()
+        for word in re.findall(r"\b[A-Z][a-z]+\b", query):
+            rows = [row for row in index.exact(word) if row["active"] and row["ticker"] != word.upper()]
+            if len(rows) == 1:
+                resolved.add((rows[0]["ticker"], word))
+        return resolved.pop() if len(resolved) == 1 else None
+
+    def answer(self, query: str) -> Optional[dict]:
+        """Run the matched tool and template its answer; None when the query needs the graph."""
+        start = time.perf_counter()
+        tool_call = self.match(query)
+        if tool_call is None:
+            return None
+        tool = self.registry.get(tool_call["name"])
+        try:
+            result = shape_output(tool.name, tool.invoke(tool_call["args"]))
+        except Exception:
+            return None
+        template = TEMPLATES.get(tool.name, "Here is the {tool} result:\n{result}")
+        output = template.format(tool=tool.name, result=result, **tool_call["args"])
+        with self._lock:
+            self.stats.hits += 1
+            self.stats.fast_seconds += time.perf_counter() - start
+            self.stats.per_tool[tool.name] = self.stats.per_tool.get(tool.name, 0) + 1
+        return {"tool_calls": [tool_call], "output": output}
+
+    def record_fallback(self, seconds: float):
+        with self._lock:
+            self.stats.fallbacks += 1
+            self.stats.graph_seconds += seconds
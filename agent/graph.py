@@ -0,0 +1,170 @@
+import os
+from typing import Any, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import get_executor_for_config
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+from agent.fast_path import FastPath
+from agent.planner import PlanExecutor, has_reference, plan_prompt
+from agent.tracing import traced_node
+from agent.validation import ArgumentValidator
+from tools.registry import ToolRegistry
+from tools.router import ToolRouter
+from tools.shaping import shape_output
+
+# Only the tools relevant to a query get bound, so prompt size doesn't grow with the catalog
+TOOL_TOP_K = int(os.getenv("TOOL_TOP_K", "3"))
+
+# Tools a session keeps bound across turns before starting over from the routed ones
+SESSION_TOOLS = int(os.getenv("SESSION_TOOLS", "6"))
+
+# Schema-derived pre-router answering trivially-routable queries without the LLM
+FAST_PATH = os.getenv("FAST_PATH", "true").lower() == "true"
+
+
+# Graph state
+class State(TypedDict):
+    user_query: str
+    # Earlier turns of the conversation, from agent.session.Session
+    history: list
+    tool_names: list
+    tool_calls: list
+    tool_messages: list
+    output: str
+    route: str
+    # agent.tracing.Trace, only when tracing is enabled
+    trace: Any
+
+
+def normalize_tool_args(tool_call: dict) -> dict:
+    # The model often passes a company name or a misspelt symbol as the ticker
+    ticker = tool_call['args'].get('ticker')
+    if isinstance(ticker, str) and not has_reference(ticker):
+        # Local name -> symbol index, filled by `python -m tools.polygon.ticker_index`
+        from tools.polygon.ticker_index import get_index
+        tool_call['args'] = {**tool_call['args'], 'ticker': get_index().normalize_ticker(ticker)}
+    return tool_call
+
+
+class QueryAgent:
+    """The query graph around one chat model: fast path, tool selection, argument
+    validation, tool execution, then answer synthesis.
+
+    main.py builds it around Ollama; the benchmark builds it around a scripted model.
+    """
+
+    def __init__(self, llm: BaseChatModel, registry: Optional[ToolRegistry] = None,
+                 top_k: int = TOOL_TOP_K, use_fast_path: bool = FAST_PATH):
+        self.llm = llm
+        # Tools are discovered from a cached manifest and imported on first use
+        self.registry = registry or ToolRegistry()
+        self.top_k = top_k
+        self.use_fast_path = use_fast_path
+        self.tool_router = ToolRouter(self.registry.specs())
+        self.fast_path = FastPath(self.registry, self.tool_router)
+        # Schema and lexical checks first; the LLM only sees arguments those can't settle
+        self.validator = ArgumentValidator(self.registry, llm)
+        self.chain = self.build()
+
+    # Nodes
+    def try_fast_path(self, state: State):
+        result = self.fast_path.answer(state['user_query']) if self.use_fast_path else None
+        return {**result, "route": "fast_path"} if result else {"route": "graph"}
+
+    def route_after_fast_path(self, state: State):
+        return END if state['route'] == "fast_path" else "select_tools"
+
+    def prompt(self, state: State) -> list:
+        """System prompt, then the conversation so far, then the question.
+
+        Tool selection and synthesis both start with this, bound to the same tools, so
+        the model server can reuse the prefill of one for the other and for the next turn.
+        """
+        # One turn plans every call, with later calls referring to earlier results
+        return [SystemMessage(plan_prompt), *(state.get('history') or []), HumanMessage(state['user_query'])]
+
+    def select_tools(self, state: State):
+        routed = self.tool_router.select_names(state['user_query'], k=self.top_k)
+        # In a session, last turn's tools stay bound and in place, so follow-ups ("and for
+        # Meta?") can still call them and the schemas heading the prompt don't change
+        kept = [name for name in state.get('tool_names') or [] if name in self.tool_router.tools]
+        names = kept + [name for name in routed if name not in kept]
+        if len(names) > SESSION_TOOLS:
+            names = routed
+        msg = self.llm.bind_tools([self.registry.spec(name) for name in names]).invoke(self.prompt(state))
+        return {"tool_names": names, "tool_calls": msg.tool_calls}
+
+    def validate_tool_inputs(self, state: State):
+        tool_calls = [normalize_tool_args(tool_call.copy()) for tool_call in state['tool_calls']]
+        # Arguments may come from earlier questions of the conversation too
+        asked = [str(message.content) for message in state.get('history') or [] if isinstance(message, HumanMessage)]
+        return {"tool_calls": self.validator.validate("\n".join([*asked, state['user_query']]), tool_calls)}
+
+    def run_tool_call(self, tool_call: dict) -> tuple[Any, bool]:
+        """The call's raw output, or an error message, and whether it succeeded."""
+        tool = self.registry.get(tool_call['name'].lower())
+        if tool_call.get('validation_error'):
+            # Rejected calls don't run; the model gets to explain what's missing instead
+            return tool_call['validation_error'], False
+        if tool is None:
+            return f"Unknown tool: {tool_call['name']}", False
+        try:
+            return tool.invoke(tool_call['args']), True
+        except Exception as e:
+            # One failing call shouldn't sink the others running alongside it
+            return f"Error: {e}", False
+
+    def execute_tool_call(self, state: State, config: RunnableConfig):
+        # Independent calls run concurrently; dependent ones as soon as their inputs are in
+        with get_executor_for_config(config) as executor:
+            results = PlanExecutor(self.run_tool_call, executor).execute(state['tool_calls'])
+        tool_msgs = [
+            # Raw results are compacted before the model has to read them
+            ToolMessage(shape_output(tool_call['name'].lower(), output) if error is None else error,
+                        tool_call_id=tool_call['id'], name=tool_call['name'], status="success" if error is None else "error")
+            for tool_call, output, error in results
+        ]
+        # Calls with their references filled in, so the answer sees the arguments actually used
+        return {"tool_calls": [tool_call for tool_call, _, _ in results], "tool_messages": tool_msgs}
+
+    def synthesize(self, state: State):
+        # Plain tool calls: drop validation metadata before they go back to the model
+        tool_calls = [
+            {"name": tc['name'], "args": tc['args'], "id": tc['id'], "type": "tool_call"}
+            for tc in state['tool_calls']
+        ]
+        messages = [
+            *self.prompt(state),
+            AIMessage(content="", tool_calls=tool_calls),
+            *state['tool_messages'],
+        ]
+        # Its own node, so streaming callers know tool results are in before answer tokens start
+        tools = [self.registry.spec(name) for name in state['tool_names']]
+        result_msg = self.llm.bind_tools(tools).invoke(messages)
+
+        return {"output": result_msg.content}
+
+    def build(self):
+        workflow = StateGraph(State)
+        workflow.add_node("fast_path", traced_node("fast_path", self.try_fast_path))
+        workflow.add_edge(START, "fast_path")
+
+        workflow.add_node("select_tools", traced_node("select_tools", self.select_tools))
+        workflow.add_conditional_edges("fast_path", self.route_after_fast_path, ["select_tools", END])
+
+        workflow.add_node("validate_tool_inputs", traced_node("validate_tool_inputs", self.validate_tool_inputs))
+        workflow.add_edge("select_tools", "validate_tool_inputs")
+
+        workflow.add_node("execute_tool_call", traced_node("execute_tool_call", self.execute_tool_call))
+        workflow.add_edge("validate_tool_inputs", "execute_tool_call")
+
+        workflow.add_node("synthesize", traced_node("synthesize", self.synthesize))
+        workflow.add_edge("execute_tool_call", "synthesize")
+
+        workflow.add_edge("synthesize", END)
+
+        return workflow.compile()
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import warnings
+from collections import defaultdict
+from typing import Any, Optional
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.runnables.config import var_child_runnable_config
+
+from agent.tracing import record_cache
+
+# Deserializing cached generations goes through langchain's beta loader on every hit
+warnings.filterwarnings("ignore", message=".*`loads` is in beta.*", category=LangChainBetaWarning)
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+
+# Near-duplicate lookups are opt-in: a looser key can only ever return a wrong answer more often
+NEAR_DUPLICATES = os.getenv("LLM_CACHE_NEAR_DUPLICATES", "false").lower() == "true"
+
+# Numbers whole, sign and decimals included ("-2" isn't "2"), words, and arithmetic operators
+LOOSE_TOKEN = re.compile(r"[-+]?\d+(?:[.,]\d+)*|\w+|[-+*/^%=<>]")
+
+# Per-call identifiers that differ between otherwise identical prompts
+VOLATILE_KEYS = {"id", "tool_call_id", "run_id"}
+
+
+def _strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if not (k in VOLATILE_KEYS and isinstance(v, str))}
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+def _texts(value: Any) -> list[str]:
+    if isinstance(value, dict):
+        texts = [value["content"]] if isinstance(value.get("content"), str) else []
+        return texts + [text for k, v in value.items() if k != "content" for text in _texts(v)]
+    if isinstance(value, list):
+        return [text for v in value for text in _texts(v)]
+    return []
+
+
+def cache_keys(prompt: str, llm_string: str) -> tuple[str, str]:
+    """Exact and near-duplicate keys for a serialized prompt.
+
+    llm_string already covers the model, temperature and bound tool schemas. The exact
+    key also covers the prompt minus per-run ids; the near-duplicate key only its
+    message text, lowercased with punctuation and extra whitespace removed. Numbers
+    stay whole with their sign and decimal point, and operators stay, so questions
+    differing in a number never share a key.
+    """
+    try:
+        parsed = json.loads(prompt)
+    except ValueError:
+        parsed = prompt
+    exact = json.dumps(_strip_volatile(parsed), sort_keys=True)
+    text = parsed if isinstance(parsed, str) else " ".join(_texts(parsed))
+    loose = " ".join(LOOSE_TOKEN.findall(text.lower()))
+    return (
+        hashlib.sha256(f"{llm_string}\n{exact}".encode()).hexdigest(),
+        hashlib.sha256(f"{llm_string}\n{loose}".encode()).hexdigest(),
+    )
+
+
+def current_node() -> str:
+    """Graph node the current LLM call runs in, from LangGraph's run metadata."""
+    config = var_child_runnable_config.get() or {}
+    return config.get("metadata", {}).get("langgraph_node", "other")
+
+
+class PersistentLLMCache(BaseCache):
+    """SQLite-backed LLM response cache with LRU eviction by size and per-node hit stats.
+
+    Lookups try the exact key first and, when near_duplicates is on, fall back to a
+    key that ignores case, punctuation and spacing in the message text.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = 256 * 1024 * 1024, near_duplicates: bool = NEAR_DUPLICATES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.near_duplicates = near_duplicates
+        self.stats = defaultdict(lambda: {"hits": 0, "near_hits": 0, "misses": 0})
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS generations (
+                key TEXT PRIMARY KEY, near_key TEXT, value TEXT, size INTEGER, last_used REAL);
+            CREATE INDEX IF NOT EXISTS generations_near_key ON generations (near_key);
+            CREATE INDEX IF NOT EXISTS generations_last_used ON generations (last_used);
+        """)
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM generations").fetchone()[0]
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key, near_key = cache_keys(prompt, llm_string)
+        node = current_node()
+        with self._lock:
+            row = self._db.execute("SELECT key, value FROM generations WHERE key = ?", (key,)).fetchone()
+            kind = "hits"
+            if row is None and self.near_duplicates:
+                row = self._db.execute(
+                    "SELECT key, value FROM generations WHERE near_key = ? ORDER BY last_used DESC LIMIT 1", (near_key,)
+                ).fetchone()
+                kind = "near_hits"
+            if row is None:
+                self.stats[node]["misses"] += 1
+                record_cache("llm", "miss")
+                return None
+            self._db.execute("UPDATE generations SET last_used = ? WHERE key = ?", (time.time(), row[0]))
+            self._db.commit()
+            self.stats[node][kind] += 1
+        record_cache("llm", "hit" if kind == "hits" else "near_hit")
+        return loads(row[1])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key, near_key = cache_keys(prompt, llm_string)
+        value = dumps(list(return_val))
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM generations WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO generations VALUES (?, ?, ?, ?, ?)",
+                (key, near_key, value, len(value), time.time()),
+            )
+            self._size += len(value) - (previous[0] if previous else 0)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            row = self._db.execute("SELECT key, size FROM generations ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM generations WHERE key = ?", (row[0],))
+            self._size -= row[1]
+            self.evictions += 1
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM generations")
+            self._db.commit()
+            self._size = 0
+
+    def stats_dict(self) -> dict:
+        nodes = {}
+        for node, counts in self.stats.items():
+            total = counts["hits"] + counts["near_hits"] + counts["misses"]
+            hit_rate = (counts["hits"] + counts["near_hits"]) / total if total else 0.0
+            nodes[node] = {**counts, "hit_rate": round(hit_rate, 3)}
+        return {"nodes": nodes, "evictions": self.evictions, "bytes": self._size}
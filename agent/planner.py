@@ -0,0 +1,181 @@
+import re
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from typing import Any, Callable, Optional
+
+from tools.shaping import _decode
+
+plan_prompt = """
+Answer with every tool call the question needs, all at once. When a call needs the
+result of another call, don't wait for it: pass "$N" as the argument value for the
+whole result of your N-th call (counting from 1), or "$N.field" for one field of it,
+e.g. "$1.date" or "$2.results.0.close". Calls run in dependency order, independent
+ones in parallel.
+"""
+
+# "$2" or "$2.results.0.close" as a whole argument value, or "${2.date}" inside a longer string
+REFERENCE = re.compile(r"^\$(\d+)((?:\.[\w-]+)*)$")
+EMBEDDED = re.compile(r"\$\{(\d+)((?:\.[\w-]+)*)\}")
+
+
+class PlanError(ValueError):
+    """A plan whose references point nowhere or go round in a circle."""
+
+
+def _references(value: Any) -> set[int]:
+    """1-based steps an argument value refers to."""
+    if isinstance(value, str):
+        match = REFERENCE.match(value.strip())
+        if match:
+            return {int(match.group(1))}
+        return {int(step) for step, _ in EMBEDDED.findall(value)}
+    if isinstance(value, list):
+        return set().union(*map(_references, value)) if value else set()
+    if isinstance(value, dict):
+        return set().union(*map(_references, value.values())) if value else set()
+    return set()
+
+
+def has_reference(value: Any) -> bool:
+    return bool(_references(value))
+
+
+def _reachable(start: int, deps: dict[int, set[int]]) -> set[int]:
+    seen, stack = set(), list(deps[start])
+    while stack:
+        index = stack.pop()
+        if index not in seen:
+            seen.add(index)
+            stack.extend(deps[index])
+    return seen
+
+
+def check(tool_calls: list[dict]) -> tuple[list[set[int]], dict[int, str]]:
+    """The 0-based steps each call waits for, and the error of each call whose own references are bad.
+
+    A call referring to a step that isn't another call of the plan, or that is part of
+    a circle of references, is bad; calls that only depend on a bad call aren't.
+    """
+    deps, errors = [], {}
+    for index, tool_call in enumerate(tool_calls):
+        steps = _references(tool_call.get("args") or {})
+        dangling = sorted(step for step in steps if not 1 <= step <= len(tool_calls) or step == index + 1)
+        if dangling:
+            errors[index] = f"{tool_call['name']} refers to step ${dangling[0]}, which isn't another call of the plan"
+        deps.append({step - 1 for step in steps if step not in dangling})
+
+    # Kahn's algorithm, only to find cycles; execution order is decided as results arrive
+    remaining = {index: d - errors.keys() for index, d in enumerate(deps) if index not in errors}
+    while remaining:
+        ready = [index for index, d in remaining.items() if not d]
+        if not ready:
+            # What's left is on a cycle or waits for one; only the calls on it are bad
+            reach = {index: _reachable(index, remaining) for index in remaining}
+            for index in remaining:
+                if index in reach[index]:
+                    cycle = sorted(other for other in reach[index] if index in reach[other])
+                    names = ", ".join(tool_calls[other]["name"] for other in cycle)
+                    errors[index] = f"Circular references between {names}"
+            break
+        for index in ready:
+            del remaining[index]
+        for d in remaining.values():
+            d.difference_update(ready)
+    return deps, errors
+
+
+def dependencies(tool_calls: list[dict]) -> list[set[int]]:
+    """The 0-based steps each call waits for; raises PlanError for dangling or circular references."""
+    deps, errors = check(tool_calls)
+    if errors:
+        raise PlanError(errors[min(errors)])
+    return deps
+
+
+def _lookup(data: Any, path: str) -> Any:
+    for key in path.split(".") if path else []:
+        if isinstance(data, dict) and key in data:
+            data = data[key]
+        elif isinstance(data, list) and key.lstrip("-").isdigit() and -len(data) <= int(key) < len(data):
+            data = data[int(key)]
+        else:
+            raise PlanError(f"No field {path!r} in the result it refers to")
+    return data
+
+
+def resolve(value: Any, outputs: dict[int, Any]) -> Any:
+    """An argument value with references replaced by the 0-based-indexed outputs they point to.
+
+    A whole-value reference keeps the referenced value's type; references embedded in
+    a longer string are formatted into it.
+    """
+    if isinstance(value, str):
+        match = REFERENCE.match(value.strip())
+        if match:
+            return _lookup(_decode(outputs[int(match.group(1)) - 1]), match.group(2)[1:])
+        return EMBEDDED.sub(lambda m: str(_lookup(_decode(outputs[int(m.group(1)) - 1]), m.group(2)[1:])), value)
+    if isinstance(value, list):
+        return [resolve(item, outputs) for item in value]
+    if isinstance(value, dict):
+        return {key: resolve(item, outputs) for key, item in value.items()}
+    return value
+
+
+class PlanExecutor:
+    """Runs a plan of tool calls as a DAG.
+
+    `run(tool_call)` executes one call and returns (raw output, ok). A call starts as
+    soon as the calls it refers to have finished, running in parallel with whatever
+    else is ready, with their raw outputs substituted into its arguments. A call whose
+    dependency failed isn't run, and neither is one with dangling or circular
+    references; the rest of the plan still is. No model is consulted between steps.
+    """
+
+    def __init__(self, run: Callable[[dict], tuple[Any, bool]], executor: Executor):
+        self.run = run
+        self.executor = executor
+
+    def execute(self, tool_calls: list[dict]) -> list[tuple[dict, Any, Optional[str]]]:
+        """(call with resolved arguments, raw output, error) per call, in plan order."""
+        results: list[Optional[tuple[dict, Any, Optional[str]]]] = [None] * len(tool_calls)
+        deps, errors = check(tool_calls)
+        for index, error in errors.items():
+            results[index] = (tool_calls[index], None, error)
+
+        outputs, pending, waiting = {}, {}, set(range(len(tool_calls))) - errors.keys()
+
+        def submit_ready():
+            # Skipping a call can settle the calls waiting on it, hence the loop
+            progressed = True
+            while progressed:
+                progressed = False
+                for index in sorted(waiting):
+                    if any(results[step] is None for step in deps[index]):
+                        continue
+                    waiting.discard(index)
+                    progressed = True
+                    failed = [step for step in sorted(deps[index]) if results[step][2]]
+                    if failed:
+                        names = ", ".join(f"${step + 1} ({tool_calls[step]['name']})" for step in failed)
+                        results[index] = (tool_calls[index], None, f"Skipped: depends on {names}, which failed")
+                        continue
+                    try:
+                        tool_call = {**tool_calls[index], "args": resolve(tool_calls[index]["args"], outputs)}
+                    except PlanError as e:
+                        results[index] = (tool_calls[index], None, str(e))
+                        continue
+                    pending[self.executor.submit(self.run, tool_call)] = (index, tool_call)
+
+        submit_ready()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, tool_call = pending.pop(future)
+                try:
+                    output, ok = future.result()
+                except Exception as e:
+                    output, ok = f"Error: {e}", False
+                results[index] = (tool_call, output, None if ok else str(output))
+                if ok:
+                    outputs[index] = output
+            submit_ready()
+        return results
@@ -0,0 +1,342 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from contextlib import nullcontext
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from aiohttp import WSMsgType, web
+
+from agent import tracing
+from agent.session import Session
+from agent.streaming import StreamStats, stream_answer
+from tools.polygon import ratelimit
+
+QUEUE_SIZE = int(os.getenv("SERVER_QUEUE_SIZE", "64"))
+WORKERS = int(os.getenv("SERVER_WORKERS", "4"))
+PER_CLIENT = int(os.getenv("SERVER_PER_CLIENT", "2"))
+DEADLINE = float(os.getenv("SERVER_DEADLINE", "60"))
+# Conversations kept in memory; the least recently used one goes first
+SESSIONS = int(os.getenv("SERVER_SESSIONS", "1000"))
+# How long Ollama keeps the model loaded between requests
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+
+class Rejected(Exception):
+    """A request turned away at admission, with the HTTP status and a retry hint."""
+
+    def __init__(self, status: int, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    query: str
+    client: str
+    deadline: float
+    enqueued: float = field(default_factory=time.monotonic)
+    events: asyncio.Queue = field(default_factory=asyncio.Queue)
+    cancelled: bool = False
+    session: Optional[Session] = None
+
+
+class QueryService:
+    """One compiled graph shared by every client, behind a bounded queue.
+
+    Admission fails fast instead of letting latency grow without bound: a client with
+    per_client queries already queued or running gets a 429, and a full queue, or one
+    whose expected wait already exceeds the request's deadline, sheds the request with
+    a 503. Queued requests past their deadline are dropped unrun; running ones are
+    cancelled when it passes (504).
+    """
+
+    def __init__(self, chain, workers: int = WORKERS, queue_size: int = QUEUE_SIZE,
+                 per_client: int = PER_CLIENT, deadline: float = DEADLINE):
+        self.chain = chain
+        self.workers = workers
+        self.per_client = per_client
+        self.deadline = deadline
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.in_flight = defaultdict(int)
+        self.running = 0
+        self.counts = Counter()
+        self.stream_stats = StreamStats()
+        # Moving average of service time, for estimating queue wait at admission
+        self.service_seconds = 1.0
+        self.sessions: OrderedDict = OrderedDict()
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def session(self, client: str, key: str) -> Session:
+        """The client's conversation named key, started on first use."""
+        key = (client, key)
+        if key not in self.sessions:
+            self.sessions[key] = Session()
+            while len(self.sessions) > SESSIONS:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(key)
+        return self.sessions[key]
+
+    def submit(self, query: str, client: str, deadline: Optional[float] = None, session: Optional[str] = None) -> Job:
+        timeout = min(deadline or self.deadline, self.deadline)
+        if self.in_flight.get(client, 0) >= self.per_client:
+            self.counts["rejected"] += 1
+            raise Rejected(429, f"client has {self.in_flight[client]} queries in flight", self.service_seconds)
+        expected_wait = self.queue.qsize() * self.service_seconds / self.workers
+        if self.queue.full() or expected_wait > timeout:
+            self.counts["shed"] += 1
+            raise Rejected(503, "server overloaded", expected_wait)
+        job = Job(query, client, time.monotonic() + timeout, session=self.session(client, session) if session else None)
+        self.queue.put_nowait(job)
+        self.in_flight[client] += 1
+        self.counts["accepted"] += 1
+        return job
+
+    def cancel(self, job: Job):
+        # The client went away; if the job is still queued, don't spend a worker on it
+        job.cancelled = True
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self.in_flight[job.client] -= 1
+                if not self.in_flight[job.client]:
+                    del self.in_flight[job.client]
+                self.queue.task_done()
+
+    async def _run(self, job: Job):
+        waited = time.monotonic() - job.enqueued
+        if job.cancelled:
+            self.counts["cancelled"] += 1
+            return
+        remaining = job.deadline - time.monotonic()
+        if remaining <= 0:
+            self.counts["timed_out"] += 1
+            job.events.put_nowait({"type": "error", "status": 504, "error": "deadline passed while queued"})
+            return
+
+        async def forward():
+            # Another query of the same conversation (another request, or /ws and /query) goes first
+            async with job.session.turn_lock if job.session else nullcontext():
+                async for event in stream_answer(self.chain, job.query, stats=self.stream_stats, session=job.session):
+                    if event["type"] == "answer":
+                        trace = tracing.finish(event.pop("trace"))
+                        event = {**event, "queue_seconds": round(waited, 3), **({"trace": trace} if trace else {})}
+                    job.events.put_nowait(event)
+
+        self.running += 1
+        start = time.monotonic()
+        try:
+            # A tool call that would queue for Polygon quota past the deadline fails straight away
+            with ratelimit.scope(deadline=remaining):
+                await asyncio.wait_for(forward(), remaining)
+            self.counts["completed"] += 1
+        except asyncio.TimeoutError:
+            self.counts["timed_out"] += 1
+            job.events.put_nowait({"type": "error", "status": 504, "error": "deadline exceeded"})
+        except Exception as e:
+            self.counts["failed"] += 1
+            job.events.put_nowait({"type": "error", "status": 500, "error": f"{type(e).__name__}: {e}"})
+        finally:
+            self.running -= 1
+            self.service_seconds = 0.8 * self.service_seconds + 0.2 * (time.monotonic() - start)
+
+    async def events(self, job: Job):
+        """A job's events up to and including its answer or error."""
+        while True:
+            event = await job.events.get()
+            yield event
+            if event["type"] in ("answer", "error"):
+                return
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "running": self.running,
+            "workers": self.workers,
+            "clients": len(self.in_flight),
+            "sessions": len(self.sessions),
+            "service_seconds": round(self.service_seconds, 3),
+            **dict(self.counts),
+            "streaming": self.stream_stats.as_dict(),
+        }
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP agent_queue_depth Queries waiting for a worker.",
+            "# TYPE agent_queue_depth gauge",
+            f"agent_queue_depth {self.queue.qsize()}",
+            "# HELP agent_running Queries being answered.",
+            "# TYPE agent_running gauge",
+            f"agent_running {self.running}",
+            "# HELP agent_requests_total Requests by admission or completion outcome.",
+            "# TYPE agent_requests_total counter",
+        ]
+        lines += [f'agent_requests_total{{outcome="{k}"}} {v}' for k, v in sorted(self.counts.items())]
+        limiter = ratelimit.get_limiter()
+        return ("\n".join(lines) + "\n" + (limiter.prometheus() if limiter else "")
+                + (tracing.metrics.prometheus() if tracing.enabled() else ""))
+
+
+def _client_id(request: web.Request) -> str:
+    return request.headers.get("X-Client-Id") or request.remote or "unknown"
+
+
+async def handle_query(request: web.Request) -> web.Response:
+    service: QueryService = request.app["service"]
+    body = await request.json()
+    if not body.get("query"):
+        return web.json_response({"error": "query is required"}, status=400)
+    try:
+        job = service.submit(body["query"], _client_id(request), body.get("deadline"), body.get("session"))
+    except Rejected as e:
+        return web.json_response({"error": e.reason}, status=e.status,
+                                 headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    try:
+        async for event in service.events(job):
+            if event["type"] == "answer":
+                return web.json_response({k: v for k, v in event.items() if k != "type"})
+            if event["type"] == "error":
+                return web.json_response({"error": event["error"]}, status=event["status"])
+    finally:
+        service.cancel(job)
+
+
+async def handle_ws(request: web.Request) -> web.WebSocketResponse:
+    """Each message {"query", "id"?, "deadline"?, "session"?} streams back progress, tokens and the answer, tagged with its id."""
+    service: QueryService = request.app["service"]
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    client = _client_id(request)
+    tasks = set()
+
+    async def answer(message: dict):
+        key = message.get("id")
+        try:
+            job = service.submit(message["query"], client, message.get("deadline"), message.get("session"))
+        except Rejected as e:
+            await ws.send_json({"id": key, "type": "error", "status": e.status, "error": e.reason, "retry_after": e.retry_after})
+            return
+        try:
+            async for event in service.events(job):
+                await ws.send_json({"id": key, **event}, dumps=lambda data: json.dumps(data, default=str))
+        finally:
+            service.cancel(job)
+
+    async for msg in ws:
+        if msg.type != WSMsgType.TEXT:
+            continue
+        try:
+            message = json.loads(msg.data)
+            message["query"]
+        except (ValueError, KeyError, TypeError):
+            await ws.send_json({"type": "error", "status": 400, "error": "expected {\"query\": ...}"})
+            continue
+        task = asyncio.ensure_future(answer(message))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    for task in tasks:
+        task.cancel()
+    return ws
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", **request.app["service"].stats()})
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=request.app["service"].prometheus(), content_type="text/plain")
+
+
+async def warm_up(agent):
+    """Load everything the first request would otherwise pay for: tool modules and
+    instances, the ticker index and the model itself."""
+    from tools.polygon.ticker_index import get_index
+
+    for name in agent.registry.names():
+        agent.registry.get(name)
+    get_index()
+    # One uncached, one-token completion makes Ollama load the weights (kept for KEEP_ALIVE)
+    update = {"cache": False, **({"num_predict": 1} if "num_predict" in type(agent.llm).model_fields else {})}
+    await agent.llm.model_copy(update=update).ainvoke("Reply with OK.")
+
+
+def create_app(agent, workers: int = WORKERS, queue_size: int = QUEUE_SIZE,
+               per_client: int = PER_CLIENT, deadline: float = DEADLINE, warm: bool = True) -> web.Application:
+    app = web.Application()
+    service = QueryService(agent.chain, workers, queue_size, per_client, deadline)
+    app["service"] = service
+    app["agent"] = agent
+
+    async def on_startup(app):
+        # Sync graph nodes run in the default executor; give every worker room for its node
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=workers * 2))
+        if warm:
+            await warm_up(agent)
+        service.start()
+
+    async def on_cleanup(app):
+        await service.stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/query", handle_query)
+    app.router.add_get("/ws", handle_ws)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the query graph over HTTP and WebSocket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Queries answered at once")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Queries waiting beyond that before shedding")
+    parser.add_argument("--per-client", type=int, default=PER_CLIENT, help="Queries one client may have queued or running")
+    parser.add_argument("--deadline", type=float, default=DEADLINE, help="Longest a query may take, queueing included")
+    parser.add_argument("--mock", action="store_true", help="Scripted model and local mock Polygon, no Ollama or API key")
+    parser.add_argument("-t", "--trace", action="store_true", help="Record traces; /metrics includes them")
+    args = parser.parse_args()
+
+    if args.trace or tracing.TRACING:
+        tracing.enable()
+
+    if args.mock:
+        from benchmark.mock_polygon import MockPolygon
+        from benchmark.run import mock_agent
+        mock = MockPolygon(latency=0.05).start()
+        agent, _ = mock_agent(mock, tempfile.mkdtemp(), polygon_cache=True, prefill_delay=0.2, token_delay=0.02)
+    else:
+        from dotenv import load_dotenv
+        from langchain_ollama import ChatOllama
+
+        from agent.graph import QueryAgent
+        load_dotenv()
+        agent = QueryAgent(ChatOllama(model='llama3.2', temperature=0, keep_alive=KEEP_ALIVE))
+
+    app = create_app(agent, args.workers, args.queue_size, args.per_client, args.deadline)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import threading
+from dataclasses import dataclass, field
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from tools.shaping import _fit_text, estimate_tokens
+
+# Rough token budget for the whole history in front of a new question
+HISTORY_TOKENS = int(os.getenv("HISTORY_TOKENS", "3000"))
+# Tool output of earlier turns allowed before it's compacted, and each result's size after
+HISTORY_TOOL_TOKENS = int(os.getenv("HISTORY_TOOL_TOKENS", "1200"))
+COMPACT_TOOL_TOKENS = int(os.getenv("COMPACT_TOOL_TOKENS", "60"))
+
+
+@dataclass
+class Turn:
+    query: str
+    output: str
+    # Plain {"name", "args", "id"} calls and their (shaped) results as (content, status)
+    tool_calls: list = field(default_factory=list)
+    results: list = field(default_factory=list)
+    compacted: bool = False
+
+    def messages(self) -> list[BaseMessage]:
+        messages = [HumanMessage(self.query)]
+        if self.results:
+            messages.append(AIMessage(content="", tool_calls=[{**call, "type": "tool_call"} for call in self.tool_calls]))
+            messages += [ToolMessage(content, tool_call_id=call["id"], name=call["name"], status=status)
+                         for call, (content, status) in zip(self.tool_calls, self.results)]
+        messages.append(AIMessage(self.output or ""))
+        return messages
+
+    def tool_tokens(self) -> int:
+        return sum(estimate_tokens(content) for content, _ in self.results)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.query) + estimate_tokens(self.output or "") + self.tool_tokens()
+
+
+class Session:
+    """One conversation's history, rendered in front of each new question.
+
+    Model servers keep the KV cache of the last prompt and reuse its longest common
+    prefix, so the history only ever changes at the end between turns: a new turn is
+    appended and earlier ones render to the same messages, byte for byte. Shrinking it
+    is batched to keep that true most of the time. Once earlier turns' tool output
+    passes tool_tokens, all of it is cut to a short excerpt at once, and once the whole
+    history passes max_tokens the oldest turns go until it's down to half; either way
+    the next prompt is prefilled from the first changed turn on, and the ones after
+    reuse it again.
+
+    The tools bound to the model are kept the same way: the graph gets the ones bound
+    last turn back and adds newly routed ones after them (see QueryAgent.select_tools),
+    so the tool schemas at the start of the prompt don't change from turn to turn.
+
+    Questions asked concurrently in one conversation must take turns: servers hold
+    turn_lock from rendering the history to recording the answer, so turns don't
+    interleave.
+    """
+
+    def __init__(self, max_tokens: int = HISTORY_TOKENS, tool_tokens: int = HISTORY_TOOL_TOKENS,
+                 compact_tokens: int = COMPACT_TOOL_TOKENS):
+        self.max_tokens = max_tokens
+        self.tool_tokens = tool_tokens
+        self.compact_tokens = compact_tokens
+        self.turns: list[Turn] = []
+        self.tool_names: list[str] = []
+        self.stats = {"turns": 0, "compactions": 0, "dropped_turns": 0}
+        self._count = 0
+        self._lock = threading.Lock()
+        self.turn_lock = asyncio.Lock()
+
+    def history(self) -> list[BaseMessage]:
+        with self._lock:
+            return [message for turn in self.turns for message in turn.messages()]
+
+    def inputs(self, query: str) -> dict:
+        """Graph input for the next question of the conversation."""
+        with self._lock:
+            tool_names = list(self.tool_names)
+        return {"user_query": query, "history": self.history(), "tool_names": tool_names}
+
+    def record(self, state: dict):
+        """Add a finished query's question, tool calls, results and answer."""
+        with self._lock:
+            self._count += 1
+            results = [(str(message.content), message.status) for message in state.get('tool_messages') or []]
+            # Ids only have to be unique in the prompt; these are, and don't depend on the model's
+            tool_calls = [{"name": call['name'], "args": call['args'], "id": f"t{self._count}_{i}"}
+                          for i, call in enumerate(state.get('tool_calls') or [])][:len(results)]
+            self.turns.append(Turn(state['user_query'], state.get('output') or "", tool_calls, results))
+            self.stats["turns"] += 1
+            if state.get('route') != "fast_path":
+                self.tool_names = list(state.get('tool_names') or [])
+            self._shrink()
+
+    def _shrink(self):
+        earlier = [turn for turn in self.turns[:-1] if not turn.compacted]
+        if sum(turn.tool_tokens() for turn in earlier) > self.tool_tokens:
+            for turn in earlier:
+                turn.results = [(_fit_text(content, self.compact_tokens), status) for content, status in turn.results]
+                turn.compacted = True
+            self.stats["compactions"] += 1
+        if sum(turn.tokens() for turn in self.turns) > self.max_tokens:
+            # The latest turn stays, whatever its size; follow-ups are about it
+            while len(self.turns) > 1 and sum(turn.tokens() for turn in self.turns) > self.max_tokens // 2:
+                self.turns.pop(0)
+                self.stats["dropped_turns"] += 1
+
+    def clear(self):
+        with self._lock:
+            self.turns, self.tool_names = [], []
+
+    def stats_dict(self) -> dict:
+        with self._lock:
+            return {**self.stats, "history_turns": len(self.turns),
+                    "history_tokens": sum(turn.tokens() for turn in self.turns), "tools": list(self.tool_names)}
+
+
+class PrefillMeter(BaseCallbackHandler):
+    """Prompt tokens evaluated and time spent evaluating them (prefill), per LLM call.
+
+    Ollama reports both with every reply; with its prompt cache warm, only the part of
+    the prompt after the prefix it already holds is evaluated, so a turn that reuses it
+    shows far fewer tokens than its prompt has. Models that don't report prefill time
+    count their prompt tokens only.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                metadata = getattr(message, "response_metadata", None) or {}
+                usage = getattr(message, "usage_metadata", None) or {}
+                tokens = metadata.get("prompt_eval_count", usage.get("input_tokens", 0)) or 0
+                seconds = (metadata.get("prompt_eval_duration") or 0) / 1e9
+                with self._lock:
+                    self.calls.append({"tokens": tokens, "seconds": seconds})
+
+    def turn(self) -> dict:
+        """Totals of the calls since the last turn(), and start counting afresh."""
+        with self._lock:
+            calls, self.calls = self.calls, []
+        return {
+            "llm_calls": len(calls),
+            "prefill_tokens": sum(call["tokens"] for call in calls),
+            "prefill_seconds": round(sum(call["seconds"] for call in calls), 3),
+        }
@@ -0,0 +1,102 @@
+import math
+import threading
+import time
+from typing import AsyncIterator, Optional
+
+# Node whose model tokens make up the answer
+ANSWER_NODE = "synthesize"
+
+
+def _percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p * len(ordered)) - 1, 0)] if ordered else 0.0
+
+
+class StreamStats:
+    """Time to first answer token and to the complete answer, over streamed queries."""
+
+    def __init__(self):
+        self.ttft = []
+        self.total = []
+        self._lock = threading.Lock()
+
+    def record(self, ttft: Optional[float], total: float):
+        with self._lock:
+            if ttft is not None:
+                self.ttft.append(ttft)
+            self.total.append(total)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "queries": len(self.total),
+                "ttft_p50": round(_percentile(self.ttft, 0.5), 3),
+                "ttft_p95": round(_percentile(self.ttft, 0.95), 3),
+                "total_p50": round(_percentile(self.total, 0.5), 3),
+                "total_p95": round(_percentile(self.total, 0.95), 3),
+            }
+
+
+def _progress(node: str, output: dict) -> Optional[dict]:
+    # What a user waiting on the answer wants to hear about after each node
+    if node == "fast_path" and output.get("route") == "fast_path":
+        return {"type": "tools_selected", "tools": [tc["name"] for tc in output.get("tool_calls", [])], "route": "fast_path"}
+    if node == "select_tools":
+        return {"type": "tools_selected", "tools": [tc["name"] for tc in output.get("tool_calls", [])], "route": "graph"}
+    if node == "validate_tool_inputs":
+        rejected = {tc["name"]: tc["validation_error"] for tc in output.get("tool_calls", []) if tc.get("validation_error")}
+        return {"type": "arguments_checked", "rejected": rejected}
+    if node == "execute_tool_call":
+        results = [{"name": msg.name, "status": msg.status} for msg in output.get("tool_messages", [])]
+        return {"type": "tool_results", "results": results}
+    return None
+
+
+async def stream_answer(chain, query: str, config: Optional[dict] = None,
+                        stats: Optional[StreamStats] = None, session=None) -> AsyncIterator[dict]:
+    """Run a query through the graph, yielding progress as nodes finish and then answer tokens.
+
+    Events are dicts with a "type": tools_selected, arguments_checked, tool_results, token
+    (with "text") and finally answer (with "output", "ttft" and "seconds"). Time to first
+    token counts from the call to the first answer token, or to the templated answer
+    when the fast path handled the query. With an agent.session.Session, the query is
+    asked in that conversation and recorded in it once answered.
+    """
+    start = time.perf_counter()
+    ttft = None
+    inputs = session.inputs(query) if session else {"user_query": query}
+    state = dict(inputs)
+    async for event in chain.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+        if kind == "on_chat_model_stream" and node == ANSWER_NODE:
+            text = event["data"]["chunk"].content
+            if isinstance(text, str) and text:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                yield {"type": "token", "text": text}
+        elif kind == "on_chain_end" and node and event["name"] == node:
+            output = event["data"].get("output") or {}
+            if not isinstance(output, dict):
+                continue
+            state.update(output)
+            progress = _progress(node, output)
+            if progress:
+                yield progress
+            if node == "fast_path" and output.get("route") == "fast_path":
+                ttft = time.perf_counter() - start
+                yield {"type": "token", "text": output["output"]}
+
+    seconds = time.perf_counter() - start
+    if session:
+        session.record(state)
+    if stats:
+        stats.record(ttft, seconds)
+    yield {
+        "type": "answer",
+        "output": state.get("output"),
+        "route": state.get("route"),
+        "trace": state.get("trace"),
+        "ttft": round(ttft, 3) if ttft is not None else None,
+        "seconds": round(seconds, 3),
+    }
@@ -0,0 +1,340 @@
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+from urllib.parse import urlsplit
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+TRACING = os.getenv("TRACING", "false").lower() == "true"
+TRACE_PATH = os.getenv("TRACE_PATH", ".cache/traces.jsonl")
+METRICS_PATH = os.getenv("TRACE_METRICS_PATH", ".cache/metrics.prom")
+
+_enabled = False
+_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_node: ContextVar[Optional[str]] = ContextVar("trace_node", default=None)
+# LangChain attaches the handler in this variable to every run started in the context
+_handler: ContextVar[Optional["TraceCallbackHandler"]] = ContextVar("trace_handler", default=None)
+register_configure_hook(_handler, inheritable=True)
+
+
+class Trace:
+    """Where one query spent its time: per-node wall time, LLM calls and tokens, tool runs,
+    Polygon requests and cache lookups."""
+
+    def __init__(self, query: str):
+        self.trace_id = uuid.uuid4().hex
+        self.query = query
+        self.started = time.time()
+        self.nodes = defaultdict(lambda: {"seconds": 0.0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                          "prefill_seconds": 0.0})
+        self.tools = []
+        self.http = []
+        self.cache = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def add(self, section: str, **event):
+        event["node"] = _node.get()
+        with self._lock:
+            getattr(self, section).append(event)
+
+    def count(self, node: Optional[str], **values):
+        with self._lock:
+            for key, value in values.items():
+                self.nodes[node or "other"][key] += value
+
+    def count_cache(self, cache: str, outcome: str):
+        with self._lock:
+            self.cache[cache][outcome] += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "trace_id": self.trace_id,
+                "query": self.query,
+                "started": self.started,
+                "seconds": round(sum(node["seconds"] for node in self.nodes.values()), 6),
+                "nodes": {name: dict(node, seconds=round(node["seconds"], 6), prefill_seconds=round(node["prefill_seconds"], 6))
+                          for name, node in self.nodes.items()},
+                "tools": list(self.tools),
+                "http": list(self.http),
+                "cache": {name: dict(counts) for name, counts in self.cache.items()},
+            }
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """Feeds LLM calls, token usage and tool runs into the active trace."""
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        self._runs[run_id] = node
+        self.trace.count(node, llm_calls=1)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        node = self._runs.pop(run_id, None)
+        prompt = completion = 0
+        prefill = 0.0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+                # Ollama's time evaluating the prompt, in nanoseconds
+                prefill += ((getattr(message, "response_metadata", None) or {}).get("prompt_eval_duration") or 0) / 1e9
+        self.trace.count(node, prompt_tokens=prompt, completion_tokens=completion, prefill_seconds=prefill)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._runs[run_id] = (serialized or {}).get("name") or kwargs.get("name"), time.perf_counter()
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end_tool(run_id, "success")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end_tool(run_id, f"error: {type(error).__name__}")
+
+    def _end_tool(self, run_id, status: str):
+        started = self._runs.pop(run_id, None)
+        if started:
+            name, start = started
+            self.trace.add("tools", name=name, seconds=round(time.perf_counter() - start, 6), status=status)
+
+
+def _on_http(event: dict):
+    trace = _trace.get()
+    if trace is None:
+        return
+    if event["kind"] == "cache":
+        trace.count_cache("polygon", "hit" if event["hit"] else "miss")
+        return
+    if event["kind"] == "coalesced":
+        trace.count_cache("singleflight", "hit")
+        return
+    trace.add("http", path=urlsplit(event["url"]).path, status=event["status"], bytes=event["bytes"],
+              seconds=round(event["seconds"], 6), attempt=event["attempt"], **({"error": event["error"]} if "error" in event else {}),
+              **({"queued": round(event["queued"], 6)} if event.get("queued") else {}))
+
+
+def record_cache(cache: str, outcome: str):
+    """Count a cache lookup (hit, near_hit or miss) in the active trace, if any."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.count_cache(cache, outcome)
+
+
+def enable():
+    """Start recording traces for graph runs; off by default so nodes pay a single flag check."""
+    global _enabled
+    from tools.polygon.client import add_http_hook
+    add_http_hook(_on_http)
+    _enabled = True
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def traced_node(name: str, fn: Callable) -> Callable:
+    """Wrap a graph node so its run lands in the query's trace, which travels in State['trace']."""
+    takes_config = "config" in inspect.signature(fn).parameters
+
+    def node(state: dict, config):
+        if not _enabled:
+            return fn(state, config) if takes_config else fn(state)
+        trace = state.get("trace") or Trace(state["user_query"])
+        tokens = _trace.set(trace), _node.set(name), _handler.set(TraceCallbackHandler(trace))
+        start = time.perf_counter()
+        try:
+            result = fn(state, config) if takes_config else fn(state)
+        finally:
+            trace.count(name, seconds=time.perf_counter() - start)
+            _handler.reset(tokens[2])
+            _node.reset(tokens[1])
+            _trace.reset(tokens[0])
+        return {**(result or {}), "trace": trace}
+
+    node.__name__ = name
+    return node
+
+
+class Metrics:
+    """Running totals over finished traces, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.queries = 0
+        self.node_seconds = Counter()
+        self.node_runs = Counter()
+        self.llm_calls = Counter()
+        self.tokens = Counter()
+        self.prefill_seconds = Counter()
+        self.tool_seconds = Counter()
+        self.tool_runs = Counter()
+        self.http_requests = Counter()
+        self.http_bytes = 0
+        self.cache = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, trace: dict):
+        with self._lock:
+            self.queries += 1
+            for node, values in trace["nodes"].items():
+                self.node_seconds[node] += values["seconds"]
+                self.node_runs[node] += 1
+                self.llm_calls[node] += values["llm_calls"]
+                self.tokens[(node, "prompt")] += values["prompt_tokens"]
+                self.tokens[(node, "completion")] += values["completion_tokens"]
+                self.prefill_seconds[node] += values.get("prefill_seconds", 0.0)
+            for tool in trace["tools"]:
+                self.tool_seconds[tool["name"]] += tool["seconds"]
+                self.tool_runs[(tool["name"], tool["status"])] += 1
+            for request in trace["http"]:
+                self.http_requests[str(request["status"])] += 1
+                self.http_bytes += request["bytes"]
+            for cache, counts in trace["cache"].items():
+                for outcome, count in counts.items():
+                    self.cache[(cache, outcome)] += count
+
+    def prometheus(self) -> str:
+        lines = []
+
+        def metric(name: str, kind: str, help: str, samples: list[tuple[str, Any]]):
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}"])
+            lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+        with self._lock:
+            metric("agent_queries_total", "counter", "Traced queries.", [("", self.queries)])
+            metric("agent_node_seconds_total", "counter", "Wall time spent in each graph node.",
+                   [(f'{{node="{n}"}}', round(v, 6)) for n, v in sorted(self.node_seconds.items())])
+            metric("agent_node_runs_total", "counter", "Graph node runs.",
+                   [(f'{{node="{n}"}}', v) for n, v in sorted(self.node_runs.items())])
+            metric("agent_llm_calls_total", "counter", "Chat model calls by node.",
+                   [(f'{{node="{n}"}}', v) for n, v in sorted(self.llm_calls.items())])
+            metric("agent_llm_tokens_total", "counter", "Prompt and completion tokens by node.",
+                   [(f'{{node="{n}",kind="{k}"}}', v) for (n, k), v in sorted(self.tokens.items())])
+            metric("agent_llm_prefill_seconds_total", "counter", "Time the model spent evaluating prompts, by node.",
+                   [(f'{{node="{n}"}}', round(v, 6)) for n, v in sorted(self.prefill_seconds.items())])
+            metric("agent_tool_seconds_total", "counter", "Wall time spent in each tool.",
+                   [(f'{{tool="{n}"}}', round(v, 6)) for n, v in sorted(self.tool_seconds.items())])
+            metric("agent_tool_runs_total", "counter", "Tool runs by outcome.",
+                   [(f'{{tool="{n}",status="{s}"}}', v) for (n, s), v in sorted(self.tool_runs.items())])
+            metric("polygon_requests_total", "counter", "Polygon request attempts by HTTP status.",
+                   [(f'{{status="{s}"}}', v) for s, v in sorted(self.http_requests.items())])
+            metric("polygon_response_bytes_total", "counter", "Polygon response body bytes.", [("", self.http_bytes)])
+            metric("cache_lookups_total", "counter", "Cache lookups by cache and outcome.",
+                   [(f'{{cache="{c}",outcome="{o}"}}', v) for (c, o), v in sorted(self.cache.items())])
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+_export_lock = threading.Lock()
+
+
+def finish(trace: Optional[Trace], path: Optional[str] = TRACE_PATH) -> Optional[dict]:
+    """Close out a query's trace: add it to the metrics and append it to the JSONL export."""
+    if trace is None:
+        return None
+    data = trace.as_dict()
+    metrics.observe(data)
+    if path:
+        with _export_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "a") as file:
+                file.write(json.dumps(data, default=str) + "\n")
+    return data
+
+
+def write_metrics(path: str = METRICS_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(metrics.prometheus())
+
+
+def summarize(trace: dict) -> str:
+    """One line per query for the REPL: time, LLM calls and tokens per node, then HTTP and caches."""
+    parts = []
+    for name, node in trace["nodes"].items():
+        detail = f"{name} {node['seconds']:.3f}s"
+        if node["llm_calls"]:
+            detail += f" ({node['llm_calls']} LLM, {node['prompt_tokens']}+{node['completion_tokens']} tok"
+            detail += f", prefill {node['prefill_seconds']:.3f}s)" if node.get("prefill_seconds") else ")"
+        parts.append(detail)
+    if trace["http"]:
+        parts.append(f"http {len(trace['http'])} req {sum(r['bytes'] for r in trace['http'])} B")
+    for cache, counts in trace["cache"].items():
+        parts.append(f"{cache} cache {counts.get('hit', 0) + counts.get('near_hit', 0)}/{sum(counts.values())} hits")
+    return " | ".join(parts)
+
+
+class SamplingProfiler:
+    """Opt-in sampler of every thread's stack, for finding hot paths without a tracing profiler.
+
+    Samples sys._current_frames() every `interval` seconds from a background thread, so
+    the profiled code runs unmodified. Stacks are kept collapsed ("a;b;c count"), the
+    input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, limit: int = 15) -> list[tuple[str, float]]:
+        """Innermost frames by share of samples (self time); idle threads show up as their wait call."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [(frame, round(count / total, 3)) for frame, count in leaves.most_common(limit)]
+
+    def write_collapsed(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,210 @@
+import json
+import re
+import threading
+from collections import Counter
+from typing import Any
+
+from pydantic import BaseModel, Field, ValidationError
+
+from agent.planner import has_reference
+
+NUMBER = re.compile(r"(?<![\w.])-?\d[\d,]*(?:\.\d+)?(?![\w.])")
+
+# Offsets into the past a question states as a positive number with "ago" ("4 days ago" is days=-4)
+PAST_OFFSET_FIELDS = {"date_offset": {"days", "weeks", "months", "years"}}
+PAST = re.compile(r"\b(ago|back|before)\b", re.IGNORECASE)
+
+check_arguments_prompt = """
+User asked this question:
+{user_query}
+
+A tool-calling assistant filled in these tool arguments:
+{arguments}
+
+For every numbered argument decide whether its value is supported by the question.
+A value is supported when the user gave it or it follows directly from what they
+said: a ticker symbol for a company they named, a date computed from a relative date
+like "last week", a number written in words, a sort order implied by "latest".
+It is not supported when the assistant made it up or guessed it.
+
+Return one check for every numbered argument.
+"""
+
+
+class ArgumentCheck(BaseModel):
+    item: int = Field(..., description="Number of the argument in the list")
+    supported: bool = Field(..., description="Whether the question supports the argument value")
+
+
+class ArgumentChecks(BaseModel):
+    checks: list[ArgumentCheck] = Field(default_factory=list, description="One check per numbered argument")
+
+
+def _verdict(valid: bool, tier: str, reason: str = "") -> dict:
+    return {"valid": valid, "tier": tier, "reason": reason}
+
+
+def _mentioned(value: str, text: str) -> bool:
+    return re.search(rf"(?<!\w){re.escape(value)}(?!\w)", text, re.IGNORECASE) is not None
+
+
+def _ticker_mentioned(ticker: str, query: str) -> bool:
+    # "Amazon" in the question supports ticker=AMZN
+    from tools.polygon.ticker_index import get_index, normalize_name
+    norm_query = f" {normalize_name(query)} "
+    return any(
+        row["norm_name"] and f" {row['norm_name']} " in norm_query
+        for row in get_index().exact(ticker) if row["ticker"] == ticker.upper()
+    )
+
+
+def lexical_presence(name: str, value: Any, query: str, tool: str = "") -> bool:
+    """Whether the value is visibly in the query. False means unsure, not absent."""
+    if isinstance(value, bool) or value is None:
+        return False
+    if isinstance(value, list):
+        # tickers=["AAPL", "META"] is supported when every item is
+        return bool(value) and all(lexical_presence(name.removesuffix("s"), item, query, tool) for item in value)
+    if isinstance(value, (int, float)):
+        accepted = {value}
+        if value < 0 and name in PAST_OFFSET_FIELDS.get(tool, ()) and PAST.search(query):
+            # "4 days ago" supports days=-4
+            accepted.add(-value)
+        return any(float(number.replace(",", "")) in accepted for number in NUMBER.findall(query))
+    if not isinstance(value, str) or not value.strip():
+        return False
+    if _mentioned(value.strip(), query) or ("_" in value and _mentioned(value.strip().replace("_", " "), query)):
+        # Enum values like dividend_yield count when written as words
+        return True
+    return name == "ticker" and _ticker_mentioned(value.strip(), query)
+
+
+class ArgumentValidator:
+    """Validates model-proposed tool arguments in tiers, cheapest first.
+
+    1. The tool's pydantic args_schema: types, patterns and lengths. Failures are final.
+    2. A lexical check that the value appears in the question. Values left at the
+       schema default need no support.
+    3. One structured-output LLM call per query for whatever is still uncertain.
+
+    A call is rejected when its schema check fails or a required argument isn't supported
+    by the question. Unsupported optional arguments are dropped, so the tool falls back
+    to its default.
+    """
+
+    def __init__(self, registry, llm=None):
+        self.registry = registry
+        self.llm = llm.with_structured_output(ArgumentChecks) if llm is not None else None
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def validate(self, query: str, tool_calls: list[dict]) -> list[dict]:
+        """Tool calls annotated with per-argument verdicts and, when rejected, a validation error."""
+        checked, uncertain = [], []
+        for tool_call in tool_calls:
+            tool_call, pending = self._check_call(query, tool_call)
+            checked.append(tool_call)
+            uncertain += [(tool_call, name) for name in pending]
+
+        if uncertain:
+            for (tool_call, name), verdict in zip(uncertain, self._ask_llm(query, uncertain)):
+                tool_call['arg_validation_msgs'][name] = verdict
+
+        for tool_call in checked:
+            self._gate(tool_call)
+        with self._lock:
+            self.stats["calls"] += len(checked)
+            self.stats["rejected"] += sum(1 for tool_call in checked if tool_call.get('validation_error'))
+            self.stats["llm_calls"] += 1 if uncertain else 0
+            for tool_call in checked:
+                self.stats.update(verdict["tier"] for verdict in tool_call['arg_validation_msgs'].values())
+        return checked
+
+    def _check_call(self, query: str, tool_call: dict) -> tuple[dict, list[str]]:
+        tool_call = {**tool_call, 'arg_validation_msgs': {}}
+        verdicts = tool_call['arg_validation_msgs']
+        tool = self.registry.get(tool_call['name'].lower())
+        if tool is None:
+            tool_call['validation_error'] = f"Unknown tool: {tool_call['name']}"
+            return tool_call, []
+
+        schema = tool.get_input_schema()
+        args = dict(tool_call['args'])
+        for name in [name for name in args if name not in schema.model_fields]:
+            del args[name]
+            verdicts[name] = _verdict(False, "schema", "not an argument of this tool; dropped")
+        # Values referring to an earlier call's result ("$1.date") are only known once it has run;
+        # the tool checks them against its schema then
+        references = {name for name, value in args.items() if has_reference(value)}
+        try:
+            parsed = schema.model_validate({name: value for name, value in args.items() if name not in references})
+        except ValidationError as e:
+            errors = [error for error in e.errors()
+                      if not (error["loc"] and error["loc"][0] in references and error["type"] == "missing")]
+            for error in errors:
+                name = str(error["loc"][0]) if error["loc"] else "_schema"
+                verdicts[name] = _verdict(False, "schema", error["msg"])
+            if errors:
+                tool_call['args'] = args
+                return tool_call, []
+            parsed = None
+
+        # Coerced values, e.g. "5" -> 5 for integer fields
+        tool_call['args'] = {name: value if name in references or parsed is None else getattr(parsed, name)
+                             for name, value in args.items()}
+        pending = []
+        for name, value in tool_call['args'].items():
+            field = schema.model_fields[name]
+            if name in references:
+                verdicts[name] = _verdict(True, "plan", "result of an earlier call")
+            elif not field.is_required() and value == field.default:
+                verdicts[name] = _verdict(True, "schema", "default value")
+            elif lexical_presence(name, value, query, tool_call['name'].lower()):
+                verdicts[name] = _verdict(True, "lexical", "mentioned in the question")
+            else:
+                pending.append(name)
+        return tool_call, pending
+
+    def _ask_llm(self, query: str, uncertain: list[tuple[dict, str]]) -> list[dict]:
+        if self.llm is None:
+            return [_verdict(True, "unverified", "no model to check against") for _ in uncertain]
+        lines = []
+        for item, (tool_call, name) in enumerate(uncertain, 1):
+            field = self.registry.get(tool_call['name'].lower()).get_input_schema().model_fields[name]
+            lines.append(f"{item}. tool {tool_call['name']}, argument {name} ({field.description or 'no description'}) "
+                         f"= {json.dumps(tool_call['args'][name], default=str)}")
+        try:
+            result = self.llm.invoke(check_arguments_prompt.format(user_query=query, arguments="\n".join(lines)))
+            answers = {check.item: check.supported for check in result.checks}
+        except Exception as e:
+            # A flaky check shouldn't block an answer the old always-true validation allowed
+            return [_verdict(True, "unverified", f"check failed: {e}") for _ in uncertain]
+        return [
+            _verdict(answers[item], "llm", "supported by the question" if answers[item] else "not supported by the question")
+            if item in answers else _verdict(True, "unverified", "no answer from the check")
+            for item in range(1, len(uncertain) + 1)
+        ]
+
+    def _gate(self, tool_call: dict):
+        if tool_call.get('validation_error'):
+            return
+        tool = self.registry.get(tool_call['name'].lower())
+        fields = tool.get_input_schema().model_fields
+        errors = []
+        for name, verdict in tool_call['arg_validation_msgs'].items():
+            if verdict["valid"]:
+                continue
+            if verdict["tier"] == "schema":
+                # Unknown arguments were already dropped; anything else is a type/pattern error
+                if name in fields or name == "_schema":
+                    errors.append(f"{name}: {verdict['reason']}")
+            elif fields[name].is_required():
+                errors.append(f"{name}: {verdict['reason']}")
+            else:
+                del tool_call['args'][name]
+                verdict["reason"] += "; dropped"
+        if errors:
+            tool_call['validation_error'] = "Invalid arguments: " + "; ".join(errors)
+
+    def stats_dict(self) -> dict:
+        return dict(self.stats)
@@ -0,0 +1,199 @@
+import argparse
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+from typing import Optional
+
+import aiohttp
+from dotenv import load_dotenv
+from langchain.chat_models import init_chat_model
+from langchain_core.messages import HumanMessage
+
+from prompt import get_generation_prompt, get_tool_example
+from spec import load_spec, render_spec
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DOCS_URL = "https://polygon.io/docs/stocks/"
+DOCS_DIR = os.getenv("DOCS_CACHE_DIR", os.path.join(ROOT, ".cache", "docs"))
+# Inside tool-generator/, which the tool registry already scans
+OUTPUT_DIR = os.path.join(ROOT, "tool-generator", "generated")
+
+# Generations share one model server; downloads share one connection pool
+GENERATE_CONCURRENCY = int(os.getenv("GENERATE_CONCURRENCY", "4"))
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "8"))
+
+# As in tools/registry.py: a generated module must define a subclass of one of these
+TOOL_BASES = {"BaseTool", "PolygonTool"}
+
+CODE_FENCE = re.compile(r"^\s*```[a-z]*\n(.*?)\n```\s*$", re.S)
+
+
+def read_endpoints(path: str) -> list[tuple[str, str]]:
+    """(slug, docs url) pairs from a file of docs slugs or URLs, one per line; # starts a comment."""
+    endpoints = []
+    with open(path, "r") as file:
+        for line in file:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith(("http://", "https://")):
+                endpoints.append((line.rstrip("/").rsplit("/", 1)[-1], line))
+            else:
+                endpoints.append((line, DOCS_URL + line))
+    return endpoints
+
+
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest: dict, path: str):
+    # Written after every endpoint, so an interrupted run keeps what it finished
+    temp = path + ".tmp"
+    with open(temp, "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(temp, path)
+
+
+def extract_code(content: str) -> str:
+    # The prompt asks for bare code, but models still wrap it in a fence now and then
+    match = CODE_FENCE.match(content)
+    return (match.group(1) if match else content).strip() + "\n"
+
+
+def check_tool(code: str) -> Optional[str]:
+    """Why generated code can't be used as a tool module, or None if it can."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return f"SyntaxError: {e}"
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            for base in node.bases:
+                name = base.id if isinstance(base, ast.Name) else getattr(base, "attr", None)
+                if name in TOOL_BASES:
+                    return None
+    return f"no class deriving from {' or '.join(sorted(TOOL_BASES))}"
+
+
+async def download(session: aiohttp.ClientSession, slug: str, url: str, previous: dict) -> tuple[str, dict]:
+    """The docs page, revalidated with the validators of the last download when there is one."""
+    path = os.path.join(DOCS_DIR, f"{slug}.html")
+    headers = {}
+    if os.path.exists(path):
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+    async with session.get(url, headers=headers) as response:
+        if response.status == 304:
+            with open(path, "r") as file:
+                return file.read(), {"etag": previous.get("etag"), "last_modified": previous.get("last_modified")}
+        response.raise_for_status()
+        html = await response.text()
+        validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    os.makedirs(DOCS_DIR, exist_ok=True)
+    with open(path, "w") as file:
+        file.write(html)
+    return html, validators
+
+
+async def generate_all(endpoints: list[tuple[str, str]], model, model_id: str, output_dir: str = OUTPUT_DIR,
+                       concurrency: int = GENERATE_CONCURRENCY, download_concurrency: int = DOWNLOAD_CONCURRENCY,
+                       force: bool = False) -> dict:
+    """Generate a tool per endpoint into output_dir, recording each in output_dir/manifest.json.
+
+    An endpoint is regenerated only when the hash of its prompt (extracted spec, prompt
+    template and tool example) and the model id differs from the manifest's, or its
+    last attempt failed. Downloads run concurrently over one pooled session; generations
+    run at most `concurrency` at a time.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    manifest = load_manifest(manifest_path)
+    tool_example = get_tool_example()
+    limit = asyncio.Semaphore(concurrency)
+    statuses = Counter()
+
+    async def process(session: aiohttp.ClientSession, slug: str, url: str):
+        previous = manifest.get(slug, {})
+        entry = {"url": url, "model": model_id, "path": os.path.relpath(os.path.join(output_dir, f"{slug.replace('-', '_')}.py"), ROOT)}
+        try:
+            _, validators = await download(session, slug, url, previous)
+            entry.update(validators)
+            # Cached by content hash: an unchanged page (a 304 included) isn't parsed again
+            spec = await asyncio.to_thread(load_spec, os.path.join(DOCS_DIR, f"{slug}.html"), slug)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            statuses["failed"] += 1
+            manifest[slug] = {**previous, **entry, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+            save_manifest(manifest, manifest_path)
+            return
+
+        prompt = get_generation_prompt(render_spec(spec), tool_example)
+        entry["key"] = hashlib.sha256(f"{model_id}\0{prompt}".encode()).hexdigest()
+        path = os.path.join(ROOT, entry["path"])
+        if not force and previous.get("key") == entry["key"] and previous.get("status") == "generated" and os.path.exists(path):
+            statuses["unchanged"] += 1
+            manifest[slug] = {**previous, **entry}
+            save_manifest(manifest, manifest_path)
+            return
+
+        async with limit:
+            start = time.perf_counter()
+            try:
+                response = await model.ainvoke([HumanMessage(prompt)])
+                code = extract_code(response.content)
+                error = check_tool(code)
+            except Exception as e:
+                code, error = None, f"{type(e).__name__}: {e}"
+            entry["seconds"] = round(time.perf_counter() - start, 3)
+
+        if error:
+            # A previously generated tool stays in place until a regeneration succeeds
+            statuses["failed"] += 1
+            entry.update(status="failed", error=error)
+        else:
+            with open(path, "w") as file:
+                file.write(code)
+            statuses["generated"] += 1
+            entry.update(status="generated", generated_at=time.strftime("%Y-%m-%dT%H:%M:%S%z"))
+        manifest[slug] = entry
+        save_manifest(manifest, manifest_path)
+
+    start = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=download_concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+        await asyncio.gather(*(process(session, slug, url) for slug, url in endpoints))
+    return {"endpoints": len(endpoints), **statuses, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate tools for many Polygon endpoints, skipping unchanged ones")
+    parser.add_argument("endpoints", nargs="?", default="endpoints.txt", help="File of docs slugs or URLs, one per line")
+    parser.add_argument("-o", "--output", default=OUTPUT_DIR, help="Directory for the tools and manifest.json")
+    parser.add_argument("-m", "--model", default="llama3.2")
+    parser.add_argument("-p", "--provider", default="ollama")
+    parser.add_argument("-j", "--concurrency", type=int, default=GENERATE_CONCURRENCY, help="Generations at once")
+    parser.add_argument("--download-concurrency", type=int, default=DOWNLOAD_CONCURRENCY, help="Downloads at once")
+    parser.add_argument("-f", "--force", action="store_true", help="Regenerate even unchanged endpoints")
+    args = parser.parse_args()
+
+    load_dotenv()
+    model = init_chat_model(args.model, model_provider=args.provider, temperature=0)
+    summary = asyncio.run(generate_all(read_endpoints(args.endpoints), model, f"{args.provider}:{args.model}",
+                                       args.output, args.concurrency, args.download_concurrency, args.force))
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ from langchain.globals import set_llm_cache
 from langchain_community.cache import SQLiteCache
 from dotenv import load_dotenv
 
-from prompt import get_generation_prompt, get_html_api_ref, get_tool_example
+from prompt import get_api_spec, get_generation_prompt, get_tool_example
 
 import argparse
 import langchain
@@ -16,9 +16,11 @@ import os
 load_dotenv()
 
 prompt = get_generation_prompt(
-    get_html_api_ref(),
+    get_api_spec(),
     get_tool_example()
 )
+# The raw page would be spliced in whole; the extracted spec is what the model actually needs
+print(f"Prompt: {len(prompt)} chars (API reference page: {os.path.getsize('temp/api_ref.html')} chars)")
 
 model = ChatOllama(model='llama3.2', temperature=0)
 #model = ChatAnthropic(model='claude-3-7-sonnet-20250219', temperature=0)
@@ -1,3 +1,6 @@
+from spec import load_spec, render_spec
+
+
 def get_tool_example() -> str:
     with open('temp/tool_example.py', 'r') as file:
         tool_example = file.read()
@@ -8,14 +11,18 @@ def get_html_api_ref() -> str:
         api_ref = file.read()
     return api_ref
 
-def get_generation_prompt(api_ref: str, tool_example: str) -> str:
+def get_api_spec(path: str = 'temp/api_ref.html', page: str = None) -> str:
+    # The compact spec extracted from the docs page, a few KB instead of the raw markup
+    return render_spec(load_spec(path, page))
+
+def get_generation_prompt(api_spec: str, tool_example: str) -> str:
     # read prompt.txt to variable
-    # replace in this variable "[api_ref.html]" by api_ref param and "[tool_example.py]" by tool_example
+    # replace in this variable "[api_spec]" by api_spec param and "[tool_example.py]" by tool_example
     # return this variable
     with open('prompt.txt', 'r') as file:
         prompt = file.read()
 
-    prompt = prompt.replace("[api_ref.html]", api_ref)
+    prompt = prompt.replace("[api_spec]", api_spec)
     prompt = prompt.replace("[tool_example.py]", tool_example)
 
     return prompt
\ No newline at end of file
@@ -0,0 +1,359 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from html.parser import HTMLParser
+from typing import Optional
+
+SPEC_CACHE_DIR = os.getenv("SPEC_CACHE_DIR", ".cache/specs")
+
+# Bumped whenever extraction changes, so cached specs from an older extractor aren't reused
+EXTRACTOR_VERSION = "2"
+
+# Response schemas nest deeply (financials); fields below this depth rarely matter to a tool
+MAX_FIELD_DEPTH = 4
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+MARKDOWN_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+NEXT_DATA = re.compile(r'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+
+
+def clean_text(text: str) -> str:
+    return " ".join(MARKDOWN_LINK.sub(r"\1", text or "").split())
+
+
+def first_sentence(text: str) -> str:
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    return match.group(1) if match else text
+
+
+def _new_endpoint(page: str = "", summary: str = "") -> dict:
+    return {"page": page, "summary": summary, "method": "", "path": "", "description": "",
+            "params": [], "response": []}
+
+
+class _RenderedDocParser(HTMLParser):
+    """Endpoints from Polygon's rendered docs markup.
+
+    The markup is styled-components output, so elements are recognised by the stable
+    part of their class names (ScrollTargetLink__Anchor, Parameters__Description, ...)
+    and by the color attributes the docs use for names, types and required markers.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.endpoints = []
+        self._depth = 0
+        # Open captures: [kind, depth, text parts]; text goes to every open capture
+        self._captures = []
+        self._expect_path = False
+        self._param = None
+        self._menu = None
+        self._in_filters = 0
+        self._section = None
+        # (depth, name, type) of the object/array response fields enclosing the current one
+        self._parents = []
+        self._field = None
+
+    @property
+    def _endpoint(self) -> dict:
+        if not self.endpoints:
+            self.endpoints.append(_new_endpoint())
+        return self.endpoints[-1]
+
+    def _capture(self, kind: str):
+        self._captures.append([kind, self._depth, []])
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        cls = attrs.get("class") or ""
+        if tag not in VOID_TAGS:
+            self._depth += 1
+
+        if "ScrollTargetLink__Anchor" in cls:
+            self.endpoints.append(_new_endpoint(page=(attrs.get("href") or "").rstrip("/").rsplit("/", 1)[-1]))
+            self._section = self._param = None
+            self._capture("summary")
+        elif "base__QueryContainer" in cls:
+            # The query runner after the parameters; its response-format menu (JSON/CSV) isn't one
+            self._section = self._param = self._menu = None
+        elif "base__RequestMethod" in cls:
+            self._capture("method")
+        elif "base__MarkedText" in cls and not self._endpoint["description"]:
+            self._capture("description")
+        elif "Parameters__Description" in cls and self._param:
+            self._capture("param_description")
+        elif "QueryFilterExtension__ExpandableContent" in cls:
+            self._in_filters = self._depth
+        elif "ResponseAttributes__OverflowXAuto" in cls:
+            while self._parents and self._parents[-1][0] >= self._depth:
+                self._parents.pop()
+            self._field = {"name": "", "type": "", "description": "", "depth": self._depth}
+        elif "ResponseAttributes__Description" in cls and self._field:
+            self._capture("field_description")
+        elif tag == "div" and attrs.get("size") == "5":
+            self._capture("section")
+        elif tag == "label" and self._section == "Parameters":
+            self._param = {"name": "", "type": "string", "required": False}
+            self._endpoint["params"].append(self._param)
+        elif tag == "span" and self._param is not None and attrs.get("color") == "danger":
+            self._param["required"] = True
+        elif tag == "span" and attrs.get("color") == "primary" and self._menu is not None:
+            self._capture("option")
+        elif tag == "span" and self._param is not None and not self._param["name"] and attrs.get("color") == "primary":
+            self._capture("param_name")
+        elif tag == "span" and self._in_filters and attrs.get("height") == "1.3":
+            self._capture("filter")
+        elif tag == "span" and self._field is not None and self._section == "Response Attributes":
+            if attrs.get("color") == "danger":
+                self._field["required"] = True
+            elif attrs.get("color") == "inherit" and not self._field["name"]:
+                self._capture("field_name")
+            elif attrs.get("color") == "secondary" and not self._field["type"]:
+                self._capture("field_type")
+        elif tag == "span" and attrs.get("name") and self._param is not None and attrs.get("value"):
+            # A select showing its default value
+            self._param["default"] = attrs["value"]
+        elif tag == "menu" and self._param is not None:
+            self._menu = []
+        elif tag == "input" and self._param is not None and "DatePicker" in cls:
+            self._param["type"] = "string (date)"
+        elif tag == "input" and self._param is not None and attrs.get("type") == "number":
+            # Number inputs don't say integer or float; a whole default (limit=100) says integer
+            value = attrs.get("value") or ""
+            self._param["type"] = "integer" if value.lstrip("-").isdigit() else "number"
+            if value:
+                self._param["default"] = int(value) if value.lstrip("-").isdigit() else value
+
+        if tag == "div" and self._endpoint["method"] and not self._endpoint["path"]:
+            self._expect_path = True
+
+    def handle_startendtag(self, tag, attrs):
+        # <input/> and <hr/>: no depth change, no end tag to wait for
+        depth = self._depth
+        self.handle_starttag(tag, attrs)
+        self._depth = depth
+
+    def handle_endtag(self, tag):
+        while self._captures and self._captures[-1][1] >= self._depth:
+            kind, _, parts = self._captures.pop()
+            self._finish(kind, clean_text("".join(parts)))
+        if tag == "menu" and self._menu is not None:
+            if self._param is not None and self._menu:
+                values = [value for value in self._menu if value]
+                if set(values) == {"true", "false"}:
+                    self._param["type"] = "boolean"
+                else:
+                    self._param["enum"] = values
+            self._menu = None
+        if self._in_filters and self._depth <= self._in_filters:
+            self._in_filters = 0
+        if tag not in VOID_TAGS:
+            self._depth -= 1
+
+    def handle_data(self, data):
+        if self._expect_path and data.strip():
+            self._endpoint["path"] = data.strip()
+            self._expect_path = False
+        for capture in self._captures:
+            capture[2].append(data)
+
+    def _finish(self, kind: str, text: str):
+        endpoint = self._endpoint
+        if kind == "summary":
+            endpoint["summary"] = text
+        elif kind == "method":
+            endpoint["method"] = text.upper()
+        elif kind == "description":
+            endpoint["description"] = text
+        elif kind == "section":
+            self._section = text
+            if text != "Parameters":
+                self._param = None
+        elif kind == "param_name":
+            self._param["name"] = text
+            if "{" + text + "}" in endpoint["path"]:
+                self._param["in"] = "path"
+        elif kind == "param_description":
+            self._param["description"] = text
+        elif kind == "option":
+            self._menu.append(text)
+        elif kind == "filter":
+            self._param.setdefault("filters", []).append(text)
+        elif kind == "field_name":
+            self._field["name"] = text.rstrip("* ")
+        elif kind == "field_type":
+            field = self._field
+            # Arrays of unrendered item types read "array [undefined]"
+            text = text.replace(" [undefined]", "")
+            prefix = "".join(name + ("[]." if kind_.startswith("array") else ".") for _, name, kind_ in self._parents)
+            spec = {"name": prefix + field["name"], "type": text}
+            enum = re.fullmatch(r"enum \[(.*)\]", text)
+            if enum:
+                spec.update(type="string", enum=[value.strip() for value in enum.group(1).split(",")])
+            if field.get("required"):
+                spec["required"] = True
+            endpoint["response"].append(spec)
+            if text.split(" ")[0] in ("object", "array"):
+                self._parents.append((field["depth"], field["name"], text))
+        elif kind == "field_description":
+            if endpoint["response"]:
+                endpoint["response"][-1]["description"] = first_sentence(text)
+
+
+def _schema_type(schema: dict) -> str:
+    kind = schema.get("type") or ("object" if "properties" in schema else "")
+    return f"{kind} ({schema['format']})" if schema.get("format") in ("date", "date-time") else kind
+
+
+def _schema_fields(schema: dict, prefix: str = "", depth: int = 0) -> list:
+    """Response fields flattened to dotted names, results[].ticker for array items."""
+    if "oneOf" in schema or "anyOf" in schema:
+        variants = schema.get("oneOf") or schema.get("anyOf")
+        schema = {"type": "object", "properties": {k: v for s in variants for k, v in s.get("properties", {}).items()}}
+    fields = []
+    if depth >= MAX_FIELD_DEPTH:
+        return fields
+    for name, prop in (schema.get("properties") or {}).items():
+        if "oneOf" in prop or "anyOf" in prop:
+            prop = {"type": "object", **prop}
+        field = {"name": prefix + name, "type": _schema_type(prop)}
+        if name in (schema.get("required") or []):
+            field["required"] = True
+        if prop.get("description"):
+            field["description"] = first_sentence(clean_text(prop["description"]))
+        if prop.get("enum"):
+            field["enum"] = prop["enum"]
+        fields.append(field)
+        if prop.get("type") == "array":
+            fields += _schema_fields(prop.get("items") or {}, f"{prefix}{name}[].", depth + 1)
+        elif field["type"] == "object":
+            fields += _schema_fields(prop, f"{prefix}{name}.", depth + 1)
+    return fields
+
+
+def _embedded_endpoints(html: str) -> list:
+    """Endpoints from the OpenAPI specs a full docs page embeds in its Next.js page data."""
+    match = NEXT_DATA.search(html)
+    if not match:
+        return []
+    try:
+        specs = json.loads(match.group(1))["props"]["pageProps"]["specs"]["rest"]
+    except (ValueError, KeyError, TypeError):
+        return []
+    endpoints = []
+    for group in specs:
+        for sections in group.values():
+            for section in sections:
+                for path in section.get("paths", []):
+                    params = []
+                    for param in path.get("parameters", []):
+                        schema = param.get("schema") or {}
+                        spec = {"name": param["name"], "type": _schema_type(schema), "required": bool(param.get("required"))}
+                        if param.get("in") == "path":
+                            spec["in"] = "path"
+                        if schema.get("enum"):
+                            spec["enum"] = schema["enum"]
+                        if "default" in schema:
+                            spec["default"] = schema["default"]
+                        if param.get("description"):
+                            spec["description"] = clean_text(param["description"])
+                        params.append(spec)
+                    endpoints.append({
+                        "page": path.get("path", ""),
+                        "summary": path.get("summary", ""),
+                        "method": path.get("method", "get").upper(),
+                        "path": path.get("templatedPath") or path.get("id", ""),
+                        "description": clean_text(path.get("description", "")),
+                        "params": params,
+                        "response": _schema_fields(path.get("responseSchema") or {}),
+                    })
+    return endpoints
+
+
+def extract_spec(html: str, page: Optional[str] = None) -> dict:
+    """The compact spec of one endpoint documented in a Polygon docs page.
+
+    Full docs pages embed the OpenAPI spec of every endpoint, which is used when
+    present since it carries exact types; otherwise the rendered markup is parsed.
+    `page` picks an endpoint by its docs slug (get_v3_reference_tickers) and may be
+    omitted for pages documenting a single endpoint.
+    """
+    endpoints = _embedded_endpoints(html)
+    if not any(e["page"] == page for e in endpoints):
+        parser = _RenderedDocParser()
+        parser.feed(html)
+        parser.close()
+        endpoints = [e for e in parser.endpoints if e["path"]] or endpoints
+    for endpoint in endpoints:
+        if endpoint["page"] == page:
+            return endpoint
+    if len(endpoints) == 1:
+        return endpoints[0]
+    raise ValueError(f"Page documents {len(endpoints)} endpoints, pick one of: "
+                     f"{', '.join(e['page'] for e in endpoints) or 'none'}")
+
+
+def load_spec(path: str, page: Optional[str] = None, cache_dir: str = SPEC_CACHE_DIR) -> dict:
+    """extract_spec for a docs file, cached by the hash of its content."""
+    with open(path, "rb") as file:
+        content = file.read()
+    if page is None:
+        # Saved pages are named after their slug (get_v3_reference_dividends.html)
+        page = os.path.splitext(os.path.basename(path))[0]
+    key = hashlib.sha256(f"{EXTRACTOR_VERSION}\0{page}\0".encode() + content).hexdigest()
+    cached = os.path.join(cache_dir, f"{key}.json")
+    if os.path.exists(cached):
+        with open(cached, "r") as file:
+            return json.load(file)
+
+    spec = extract_spec(content.decode("utf-8"), page)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cached, "w") as file:
+        json.dump(spec, file)
+    return spec
+
+
+def render_spec(spec: dict) -> str:
+    """The spec as the few lines of plain text the generation prompt needs."""
+    lines = [f"{spec['method']} {spec['path']}" + (f" ({spec['summary']})" if spec.get("summary") else "")]
+    if spec.get("description"):
+        lines.append(spec["description"])
+    if spec["params"]:
+        lines.append("Parameters:")
+    for param in spec["params"]:
+        details = [param.get("in", "query"), param["type"] or "string", "required" if param["required"] else "optional"]
+        if param.get("enum"):
+            details.append("one of " + "|".join(map(str, param["enum"])))
+        if param.get("default") not in (None, ""):
+            details.append(f"default {param['default']}")
+        if param.get("filters"):
+            details.append("also " + ", ".join(param["filters"]))
+        lines.append(f"- {param['name']} ({', '.join(details)})" + (f": {param['description']}" if param.get("description") else ""))
+    if spec["response"]:
+        lines.append("Response fields:")
+    for field in spec["response"]:
+        details = field["type"] + (", required" if field.get("required") else "")
+        details += ", one of " + "|".join(map(str, field["enum"])) if field.get("enum") else ""
+        lines.append(f"- {field['name']} ({details})" + (f": {field['description']}" if field.get("description") else ""))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract a compact endpoint spec from a Polygon docs page")
+    parser.add_argument("path", help="Saved docs page (.html)")
+    parser.add_argument("--page", help="Endpoint slug, for pages documenting several endpoints")
+    parser.add_argument("--json", action="store_true", help="Print the spec as JSON instead of prompt text")
+    args = parser.parse_args()
+
+    spec = load_spec(args.path, args.page)
+    text = json.dumps(spec, indent=2) if args.json else render_spec(spec)
+    print(text)
+    size = os.path.getsize(args.path)
+    print(f"\n{size} -> {len(text)} chars ({size / max(len(text), 1):.0f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import os
-from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-import requests
 from typing import Optional, List
 
+from tools.polygon.client import PolygonError, PolygonTool
+from tools.polygon.pagination import apaginate, paginate
+
 class TickersInputSchema(BaseModel):
     ticker: Optional[str] = Field(None, description="Specify a ticker symbol to filter results")
     type: Optional[str] = Field(None, description="Filter by ticker type (e.g., CS, ETF, FUND)")
@@ -17,15 +18,12 @@ class TickersInputSchema(BaseModel):
     sort: Optional[str] = Field(None, description="Field to sort results by")
     order: Optional[str] = Field(None, description="Sort order (asc or desc)")
     limit: Optional[int] = Field(100, description="Limit number of results (max 1000)")
+    max_rows: Optional[int] = Field(None, description="Follow pagination until this many results are collected. By default only the first page is returned")
 
-class PolygonTickers(BaseTool):
+class PolygonTickers(PolygonTool):
     name: str = "polygon_tickers"
     description: str = "Query ticker symbols supported by Polygon.io including Stocks/Equities, Indices, Forex, and Crypto"
     args_schema: type[BaseModel] = TickersInputSchema
-    api_key: str = Field(..., exclude=True)
-
-    def __init__(self, api_key: str):
-        super().__init__(api_key=api_key)
 
     def _run(self, 
              ticker: Optional[str] = None,
@@ -39,12 +37,72 @@ class PolygonTickers(BaseTool):
              active: Optional[bool] = True,
              sort: Optional[str] = None,
              order: Optional[str] = None,
-             limit: Optional[int] = 100):
+             limit: Optional[int] = 100,
+             max_rows: Optional[int] = None):
+        
+        if max_rows:
+            try:
+                results = list(paginate(self, "/v3/reference/tickers", self._params(
+                    ticker, type, market, exchange, cusip, cik, date, search, active, sort, order, limit), max_rows=max_rows))
+            except PolygonError as e:
+                return self._handle(e.response)
+            return {"status": "OK", "count": len(results), "results": results}
+
+        response = self._get("/v3/reference/tickers", params=self._params(
+            ticker, type, market, exchange, cusip, cik, date, search, active, sort, order, limit))
         
-        url = "https://api.polygon.io/v3/reference/tickers"
+        return self._handle(response)
+
+    async def _arun(self, 
+                    ticker: Optional[str] = None,
+                    type: Optional[str] = None,
+                    market: Optional[str] = None,
+                    exchange: Optional[str] = None,
+                    cusip: Optional[str] = None,
+                    cik: Optional[str] = None,
+                    date: Optional[str] = None,
+                    search: Optional[str] = None,
+                    active: Optional[bool] = True,
+                    sort: Optional[str] = None,
+                    order: Optional[str] = None,
+                    limit: Optional[int] = 100,
+                    max_rows: Optional[int] = None):
         
+        if max_rows:
+            try:
+                results = [row async for row in apaginate(self, "/v3/reference/tickers", self._params(
+                    ticker, type, market, exchange, cusip, cik, date, search, active, sort, order, limit), max_rows=max_rows)]
+            except PolygonError as e:
+                return self._handle(e.response)
+            return {"status": "OK", "count": len(results), "results": results}
+
+        response = await self._aget("/v3/reference/tickers", params=self._params(
+            ticker, type, market, exchange, cusip, cik, date, search, active, sort, order, limit))
+        
+        return self._handle(response)
+
+    def stream(self, 
+               ticker: Optional[str] = None,
+               type: Optional[str] = None,
+               market: Optional[str] = None,
+               exchange: Optional[str] = None,
+               cusip: Optional[str] = None,
+               cik: Optional[str] = None,
+               date: Optional[str] = None,
+               search: Optional[str] = None,
+               active: Optional[bool] = True,
+               sort: Optional[str] = None,
+               order: Optional[str] = None,
+               limit: Optional[int] = 1000,
+               max_rows: Optional[int] = None,
+               max_bytes: Optional[int] = None):
+        """Lazily yield every matching ticker across pages, for bulk jobs."""
+        return paginate(self, "/v3/reference/tickers", self._params(
+            ticker, type, market, exchange, cusip, cik, date, search, active, sort, order, limit),
+            max_rows=max_rows, max_bytes=max_bytes)
+
+    def _params(self, ticker, type, market, exchange, cusip, cik, date, search, active, sort, order, limit) -> dict:
         params = {
-            "apiKey": self.api_key,
             "active": active,
             "limit": limit
         }
@@ -70,9 +128,9 @@ class PolygonTickers(BaseTool):
             params["sort"] = sort
         if order:
             params["order"] = order
-            
-        response = requests.get(url, params=params)
-        
+        return params
+
+    def _handle(self, response):
         if response.status_code == 200:
             return response.json()
         else:
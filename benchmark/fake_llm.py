@@ -0,0 +1,117 @@
+import json
+import re
+import threading
+import time
+from typing import Any, Iterator, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+
+def _tokens(text: str) -> int:
+    return max(1, (len(text) + 3) // 4)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic chat model for benchmarks.
+
+    Tool selection replies with the tool calls scripted for the question, limited to
+    the tools actually bound, as a real model couldn't call anything else. Structured
+    output requests (argument checks) confirm every numbered item. Given tool results
+    it writes a fixed-length answer. Each reply costs prefill_delay plus token_delay
+    per output token, so timings track how many calls, and how long a reply, a change
+    causes.
+    """
+
+    script: dict = {}
+    prefill_delay: float = 0.02
+    token_delay: float = 0.002
+    answer_tokens: int = 40
+
+    _calls: int = PrivateAttr(default=0)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def bind_tools(self, tools, tool_choice: Optional[Any] = None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _reply(self, messages: list[BaseMessage], tools: Optional[list] = None, tool_choice: Any = None) -> AIMessage:
+        with self._lock:
+            self._calls += 1
+        tools = tools or []
+        # Earlier turns of a session carry tool results too; only this question's count
+        last_question = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        results = [message for message in messages[last_question + 1:] if isinstance(message, ToolMessage)]
+        if results:
+            words = " ".join(f"{message.name} returned {len(str(message.content))} characters." for message in results)
+            words = " ".join([words + " The answer is based on these results."] * self.answer_tokens)
+            return AIMessage(content=" ".join(words.split()[:self.answer_tokens]))
+
+        if tool_choice and tools:
+            # with_structured_output: answer the schema, confirming every numbered item
+            spec = tools[0]["function"]
+            prompt = str(messages[-1].content)
+            checks = [{"item": int(n), "supported": True} for n in re.findall(r"^(\d+)\. ", prompt, re.MULTILINE)]
+            args = {"checks": checks} if "checks" in spec["parameters"].get("properties", {}) else {}
+            return AIMessage(content="", tool_calls=[{"name": spec["name"], "args": args, "id": "structured"}])
+
+        query = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        bound = {tool["function"]["name"] for tool in tools}
+        tool_calls = [
+            {"name": call["name"], "args": call["args"], "id": f"call_{i}"}
+            for i, call in enumerate(self.script.get(query, [])) if call["name"] in bound
+        ]
+        return AIMessage(content="" if tool_calls else "I don't know.", tool_calls=tool_calls)
+
+    def _output_tokens(self, message: AIMessage) -> int:
+        text = message.content + json.dumps([call["args"] for call in message.tool_calls])
+        return _tokens(text)
+
+    def _usage(self, messages: list[BaseMessage], message: AIMessage) -> dict:
+        prompt = _tokens("".join(str(m.content) for m in messages))
+        completion = self._output_tokens(message)
+        return {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._reply(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        message.usage_metadata = self._usage(messages, message)
+        # As Ollama reports prefill: prompt tokens evaluated and nanoseconds spent on them
+        message.response_metadata = {"prompt_eval_count": message.usage_metadata["input_tokens"],
+                                     "prompt_eval_duration": int(self.prefill_delay * 1e9)}
+        time.sleep(self.prefill_delay + self.token_delay * self._output_tokens(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message = self._reply(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        usage = self._usage(messages, message)
+        prefill = {"prompt_eval_count": usage["input_tokens"], "prompt_eval_duration": int(self.prefill_delay * 1e9)}
+        time.sleep(self.prefill_delay)
+        if message.tool_calls:
+            time.sleep(self.token_delay * self._output_tokens(message))
+            chunk = AIMessageChunk(content="", usage_metadata=usage, response_metadata=prefill, tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(message.tool_calls)
+            ])
+            yield ChatGenerationChunk(message=chunk)
+            return
+        words = message.content.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.token_delay)
+            # Usage arrives with the last chunk, as with Ollama
+            last = i == len(words) - 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=word if i == 0 else " " + word, usage_metadata=usage if last else None,
+                response_metadata=prefill if last else {}))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
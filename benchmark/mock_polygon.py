@@ -0,0 +1,141 @@
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Endpoint patterns and the fixture answering them; {ticker} and {name} in a fixture
+# are filled from the path (or the ticker query parameter), {price} from the ticker
+ROUTES = [
+    (re.compile(r"^/vX/reference/tickers/(?P<ticker>[^/]+)/events$"), "ticker_events.json"),
+    (re.compile(r"^/v3/reference/tickers/(?P<ticker>[^/]+)$"), "ticker_details.json"),
+    (re.compile(r"^/v3/reference/tickers$"), "tickers.json"),
+    (re.compile(r"^/v3/reference/dividends$"), "dividends.json"),
+    (re.compile(r"^/v1/marketstatus/now$"), "market_status.json"),
+    (re.compile(r"^/v2/snapshot/locale/us/markets/stocks/tickers$"), "snapshot_ticker.json"),
+    (re.compile(r"^/vX/reference/financials$"), "financials.json"),
+]
+
+# Daily bars are made up rather than recorded, so any date range has data
+AGGS_ROUTE = re.compile(r"^/v2/aggs/ticker/(?P<ticker>[^/]+)/range/1/day/(?P<start>[\d-]+)/(?P<end>[\d-]+)$")
+
+# Multi-ticker endpoints: the fixture is one row, repeated for each of the comma-separated
+# tickers parameter under this key
+PER_TICKER = {"snapshot_ticker.json": "tickers"}
+
+
+class MockPolygon:
+    """Local stand-in for api.polygon.io replaying recorded fixtures.
+
+    latency delays every response; rate_limit_every=N answers every Nth request with a
+    429 and Retry-After: 0, so the client's retry path gets exercised too.
+    """
+
+    def __init__(self, latency: float = 0.0, rate_limit_every: int = 0, fixtures_dir: str = FIXTURES_DIR):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.fixtures = {}
+        for name in os.listdir(fixtures_dir):
+            with open(os.path.join(fixtures_dir, name), "r") as file:
+                self.fixtures[name] = file.read()
+        self.names = {row["ticker"]: row["name"] for row in json.loads(self.fixtures["tickers.json"])["results"]}
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fill(self, fixture: str, ticker: str) -> str:
+        # A made-up but stable price per ticker, so comparisons have something to compare
+        price = f"{100 + sum(map(ord, ticker)) % 400}.25"
+        return (self.fixtures[fixture].replace("{ticker}", ticker).replace("{name}", self.names.get(ticker, ticker))
+                .replace("{price}", price))
+
+    def bars(self, ticker: str, start: str, end: str) -> list[dict]:
+        """Weekday bars swinging around the ticker's snapshot price; each day's bar depends
+        only on the ticker and the date, so overlapping ranges agree."""
+        base = 100 + sum(map(ord, ticker)) % 400
+        rows = []
+        day = date.fromisoformat(start)
+        while day <= date.fromisoformat(end):
+            if day.weekday() < 5:
+                rng = random.Random(f"{ticker}{day}")
+                close = base * (1 + 0.12 * math.sin(day.toordinal() / 15 + len(ticker))) * (1 + rng.gauss(0, 0.01))
+                open_ = close * (1 + rng.gauss(0, 0.01))
+                t = int(datetime(day.year, day.month, day.day, 4, tzinfo=timezone.utc).timestamp() * 1000)
+                rows.append({"o": round(open_, 2), "h": round(max(open_, close) * (1 + abs(rng.gauss(0, 0.005))), 2),
+                             "l": round(min(open_, close) * (1 - abs(rng.gauss(0, 0.005))), 2), "c": round(close, 2),
+                             "v": rng.randint(10_000_000, 90_000_000), "t": t, "n": rng.randint(100_000, 900_000)})
+            day += timedelta(days=1)
+        return rows
+
+    def respond(self, path: str) -> tuple[int, bytes]:
+        parsed = urlparse(path)
+        match = AGGS_ROUTE.match(parsed.path)
+        if match:
+            rows = self.bars(match["ticker"], match["start"], match["end"])
+            return 200, json.dumps({"ticker": match["ticker"], "adjusted": True, "status": "OK", "queryCount": len(rows),
+                                    "resultsCount": len(rows), "results": rows}).encode()
+        for pattern, fixture in ROUTES:
+            match = pattern.match(parsed.path)
+            if match:
+                params = parse_qs(parsed.query)
+                if fixture in PER_TICKER:
+                    rows = [json.loads(self.fill(fixture, ticker)) for ticker in params.get("tickers", ["AAPL"])[0].split(",")]
+                    return 200, json.dumps({"status": "OK", "count": len(rows), PER_TICKER[fixture]: rows}).encode()
+                ticker = match.groupdict().get("ticker") or params.get("ticker", ["AAPL"])[0]
+                return 200, self.fill(fixture, ticker).encode()
+        return 404, json.dumps({"status": "NOT_FOUND", "message": f"No fixture for {parsed.path}"}).encode()
+
+    def start(self) -> "MockPolygon":
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with mock._lock:
+                    mock.requests += 1
+                    throttled = mock.rate_limit_every and mock.requests % mock.rate_limit_every == 0
+                    mock.rate_limited += 1 if throttled else 0
+                if mock.latency:
+                    time.sleep(mock.latency)
+                status, body = (429, b'{"status":"ERROR","error":"rate limited"}') if throttled else mock.respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if throttled:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self) -> "MockPolygon":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
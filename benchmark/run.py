@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from benchmark.fake_llm import ScriptedChatModel
+from benchmark.mock_polygon import MockPolygon
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS_PATH = os.path.join(BENCHMARK_DIR, "scenarios.json")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Absolute slack on top of the relative tolerance, so sub-millisecond nodes don't flap
+SLACK_MS = 5.0
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p * len(ordered)) - 1, 0)]
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Wall time of every graph node run and the number of chat model calls."""
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.llm_calls = 0
+        self._starts = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._starts[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        started = self._starts.pop(run_id, None)
+        if started:
+            with self._lock:
+                self.durations[started[0]].append((time.perf_counter() - started[1]) * 1000)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.on_chain_end(None, run_id=run_id)
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        with self._lock:
+            self.llm_calls += 1
+
+
+def load_scenarios(path: str = SCENARIOS_PATH) -> list[dict]:
+    """Scenarios with their question filled in; numbered cases come from user_queries_examples.txt."""
+    from tools.router import load_eval_cases
+
+    with open(path, "r") as file:
+        scenarios = json.load(file)
+    numbers = {s["case"]: s["case"] for s in scenarios if "case" in s}
+    questions = {case: query for query, case in load_eval_cases(labels=numbers)}
+    for scenario in scenarios:
+        if "case" in scenario:
+            scenario["query"] = questions[scenario["case"]]
+    return scenarios
+
+
+def mock_agent(mock: MockPolygon, workdir: str, fast_path: bool = True, polygon_cache: bool = False,
+               prefill_delay: float = 0.02, token_delay: float = 0.002):
+    """A QueryAgent wired to the mock Polygon server and the scripted model, with a ticker
+    index in workdir seeded from the fixtures."""
+    # Tools read these when they're first imported or instantiated
+    os.environ.update({
+        "POLYGON_API_KEY": "benchmark",
+        "POLYGON_BASE_URL": mock.url,
+        "POLYGON_CACHE": "true" if polygon_cache else "false",
+        "TICKER_INDEX_PATH": os.path.join(workdir, "tickers.sqlite"),
+        "POLYGON_BARS_DIR": os.path.join(workdir, "bars"),
+    })
+    from agent.graph import QueryAgent
+    from tools.polygon.ticker_index import get_index
+
+    get_index().upsert(json.loads(mock.fixtures["tickers.json"])["results"])
+    scenarios = load_scenarios()
+    llm = ScriptedChatModel(script={s["query"]: s["tool_calls"] for s in scenarios},
+                            prefill_delay=prefill_delay, token_delay=token_delay)
+    return QueryAgent(llm, use_fast_path=fast_path), scenarios
+
+
+def run(iterations: int = 3, latency: float = 0.01, rate_limit_every: int = 0, prefill_delay: float = 0.02,
+        token_delay: float = 0.002, fast_path: bool = True, polygon_cache: bool = False) -> dict:
+    with MockPolygon(latency=latency, rate_limit_every=rate_limit_every) as mock, tempfile.TemporaryDirectory() as tmp:
+        from agent.streaming import stream_answer
+
+        agent, scenarios = mock_agent(mock, tmp, fast_path, polygon_cache, prefill_delay, token_delay)
+
+        async def answer(query: str) -> dict:
+            async for event in stream_answer(agent.chain, query, config={"callbacks": [timer]}):
+                if event["type"] == "answer":
+                    return event
+
+        timer = NodeTimer()
+        totals, ttfts, per_scenario = [], [], []
+        for iteration in range(iterations):
+            for scenario in scenarios:
+                llm_before, http_before = timer.llm_calls, mock.requests
+                # Streamed, as users see it: time to first answer token is the headline number
+                state = asyncio.run(answer(scenario["query"]))
+                totals.append(state["seconds"] * 1000)
+                if state["ttft"] is not None:
+                    ttfts.append(state["ttft"] * 1000)
+                if iteration == 0:
+                    per_scenario.append({
+                        "query": scenario["query"],
+                        "route": state["route"],
+                        "llm_calls": timer.llm_calls - llm_before,
+                        "http_calls": mock.requests - http_before,
+                    })
+
+    queries = iterations * len(scenarios)
+    return {
+        "config": {"iterations": iterations, "latency": latency, "rate_limit_every": rate_limit_every,
+                   "prefill_delay": prefill_delay, "token_delay": token_delay, "fast_path": fast_path,
+                   "polygon_cache": polygon_cache},
+        "queries": queries,
+        "ttft": {"p50_ms": round(percentile(ttfts, 0.5), 2), "p95_ms": round(percentile(ttfts, 0.95), 2)},
+        "end_to_end": {"p50_ms": round(percentile(totals, 0.5), 2), "p95_ms": round(percentile(totals, 0.95), 2)},
+        "nodes": {
+            node: {"count": len(values), "p50_ms": round(percentile(values, 0.5), 2), "p95_ms": round(percentile(values, 0.95), 2)}
+            for node, values in sorted(timer.durations.items())
+        },
+        "llm_calls_per_query": round(timer.llm_calls / queries, 3),
+        "http_calls_per_query": round(mock.requests / queries, 3),
+        "rate_limited": mock.rate_limited,
+        "scenarios": per_scenario,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.5) -> list[str]:
+    """Regressions against a baseline: slower time to first token or node p50/p95 beyond
+    tolerance, or any extra LLM or HTTP call."""
+    regressions = []
+    if report["config"] != baseline["config"]:
+        regressions.append(f"config differs from baseline: {report['config']} vs {baseline['config']}")
+        return regressions
+
+    timings = {key: (report[key], baseline[key]) for key in ("ttft", "end_to_end") if key in baseline}
+    timings.update({node: (report["nodes"].get(node, {}), values) for node, values in baseline["nodes"].items()})
+    for name, (current, base) in timings.items():
+        for metric in ("p50_ms", "p95_ms"):
+            if metric in current and current[metric] > base[metric] * (1 + tolerance) + SLACK_MS:
+                regressions.append(f"{name} {metric}: {current[metric]} > baseline {base[metric]}")
+
+    for metric in ("llm_calls_per_query", "http_calls_per_query"):
+        if report[metric] > baseline[metric]:
+            regressions.append(f"{metric}: {report[metric]} > baseline {baseline[metric]}")
+    base_scenarios = {s["query"]: s for s in baseline["scenarios"]}
+    for scenario in report["scenarios"]:
+        base = base_scenarios.get(scenario["query"])
+        for metric in ("llm_calls", "http_calls"):
+            if base and scenario[metric] > base[metric]:
+                regressions.append(f"{scenario['query']!r} {metric}: {scenario[metric]} > baseline {base[metric]}")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the query graph")
+    parser.add_argument("-n", "--iterations", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.01, help="Mock Polygon response delay in seconds")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth Polygon request with a 429")
+    parser.add_argument("--prefill-delay", type=float, default=0.02, help="Fake model delay per call in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Fake model delay per output token in seconds")
+    parser.add_argument("--no-fast-path", action="store_true")
+    parser.add_argument("--polygon-cache", action="store_true", help="Keep the Polygon response cache on across iterations")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative slowdown of p50/p95")
+    args = parser.parse_args(argv)
+
+    report = run(args.iterations, args.latency, args.rate_limit_every, args.prefill_delay, args.token_delay,
+                 not args.no_fast_path, args.polygon_cache)
+    print(json.dumps({key: value for key, value in report.items() if key != "scenarios"}, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline, "r") as file:
+        regressions = compare(report, json.load(file), args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS against baseline:", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        return 1
+    print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,143 +1,149 @@
 import os
+import argparse
+import asyncio
 import getpass
+import json
+import sys
+import time
 from dotenv import load_dotenv
 
+import langchain
+from langchain.globals import set_llm_cache
 from langchain_ollama import ChatOllama
-from langchain_core.messages import HumanMessage
 
-from typing_extensions import TypedDict
-from langgraph.graph import StateGraph, START, END
 from IPython.display import Image, display
 
-from tools.polygon.news import TickerNews
-from tools.math.multiply import Multiply
-from tools.time.current import CurrentTimeTool
-
-from pydantic import BaseModel, Field
+from agent import tracing
+from agent.batch import write_batch
+from agent.graph import QueryAgent
+from agent.llm_cache import PersistentLLMCache
+from agent.session import PrefillMeter, Session
+from agent.streaming import StreamStats, stream_answer
+from tools.polygon import coalesce, ratelimit
 
 
 # Load environment variables from .env file
 load_dotenv()
 
-polygon_api_key = os.getenv("POLYGON_API_KEY")
-
-ticker_news = TickerNews(api_key=polygon_api_key)
-multiply = Multiply()
-current_time_in = CurrentTimeTool()
-
-llm = ChatOllama(model='llama3.2', temperature=0)
-llm_with_tools = llm.bind_tools([multiply, current_time_in, ticker_news])
-
-available_tools = { 
-    "multiply": multiply, 
-    "current_time_in": current_time_in, 
-    "ticker_news": ticker_news ,
-}
-
-
-# Graph state
-class State(TypedDict):
-    user_query: str
-    tool_calls: str
-    output: str
-
-check_field_presence_prompt = """
-User asked this question:
-{user_query}
-
-Here is the field description:
-{field_description}
-
-Here is the field type:
-{field_type}
-
-Here is the field value:
-{field_value}
-
-You are a helpful assistant that can help me to check if the field is present in the user query. 
-You will be given a user query and a field name and description.
-You need to check if the field whith specified type is present in the user query.
-
-If fields type doesn't match, you need to return False.
-If field is not present, you need to return False.
-Otherwise return True.
-"""
-
-class CheckFieldPresence(BaseModel):
-    presence: bool = Field(None, description="Defines if the field is present in the file.")
-
-# Augment the LLM with schema for structured output
-field_presence_llm = llm.with_structured_output(CheckFieldPresence)
-
-
-# Nodes
-def select_tools(state: State):
-    msg = llm_with_tools.invoke(state['user_query'])
-    return {"tool_calls": msg.tool_calls}
-
-def validate_tool_inputs(state: State):
-    tool_calls = state['tool_calls']
-    new_tool_calls = []
-    for tool_call in tool_calls:
-        new_tool_call = tool_call.copy()
-        new_tool_call['arg_validation_msgs'] = {}
-        for key, value in new_tool_call['args'].items():
-            
-            q = check_field_presence_prompt.format(
-                user_query=state['user_query'],
-                field_name=key,
-                field_value=value,
-                field_type=available_tools[new_tool_call['name']].args[key]['type'],
-                field_description=available_tools[new_tool_call['name']].args[key]['description']
-            )
-
-            field_presence_result = field_presence_llm.invoke(q)
-            
-            # TODO: add validation result to the tool call
-            # new_tool_call['arg_validation_msgs'][key] = field_presence_result.presence
-            new_tool_call['arg_validation_msgs'][key] = True
-
-        new_tool_calls.append(new_tool_call)
-
-    return {"tool_calls": new_tool_calls}
-
-def execute_tool_call(state: State):
-
-    messages = [HumanMessage(state['user_query'])]
-    ai_msg = llm_with_tools.invoke(messages)
-    messages.append(ai_msg)
-
-    for tool_call in ai_msg.tool_calls:
-        selected_tool = { 
-            "multiply": multiply, 
-            "current_time_in": current_time_in, 
-            "ticker_news": ticker_news }[tool_call['name'].lower()]
-
-        tool_msg = selected_tool.invoke(tool_call)
-        messages.append(tool_msg)
-
-    result_msg = llm_with_tools.invoke(messages)
-
-    return {"output": result_msg.content}
-
-workflow = StateGraph(State)
-workflow.add_node("select_tools", select_tools)
-workflow.add_edge(START, "select_tools")
-
-workflow.add_node("validate_tool_inputs", validate_tool_inputs)
-workflow.add_edge("select_tools", "validate_tool_inputs")
-
-workflow.add_node("execute_tool_call", execute_tool_call)
-workflow.add_edge("validate_tool_inputs", "execute_tool_call")
-
-workflow.add_edge("execute_tool_call", END)
-
-chain = workflow.compile()
-
-
-# Get user input
-# example: "Can you help me to get news for AMZN ticker?"
-while True:
-    user_query = input("Enter your question: ")
-    state = chain.invoke({"user_query": user_query})
-    print(state['output'])
\ No newline at end of file
+# Kept loaded between turns, with a context big enough for the history, so Ollama can
+# reuse the prompt prefix it already evaluated instead of prefilling it all again
+llm = ChatOllama(model='llama3.2', temperature=0, keep_alive=os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+                 num_ctx=int(os.getenv("OLLAMA_NUM_CTX", "8192")))
+
+# Graph nodes live in agent/graph.py so the benchmark can run them around a scripted model
+agent = QueryAgent(llm)
+registry = agent.registry
+fast_path = agent.fast_path
+validator = agent.validator
+chain = agent.chain
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Answer questions with LLM tool calls')
+    parser.add_argument('-d', '--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('-c', '--cache', action='store_true', help='Enable the persistent LLM response cache')
+    parser.add_argument('-b', '--batch', metavar='PATH', help='Answer queries from a JSONL or text file ("-" for stdin) instead of prompting')
+    parser.add_argument('-o', '--output', default='-', help='Where batch results are written as JSONL (default: stdout)')
+    parser.add_argument('-j', '--concurrency', type=int, default=int(os.getenv("BATCH_CONCURRENCY", "4")), help='Queries in flight at once in batch mode')
+    parser.add_argument('--resume', action='store_true', help='Append to --output, skipping ids it already answered')
+    parser.add_argument('-t', '--trace', action='store_true', help='Record per-node traces and metrics')
+    parser.add_argument('--profile', action='store_true', help='Sample stacks while running and report the hot spots on exit')
+    parser.add_argument('-s', '--stream', action='store_true', help='Print progress and answer tokens as they arrive')
+    parser.add_argument('--no-history', action='store_true', help='Answer every question on its own, without the conversation so far')
+    args = parser.parse_args()
+
+    DEBUG = os.getenv("DEBUG", "false").lower() == "true" or args.debug
+    CACHE = os.getenv("CACHE", "false").lower() == "true" or args.cache
+
+    TRACING = tracing.TRACING or args.trace
+
+    langchain.debug = DEBUG
+    if TRACING:
+        # Traces go to TRACE_PATH as JSONL, totals to TRACE_METRICS_PATH in Prometheus format
+        tracing.enable()
+    profiler = tracing.SamplingProfiler().start() if args.profile else None
+    llm_cache = None
+    if CACHE:
+        # Covers tool selection, argument validation and synthesis calls alike
+        llm_cache = PersistentLLMCache()
+        set_llm_cache(llm_cache)
+
+    stream_stats = StreamStats()
+    # Follow-ups ("and for Meta?") are asked in the conversation so far
+    session = None if args.no_history else Session()
+    prefill = PrefillMeter()
+
+    def print_stats(file=None):
+        if args.stream:
+            print(f"Streaming: {json.dumps(stream_stats.as_dict())}", file=file)
+        print(f"Fast path: {json.dumps(fast_path.stats.as_dict())}", file=file)
+        if session:
+            print(f"Session: {json.dumps(session.stats_dict())}", file=file)
+        print(f"Validation: {json.dumps(validator.stats_dict())}", file=file)
+        print(f"Polygon coalescing: {json.dumps(coalesce.stats())}", file=file)
+        if ratelimit.get_limiter():
+            print(f"Polygon rate limit: {json.dumps(ratelimit.get_limiter().stats_dict())}", file=file)
+        if llm_cache:
+            print(f"LLM cache: {json.dumps(llm_cache.stats_dict())}", file=file)
+        if TRACING:
+            tracing.write_metrics()
+            print(f"Traces: {tracing.TRACE_PATH}, metrics: {tracing.METRICS_PATH}", file=file)
+        if profiler:
+            profiler.stop()
+            profiler.write_collapsed(".cache/profile.txt")
+            print(f"Profile ({profiler.samples} samples, collapsed stacks in .cache/profile.txt):", file=file)
+            for frame, share in profiler.top():
+                print(f"  {share:6.1%}  {frame}", file=file)
+
+    if args.batch:
+        if args.resume and args.output == '-':
+            parser.error("--resume needs --output to be a file")
+
+        def record(result):
+            if result.get('route') == "graph":
+                fast_path.record_fallback(result['seconds'])
+
+        summary = asyncio.run(write_batch(chain, args.batch, args.output, args.concurrency, args.resume, record))
+        # Results may be on stdout, so the summary goes to stderr
+        print(f"Batch: {json.dumps(summary)}", file=sys.stderr)
+        print_stats(sys.stderr)
+        sys.exit(1 if summary['errors'] else 0)
+
+    async def stream_query(user_query: str) -> dict:
+        async for event in stream_answer(chain, user_query, {"callbacks": [prefill]}, stream_stats, session):
+            if event['type'] == "token":
+                print(event['text'], end="", flush=True)
+            elif event['type'] == "answer":
+                print(f"\n[first token {event['ttft']}s, answer {event['seconds']}s]")
+                return event
+            else:
+                details = {key: value for key, value in event.items() if key != "type"}
+                print(f"[{event['type']}] {json.dumps(details)}", flush=True)
+
+    # Get user input
+    # example: "Can you help me to get news for AMZN ticker?"
+    while True:
+        try:
+            user_query = input("Enter your question: ")
+        except (EOFError, KeyboardInterrupt):
+            print()
+            print_stats()
+            break
+        start = time.perf_counter()
+        if args.stream:
+            # Progress and tokens are printed as they come; ttft is what the user feels
+            state = asyncio.run(stream_query(user_query))
+        else:
+            state = chain.invoke(session.inputs(user_query) if session else {"user_query": user_query},
+                                 config={"callbacks": [prefill]})
+            if session:
+                session.record(state)
+            print(state['output'])
+        turn = prefill.turn()
+        if turn['llm_calls']:
+            # Most of the latency on CPU; small when the prompt cache held the prefix
+            print(f"[prefill {turn['prefill_seconds']}s, {turn['prefill_tokens']} prompt tokens evaluated in {turn['llm_calls']} LLM calls]")
+        if state['route'] != "fast_path":
+            fast_path.record_fallback(time.perf_counter() - start)
+        if state.get('trace'):
+            print(f"[trace] {tracing.summarize(tracing.finish(state['trace']))}")
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import threading
+
+from agent.batch import run_batch, write_batch
+
+
+class EchoChain:
+    """Answers every query with itself, recording the threads that ran it."""
+
+    def __init__(self):
+        self.threads = set()
+
+    def invoke(self, inputs: dict) -> dict:
+        self.threads.add(threading.current_thread().name)
+        return {"route": "fast_path", "output": inputs["user_query"].upper()}
+
+
+def _lines(path) -> list[dict]:
+    return [json.loads(line) for line in open(path).read().splitlines()]
+
+
+def test_run_batch_leaves_the_loops_default_executor_alone():
+    async def main():
+        loop = asyncio.get_running_loop()
+        before = getattr(loop, "_default_executor", None)
+        results = [r async for r in run_batch(EchoChain(), [("1", "a"), ("2", "b"), ("3", "c")], concurrency=2)]
+        return results, getattr(loop, "_default_executor", None) is before
+
+    results, unchanged = asyncio.run(main())
+    assert sorted(r["output"] for r in results) == ["A", "B", "C"]
+    assert unchanged
+
+
+def test_resume_counts_only_input_queries_it_skips(tmp_path):
+    queries, output = tmp_path / "queries.txt", tmp_path / "out.jsonl"
+    queries.write_text("first\nsecond\n")
+    output.write_text(json.dumps({"id": "1", "output": "FIRST"}) + "\n"
+                      + json.dumps({"id": "from-another-file", "output": "X"}) + "\n")
+    summary = asyncio.run(write_batch(EchoChain(), str(queries), str(output), resume=True))
+    assert summary["skipped"] == 1 and summary["queries"] == 1
+    assert [record["id"] for record in _lines(output)] == ["1", "from-another-file", "2"]
+
+
+def test_resume_after_a_cut_short_line_keeps_new_records_whole(tmp_path):
+    queries, output = tmp_path / "queries.txt", tmp_path / "out.jsonl"
+    queries.write_text("first\nsecond\n")
+    output.write_text(json.dumps({"id": "1", "output": "FIRST"}) + '\n{"id": "2", "out')
+    asyncio.run(write_batch(EchoChain(), str(queries), str(output), resume=True))
+    lines = output.read_text().splitlines()
+    assert lines[1] == '{"id": "2", "out'
+    assert json.loads(lines[2])["id"] == "2"
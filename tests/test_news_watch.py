@@ -0,0 +1,58 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from tools.polygon.client import PolygonResponse
+from tools.polygon.news_watch import FEED, NewsWatcher
+
+
+def _ago(hours: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class StubNewsTool:
+    """Answers news requests from a list of articles, filtered as Polygon would."""
+
+    def __init__(self):
+        self.articles = []
+
+    def add(self, id: str, tickers: list[str], published_utc: str):
+        self.articles.append({"id": id, "tickers": tickers, "published_utc": published_utc,
+                              "article_url": f"https://news.example/{id}"})
+
+    def _get(self, path, params=None, headers=None):
+        params = params or {}
+        rows = sorted((a for a in self.articles
+                       if a["published_utc"] >= params.get("published_utc.gte", "")
+                       and ("ticker" not in params or params["ticker"] in a["tickers"])),
+                      key=lambda a: a["published_utc"])
+        return PolygonResponse(200, json.dumps({"results": rows}).encode(), {}, path)
+
+
+def test_cross_tagged_article_does_not_move_other_tickers_cursor(tmp_path):
+    tool = StubNewsTool()
+    tool.add("both", ["AAPL", "MSFT"], _ago(3))
+    tool.add("msft-earlier", ["MSFT"], _ago(4))
+    watcher = NewsWatcher(tool, ["AAPL", "MSFT"], path=str(tmp_path / "news.sqlite"))
+
+    assert sorted(article["id"] for article in watcher.poll()) == ["both", "msft-earlier"]
+
+    tool.add("msft-later", ["MSFT"], _ago(1))
+    assert [article["id"] for article in watcher.poll()] == ["msft-later"]
+    assert watcher.poll() == []
+
+
+def test_feed_moves_watched_ticker_cursors(tmp_path):
+    tool = StubNewsTool()
+    tool.add("aapl", ["AAPL"], _ago(5))
+    tool.add("msft", ["MSFT"], _ago(4))
+    watcher = NewsWatcher(tool, ["AAPL", "MSFT"], path=str(tmp_path / "news.sqlite"), feed_threshold=1)
+
+    # First poll: the feed plus each ticker catching up on its own
+    assert sorted(article["id"] for article in watcher.poll()) == ["aapl", "msft"]
+
+    tool.add("both", ["AAPL", "MSFT", "TSLA"], _ago(1))
+    tool.add("tsla", ["TSLA"], _ago(1))
+    new = watcher.poll()
+    assert [(article["id"], article["watched"]) for article in new] == [("both", ["AAPL", "MSFT"])]
+    cursors = {stream: watcher._cursor(stream)[0] for stream in (FEED, "AAPL", "MSFT")}
+    assert cursors["AAPL"] == cursors["MSFT"] == cursors[FEED] == new[0]["published_utc"]
@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+from tools.polygon.cache import ResponseCache
+from tools.polygon.client import PolygonResponse, PolygonTool
+from tools.polygon.pagination import apaginate, paginate
+
+PAGES = 5
+
+
+class PagedTool(PolygonTool):
+    """Serves PAGES pages of two reference rows each, linked by next_url."""
+    name: str = "paged"
+    description: str = "Paged reference listing"
+
+    def _run(self):
+        pass
+
+    def _page(self, url: str, query: dict) -> PolygonResponse:
+        page = int(query.get("cursor", 0))
+        body = {"results": [{"page": page, "row": row} for row in range(2)]}
+        if page + 1 < PAGES:
+            body["next_url"] = f"{url}?cursor={page + 1}"
+        return PolygonResponse(200, json.dumps(body).encode(), {}, url)
+
+    def _fetch(self, url, query, headers=None):
+        return self._page(url, query)
+
+    async def _afetch(self, url, query, headers=None):
+        return self._page(url, query)
+
+
+def _tool() -> PolygonTool:
+    return PagedTool(api_key="test", cache=ResponseCache())
+
+
+def test_streaming_pages_leaves_the_cache_untouched():
+    tool = _tool()
+    tool._get("/v3/reference/exchanges")
+    assert len(list(paginate(tool, "/v3/reference/tickers", {"limit": 2}))) == PAGES * 2
+    assert tool.cache.stats_dict()["size"] == 1
+
+
+def test_async_streaming_pages_leaves_the_cache_untouched():
+    tool = _tool()
+
+    async def rows():
+        return [row async for row in apaginate(tool, "/v3/reference/tickers", {"limit": 2})]
+
+    assert len(asyncio.run(rows())) == PAGES * 2
+    assert tool.cache.stats_dict()["size"] == 0
+
+
+def test_single_requests_are_still_cached():
+    tool = _tool()
+    tool._get("/v3/reference/tickers", {"limit": 2})
+    assert tool._get("/v3/reference/tickers", {"limit": 2}).from_cache
@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from agent.planner import PlanExecutor
+
+
+def _execute(tool_calls):
+    with ThreadPoolExecutor(4) as executor:
+        return PlanExecutor(lambda call: (f"{call['name']} ok", True), executor).execute(tool_calls)
+
+
+def test_dangling_reference_fails_only_its_call_and_dependents():
+    results = _execute([
+        {"name": "a", "args": {"x": "$7"}},
+        {"name": "b", "args": {}},
+        {"name": "c", "args": {"x": "$1"}},
+        {"name": "d", "args": {"x": "$2"}},
+    ])
+    errors = [error for _, _, error in results]
+    assert "refers to step $7" in errors[0]
+    assert errors[1] is None and results[1][1] == "b ok"
+    assert errors[2].startswith("Skipped: depends on $1 (a)")
+    assert errors[3] is None and results[3][0]["args"] == {"x": "b ok"}
+
+
+def test_cycle_fails_only_its_members_and_dependents():
+    results = _execute([
+        {"name": "a", "args": {"x": "$2"}},
+        {"name": "b", "args": {"x": "$1"}},
+        {"name": "c", "args": {"x": "$2"}},
+        {"name": "d", "args": {}},
+    ])
+    errors = [error for _, _, error in results]
+    assert errors[0] == errors[1] == "Circular references between a, b"
+    assert errors[2].startswith("Skipped: depends on $2 (b)")
+    assert errors[3] is None
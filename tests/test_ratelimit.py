@@ -0,0 +1,27 @@
+import threading
+
+import pytest
+
+from tools.polygon.ratelimit import BATCH, INTERACTIVE, TokenBucket
+
+
+def test_batch_acquires_succeed_with_single_request_burst():
+    bucket = TokenBucket(600, burst=1)
+    done = []
+    thread = threading.Thread(target=lambda: done.extend(bucket.acquire(BATCH) for _ in range(3)), daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+    assert len(done) == 3
+
+
+def test_batch_leaves_reserve_for_interactive():
+    bucket = TokenBucket(60, burst=10, reserve=0.2)
+    for _ in range(8):
+        assert bucket._take(BATCH) == 0.0
+    assert bucket._take(BATCH) > 0
+    assert bucket._take(INTERACTIVE) == 0.0
+
+
+def test_burst_below_one_request_is_rejected():
+    with pytest.raises(ValueError):
+        TokenBucket(60, burst=0.5)
@@ -0,0 +1,36 @@
+import asyncio
+
+from agent.server import QueryService
+
+
+class SlowChain:
+    """Streams a fast-path answer after a pause, logging when each query starts and ends."""
+
+    def __init__(self):
+        self.log = []
+
+    async def astream_events(self, inputs, config=None, version=None):
+        query = inputs["user_query"]
+        self.log.append(("start", query, len(inputs.get("history") or [])))
+        await asyncio.sleep(0.05)
+        self.log.append(("end", query))
+        yield {"event": "on_chain_end", "name": "fast_path", "metadata": {"langgraph_node": "fast_path"},
+               "data": {"output": {"route": "fast_path", "output": query.upper()}}}
+
+
+def test_concurrent_queries_in_one_session_take_turns():
+    chain = SlowChain()
+
+    async def main():
+        service = QueryService(chain, workers=2)
+        service.start()
+        jobs = [service.submit(query, "client", session="s") for query in ("first", "second")]
+        answers = [[event async for event in service.events(job)][-1] for job in jobs]
+        await service.stop()
+        return service, answers
+
+    service, answers = asyncio.run(main())
+    assert [answer["output"] for answer in answers] == ["FIRST", "SECOND"]
+    # The second query starts once the first is recorded, with it in its history
+    assert chain.log == [("start", "first", 0), ("end", "first"), ("start", "second", 2), ("end", "second")]
+    assert len(service.session("client", "s").turns) == 2
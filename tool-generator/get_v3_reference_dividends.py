@@ -1,9 +1,10 @@
 import os
-from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-import requests
 from typing import Optional
 
+from tools.polygon.client import PolygonError, PolygonTool
+from tools.polygon.pagination import apaginate, paginate
+
 class ToolInputSchema(BaseModel):
     ticker: Optional[str] = Field(None, description="The stock ticker symbol to get dividends for (e.g., AAPL)", pattern="^[A-Z]+$", min_length=1, max_length=5)
     ex_dividend_date: Optional[str] = Field(None, description="Query by ex-dividend date with the format YYYY-MM-DD")
@@ -16,26 +17,78 @@ class ToolInputSchema(BaseModel):
     limit: Optional[int] = Field(10, description="Limit the number of results returned, default is 10 and max is 1000")
     sort: Optional[str] = Field(None, description="Sort field used for ordering. Options: ex_dividend_date, pay_date, declaration_date, record_date, cash_amount, ticker")
     order: Optional[str] = Field(None, description="Order results based on the sort field. Options: asc, desc")
+    max_rows: Optional[int] = Field(None, description="Follow pagination until this many results are collected. By default only the first page is returned")
 
-class DividendsV3(BaseTool):
+class DividendsV3(PolygonTool):
     name: str = "dividends_v3"
     description: str = "Get a list of historical cash dividends, including the ticker symbol, declaration date, ex-dividend date, record date, pay date, frequency, and amount"
     args_schema: type[BaseModel] = ToolInputSchema
-    api_key: str = Field(..., exclude=True)
-
-    def __init__(self, api_key: str):
-        super().__init__(api_key=api_key)
 
     def _run(self, ticker: Optional[str] = None, ex_dividend_date: Optional[str] = None, 
              record_date: Optional[str] = None, declaration_date: Optional[str] = None, 
              pay_date: Optional[str] = None, frequency: Optional[int] = None, 
              cash_amount: Optional[float] = None, dividend_type: Optional[str] = None,
-             limit: int = 10, sort: Optional[str] = None, order: Optional[str] = None):
+             limit: int = 10, sort: Optional[str] = None, order: Optional[str] = None,
+             max_rows: Optional[int] = None):
         # Tool implementation
         print(f"TOOL CALL: Getting dividends data")
         
+        if max_rows:
+            try:
+                results = list(paginate(self, "/v3/reference/dividends", self._params(
+                    ticker, ex_dividend_date, record_date, declaration_date, pay_date,
+                    frequency, cash_amount, dividend_type, limit, sort, order), max_rows=max_rows))
+            except PolygonError as e:
+                return self._error(e.response)
+            return {"status": "OK", "count": len(results), "results": results}
+
+        response = self._get("/v3/reference/dividends", params=self._params(
+            ticker, ex_dividend_date, record_date, declaration_date, pay_date,
+            frequency, cash_amount, dividend_type, limit, sort, order))
+        
+        print(f"TOOL RESPONSE: Status code {response.status_code}")
+        
+        return response.json()
+
+    async def _arun(self, ticker: Optional[str] = None, ex_dividend_date: Optional[str] = None, 
+                    record_date: Optional[str] = None, declaration_date: Optional[str] = None, 
+                    pay_date: Optional[str] = None, frequency: Optional[int] = None, 
+                    cash_amount: Optional[float] = None, dividend_type: Optional[str] = None,
+                    limit: int = 10, sort: Optional[str] = None, order: Optional[str] = None,
+                    max_rows: Optional[int] = None):
+        if max_rows:
+            try:
+                results = [row async for row in apaginate(self, "/v3/reference/dividends", self._params(
+                    ticker, ex_dividend_date, record_date, declaration_date, pay_date,
+                    frequency, cash_amount, dividend_type, limit, sort, order), max_rows=max_rows)]
+            except PolygonError as e:
+                return self._error(e.response)
+            return {"status": "OK", "count": len(results), "results": results}
+
+        response = await self._aget("/v3/reference/dividends", params=self._params(
+            ticker, ex_dividend_date, record_date, declaration_date, pay_date,
+            frequency, cash_amount, dividend_type, limit, sort, order))
+        
+        return response.json()
+
+    def stream(self, ticker: Optional[str] = None, ex_dividend_date: Optional[str] = None, 
+               record_date: Optional[str] = None, declaration_date: Optional[str] = None, 
+               pay_date: Optional[str] = None, frequency: Optional[int] = None, 
+               cash_amount: Optional[float] = None, dividend_type: Optional[str] = None,
+               limit: int = 1000, sort: Optional[str] = None, order: Optional[str] = None,
+               max_rows: Optional[int] = None, max_bytes: Optional[int] = None):
+        """Lazily yield every matching dividend across pages, for bulk jobs."""
+        return paginate(self, "/v3/reference/dividends", self._params(
+            ticker, ex_dividend_date, record_date, declaration_date, pay_date,
+            frequency, cash_amount, dividend_type, limit, sort, order), max_rows=max_rows, max_bytes=max_bytes)
+
+    def _error(self, response):
+        return {"error": f"API request failed with status code {response.status_code}", "details": response.text}
+
+    def _params(self, ticker, ex_dividend_date, record_date, declaration_date, pay_date,
+                frequency, cash_amount, dividend_type, limit, sort, order) -> dict:
         # Build query parameters
-        params = {"apiKey": self.api_key, "limit": limit}
+        params = {"limit": limit}
         
         if ticker:
             params["ticker"] = ticker
@@ -57,15 +110,14 @@ class DividendsV3(BaseTool):
             params["sort"] = sort
         if order:
             params["order"] = order
-        
-        response = requests.get("https://api.polygon.io/v3/reference/dividends", params=params)
-        
-        print(f"TOOL RESPONSE: Status code {response.status_code}")
-        
-        return response.json()
+        return params
 
 if __name__ == "__main__":
+    # From the repo root: python -m tool-generator.get_v3_reference_dividends
     api_key = os.getenv("POLYGON_API_KEY")
     tool = DividendsV3(api_key=api_key)
     # Example: Get dividends for Apple
     print(tool.invoke({"ticker": "AAPL", "limit": 5}))
+    # Example: Stream all quarterly dividend payers
+    for dividend in tool.stream(frequency=4, max_rows=2000):
+        print(dividend["ticker"], dividend["cash_amount"])
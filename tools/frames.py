@@ -0,0 +1,126 @@
+import re
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from tools.shaping import PROJECTIONS, _decode, _flatten, _lookup
+
+DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _column(values: list) -> np.ndarray:
+    """Numbers become float64 (NaN for missing), ISO dates datetime64[D] (NaT), anything else objects."""
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    if present and all(isinstance(value, str) and DATE.match(value) for value in present):
+        return np.array(["NaT" if value is None else value for value in values], dtype="datetime64[D]")
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+class Frame:
+    """Columnar view of Polygon result rows: one NumPy array per (dotted) field.
+
+    Built once from a tool's JSON rows so analytics run as array operations instead
+    of Python loops, or the model reading the rows itself.
+    """
+
+    def __init__(self, columns: Optional[dict] = None):
+        self.columns = {name: np.asarray(values) for name, values in (columns or {}).items()}
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns differ in length: {sorted(lengths)}")
+
+    @classmethod
+    def from_records(cls, rows: Iterable[dict], fields: Optional[list[str]] = None) -> "Frame":
+        flat_rows = [_flatten(row) for row in rows if isinstance(row, dict)]
+        if fields is None:
+            fields = list(dict.fromkeys(key for row in flat_rows for key in row))
+        return cls({name: _column([row.get(name) for row in flat_rows]) for name in fields})
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def get(self, name: str) -> Optional[np.ndarray]:
+        return self.columns.get(name)
+
+    def __repr__(self) -> str:
+        return f"Frame({len(self)} rows: {', '.join(self.columns)})"
+
+    def take(self, index) -> "Frame":
+        """Rows selected by a boolean mask or integer indices."""
+        return Frame({name: values[index] for name, values in self.columns.items()})
+
+    def sort(self, name: str, descending: bool = False) -> "Frame":
+        order = np.argsort(self.columns[name], kind="stable")
+        return self.take(order[::-1] if descending else order)
+
+    def between(self, name: str, start=None, end=None) -> "Frame":
+        """Rows whose `name` lies in [start, end]; either bound may be left open."""
+        values = self.columns[name]
+        mask = np.ones(len(values), dtype=bool)
+        if start is not None:
+            mask &= values >= np.asarray(start, dtype=values.dtype)
+        if end is not None:
+            mask &= values <= np.asarray(end, dtype=values.dtype)
+        return self.take(mask)
+
+    def groups(self, name: str) -> dict[Any, "Frame"]:
+        """One frame per distinct value of `name`, e.g. per ticker."""
+        keys, inverse = np.unique(self.columns[name].astype(str), return_inverse=True)
+        return {key: self.take(inverse == i) for i, key in enumerate(keys)}
+
+    def to_records(self) -> list[dict]:
+        names = list(self.columns)
+        return [dict(zip(names, (value.item() if hasattr(value, "item") else value for value in row)))
+                for row in zip(*self.columns.values())]
+
+
+def to_frame(tool_name: str, output: Any) -> Frame:
+    """Decode a tool's raw result into a Frame of its rows, found where shape_output looks for them."""
+    data = _decode(output)
+    path = PROJECTIONS.get(tool_name, ("results" if isinstance(data, dict) else None, None))[0]
+    rows = _lookup(data, path)
+    if isinstance(rows, dict):
+        rows = [rows]
+    return Frame.from_records(rows if isinstance(rows, list) else [])
+
+
+def rolling(values: np.ndarray, window: int, reduce=np.mean) -> np.ndarray:
+    """`reduce` over each trailing window; the first window - 1 positions are NaN."""
+    result = np.full(len(values), np.nan)
+    if 0 < window <= len(values):
+        windows = np.lib.stride_tricks.sliding_window_view(values.astype(np.float64), window)
+        result[window - 1:] = reduce(windows, axis=-1)
+    return result
+
+
+def pct_change(values: np.ndarray) -> np.ndarray:
+    """Relative change from each value to the next, one shorter than values."""
+    values = values.astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return values[1:] / values[:-1] - 1.0
+
+
+def max_drawdown(values: np.ndarray) -> float:
+    """Largest peak-to-trough fall as a (negative) fraction of the peak."""
+    if not len(values):
+        return np.nan
+    values = values.astype(np.float64)
+    return float(np.min(values / np.maximum.accumulate(values) - 1.0))
+
+
+def rank(values: np.ndarray) -> np.ndarray:
+    """1 for the largest value, NaNs last."""
+    order = np.argsort(np.where(np.isnan(values), -np.inf, values), kind="stable")[::-1]
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[order] = np.arange(1, len(values) + 1)
+    return ranks
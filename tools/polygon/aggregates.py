@@ -0,0 +1,59 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from tools.polygon.bars import MARKET_TZ, TIMESPANS, bar_dates, bar_times, get_bar_store
+from tools.polygon.client import PolygonTool
+
+class ToolInputSchema(BaseModel):
+    ticker: str = Field(..., description="The stock ticker symbol to get price history for, e.g. AAPL", pattern="^[A-Z.]+$", min_length=1, max_length=6)
+    days: Optional[int] = Field(None, description="How many calendar days back from to_date the history starts, e.g. 4 for the price 4 days ago or 30 for the past month", ge=0, le=3650)
+    from_date: Optional[str] = Field(None, description="First date of the history with the format YYYY-MM-DD, instead of days")
+    to_date: Optional[str] = Field(None, description="Last date of the history with the format YYYY-MM-DD; defaults to today")
+    timespan: Literal[TIMESPANS] = Field("day", description="Size of each price bar: minute, hour, day, week or month")
+
+class TickerAggregates(PolygonTool):
+    name: str = "ticker_aggregates"
+    description: str = "Historical prices: open, high, low, close and volume bars for a ticker over past days, e.g. the price N days ago or over the past month"
+    args_schema: type[BaseModel] = ToolInputSchema
+
+    def _range(self, days: Optional[int], from_date: Optional[str], to_date: Optional[str]) -> tuple[date, date]:
+        end = date.fromisoformat(to_date) if to_date else datetime.now(MARKET_TZ).date()
+        if from_date:
+            return date.fromisoformat(from_date), end
+        # A single day back would often land on a weekend; keep the week around it
+        return end - timedelta(days=max(days if days is not None else 30, 7)), end
+
+    def _run(self, ticker: str, days: Optional[int] = None, from_date: Optional[str] = None,
+             to_date: Optional[str] = None, timespan: str = "day"):
+        start, end = self._range(days, from_date, to_date)
+        return self._handle(ticker, timespan, get_bar_store().history(self, ticker, start, end, timespan))
+
+    async def _arun(self, ticker: str, days: Optional[int] = None, from_date: Optional[str] = None,
+                    to_date: Optional[str] = None, timespan: str = "day"):
+        start, end = self._range(days, from_date, to_date)
+        return self._handle(ticker, timespan, await get_bar_store().ahistory(self, ticker, start, end, timespan))
+
+    def _handle(self, ticker: str, timespan: str, bars):
+        if not len(bars):
+            return {"status": "NOT_FOUND", "error": f"No {timespan} bars for {ticker} in that range"}
+        stamps = bar_times(bars) if timespan in ("minute", "hour") else bar_dates(bars)
+        columns = [bars[name].tolist() for name in ("o", "h", "l", "c", "v")]
+        return {
+            "status": "OK",
+            "ticker": ticker,
+            "timespan": timespan,
+            "count": len(bars),
+            "results": [{"date": stamp, "open": o, "high": h, "low": l, "close": c, "volume": v}
+                        for stamp, o, h, l, c, v in zip(stamps, *columns)],
+        }
+
+if __name__ == "__main__":
+    api_key = os.getenv("POLYGON_API_KEY")
+    tool = TickerAggregates(api_key=api_key)
+    print(tool.invoke({"ticker": "META", "days": 4}))
+    # Overlaps the first range, so only the older days are fetched
+    print(tool.invoke({"ticker": "META", "days": 30})["count"])
+    print(get_bar_store().stats_dict())
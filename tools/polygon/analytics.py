@@ -0,0 +1,235 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Literal, Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from tools.frames import Frame, max_drawdown, pct_change, rank, rolling
+from tools.polygon.bars import bar_dates, get_bar_store
+from tools.polygon.client import PolygonError, PolygonResponse, PolygonTool
+from tools.polygon.snapshot import SNAPSHOT_PATH
+
+METRICS = ("price", "performance", "high_low", "dividend_yield", "pe_ratio")
+
+# Default look-back in calendar days per metric
+PERIODS = {"performance": 30, "high_low": 365, "dividend_yield": 365}
+
+# The column each metric's rank is taken by
+RANK_BY = {
+    "price": "price",
+    "performance": "return_pct",
+    "high_low": "pct_below_high",
+    "dividend_yield": "trailing_yield_pct",
+    "pe_ratio": "pe_ratio",
+}
+
+# Metrics computed from daily bars
+BAR_METRICS = ("performance", "high_low")
+
+TRADING_DAYS = 252
+
+class ToolInputSchema(BaseModel):
+    tickers: list[str] = Field(..., description="Stock ticker symbols to compute the metric for; several are compared and ranked, e.g. [\"AAPL\", \"MSFT\"]", min_length=1, max_length=10)
+    metric: Literal[METRICS] = Field(..., description="price: last price and today's change; performance: return, high, low, moving average, volatility and drawdown over the period; high_low: 52-week high and low; dividend_yield: dividends paid over the last year relative to the price; pe_ratio: price to earnings ratio from the last four quarterly reports")
+    days: Optional[int] = Field(None, description="Look-back period in calendar days ending today; defaults to 30 for performance and 365 for high_low", ge=1, le=3650)
+    window: int = Field(20, description="Moving average window in trading days, for performance", ge=2, le=200)
+
+class TickerAnalytics(PolygonTool):
+    name: str = "ticker_analytics"
+    description: str = "Computes stock metrics from market data instead of returning raw rows: price comparison, historical performance, 52-week high/low, dividend yield and P/E ratio for one or more tickers"
+    args_schema: type[BaseModel] = ToolInputSchema
+
+    def _requests(self, metric: str, tickers: list[str], days: int) -> list[tuple[str, Optional[str], str, dict]]:
+        """(dataset, ticker, path, params) for every request the metric needs; bars come from the bar store."""
+        today = date.today()
+        start = (today - timedelta(days=days)).isoformat()
+        requests = []
+        if metric in ("price", "dividend_yield", "pe_ratio"):
+            # One snapshot request covers every ticker
+            requests.append(("snapshot", None, SNAPSHOT_PATH, {"tickers": ",".join(sorted(tickers))}))
+        for ticker in tickers:
+            if metric == "dividend_yield":
+                requests.append(("dividends", ticker, "/v3/reference/dividends",
+                                 {"ticker": ticker, "ex_dividend_date.gte": start,
+                                  # Declared dividends with a future ex-date haven't been paid yet
+                                  "ex_dividend_date.lte": today.isoformat(), "limit": 1000}))
+            elif metric == "pe_ratio":
+                requests.append(("financials", ticker, "/vX/reference/financials",
+                                 {"ticker": ticker, "timeframe": "quarterly", "limit": 4, "sort": "period_of_report_date", "order": "desc"}))
+        return requests
+
+    def _frames(self, requests: list, responses: list[PolygonResponse]) -> dict:
+        """Responses decoded into frames by dataset and ticker; failed requests decode to empty frames."""
+        data = {}
+        for (dataset, ticker, _, _), response in zip(requests, responses):
+            body = response.json() if response.ok else {}
+            if dataset == "snapshot":
+                data["snapshot"] = Frame.from_records(body.get("tickers") or []).groups("ticker") if body.get("tickers") else {}
+            else:
+                data.setdefault(dataset, {})[ticker] = Frame.from_records(body.get("results") or [])
+        return data
+
+    def _history(self, ticker: str, start: date, end: date) -> Optional[np.ndarray]:
+        # One ticker's failed request leaves it without bars ("no bars"), not the whole call failed
+        try:
+            return get_bar_store().history(self, ticker, start, end)
+        except PolygonError:
+            return None
+
+    async def _ahistory(self, ticker: str, start: date, end: date) -> Optional[np.ndarray]:
+        try:
+            return await get_bar_store().ahistory(self, ticker, start, end)
+        except PolygonError:
+            return None
+
+    def _run(self, tickers: list[str], metric: str, days: Optional[int] = None, window: int = 20):
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        days = days or PERIODS.get(metric, 365)
+        requests = self._requests(metric, tickers, days)
+        histories = tickers if metric in BAR_METRICS else []
+        start, end = date.today() - timedelta(days=days), date.today()
+        # Requests for different tickers don't depend on each other
+        with ThreadPoolExecutor(max_workers=max(min(len(requests) + len(histories), 8), 1)) as executor:
+            responses = executor.map(
+                lambda request: contextvars.copy_context().run(self._get, request[2], request[3]), requests)
+            bars = executor.map(
+                lambda ticker: contextvars.copy_context().run(self._history, ticker, start, end), histories)
+            data = self._frames(requests, list(responses))
+            data["bars"] = dict(zip(histories, bars))
+        return self._compute(metric, tickers, days, window, data)
+
+    async def _arun(self, tickers: list[str], metric: str, days: Optional[int] = None, window: int = 20):
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        days = days or PERIODS.get(metric, 365)
+        requests = self._requests(metric, tickers, days)
+        histories = tickers if metric in BAR_METRICS else []
+        start, end = date.today() - timedelta(days=days), date.today()
+        responses, bars = await asyncio.gather(
+            asyncio.gather(*(self._aget(path, params) for _, _, path, params in requests)),
+            asyncio.gather(*(self._ahistory(ticker, start, end) for ticker in histories)))
+        data = self._frames(requests, responses)
+        data["bars"] = dict(zip(histories, bars))
+        return self._compute(metric, tickers, days, window, data)
+
+    def _compute(self, metric: str, tickers: list[str], days: int, window: int, data: dict) -> dict:
+        rows = [{"ticker": ticker, **getattr(self, f"_{metric}")(ticker, days, window, data)} for ticker in tickers]
+        if len(rows) > 1:
+            key = RANK_BY[metric]
+            values = np.array([np.nan if row.get(key) is None else row[key] for row in rows], dtype=np.float64)
+            for row, position in zip(rows, rank(values)):
+                row["rank"] = int(position)
+        return {"status": "OK", "metric": metric, "as_of": date.today().isoformat(), "results": rows}
+
+    def _last_price(self, ticker: str, data: dict) -> Optional[float]:
+        snapshot = data["snapshot"].get(ticker)
+        if snapshot is None:
+            return None
+        # The last trade is missing outside trading hours; fall back to today's, then yesterday's close
+        for column in ("lastTrade.p", "day.c", "prevDay.c"):
+            values = snapshot.get(column)
+            if values is not None and values.dtype == np.float64 and values[0] > 0:
+                return float(values[0])
+        return None
+
+    def _price(self, ticker: str, days: int, window: int, data: dict) -> dict:
+        price = self._last_price(ticker, data)
+        if price is None:
+            return {"error": "no price"}
+        snapshot = data["snapshot"][ticker]
+        change = snapshot.get("todaysChangePerc")
+        return {"price": round(price, 4), "change_pct": None if change is None else _round(change[0])}
+
+    def _bars(self, ticker: str, data: dict) -> Optional[Frame]:
+        bars = data["bars"].get(ticker)
+        if bars is None or not len(bars):
+            return None
+        # Columns of the store's memory map, viewed rather than copied; bars are already in time order
+        return Frame({**{name: bars[name] for name in bars.dtype.names},
+                      "date": np.array(bar_dates(bars), dtype="datetime64[D]")})
+
+    def _performance(self, ticker: str, days: int, window: int, data: dict) -> dict:
+        bars = self._bars(ticker, data)
+        if bars is None:
+            return {"error": "no bars"}
+        close = bars["c"]
+        returns = pct_change(close)
+        average = rolling(close, window)
+        return {
+            "from": str(bars["date"][0]),
+            "to": str(bars["date"][-1]),
+            "start": _round(close[0]),
+            "end": _round(close[-1]),
+            "return_pct": _round((close[-1] / close[0] - 1.0) * 100),
+            "high": _round(np.max(bars["h"])),
+            "low": _round(np.min(bars["l"])),
+            f"ma{window}": _round(average[-1]),
+            "volatility_pct": _round(np.std(returns, ddof=1) * np.sqrt(TRADING_DAYS) * 100) if len(returns) > 1 else None,
+            "max_drawdown_pct": _round(max_drawdown(close) * 100),
+        }
+
+    def _high_low(self, ticker: str, days: int, window: int, data: dict) -> dict:
+        bars = self._bars(ticker, data)
+        if bars is None:
+            return {"error": "no bars"}
+        high, low = int(np.argmax(bars["h"])), int(np.argmin(bars["l"]))
+        last = bars["c"][-1]
+        return {
+            "high": _round(bars["h"][high]),
+            "high_date": str(bars["date"][high]),
+            "low": _round(bars["l"][low]),
+            "low_date": str(bars["date"][low]),
+            "last": _round(last),
+            "pct_below_high": _round((1.0 - last / bars["h"][high]) * 100),
+            "pct_above_low": _round((last / bars["l"][low] - 1.0) * 100),
+        }
+
+    def _dividend_yield(self, ticker: str, days: int, window: int, data: dict) -> dict:
+        price = self._last_price(ticker, data)
+        dividends = data["dividends"].get(ticker)
+        if dividends is not None and "ex_dividend_date" in dividends:
+            # Also enforced by the request; declared but not yet paid dividends don't count
+            dividends = dividends.between("ex_dividend_date", end=np.datetime64(date.today().isoformat(), "D"))
+        if dividends is None or "cash_amount" not in dividends or not len(dividends):
+            return {"price": price, "dividends": 0, "trailing_yield_pct": 0.0, "note": "no dividends in the period"}
+        if price is None:
+            return {"error": "no price"}
+        dividends = dividends.sort("ex_dividend_date", descending=True)
+        amounts = dividends["cash_amount"]
+        trailing = np.nansum(amounts)
+        row = {"price": round(price, 4), "dividends": len(dividends), "paid": _round(trailing),
+               "trailing_yield_pct": _round(trailing / price * 100)}
+        frequency = dividends.get("frequency")
+        if frequency is not None and frequency.dtype == np.float64 and frequency[0] > 0:
+            # Latest payment annualised at its stated frequency
+            row["forward_yield_pct"] = _round(amounts[0] * frequency[0] / price * 100)
+        return row
+
+    def _pe_ratio(self, ticker: str, days: int, window: int, data: dict) -> dict:
+        price = self._last_price(ticker, data)
+        reports = data["financials"].get(ticker)
+        column = "financials.income_statement.diluted_earnings_per_share.value"
+        if reports is None or column not in reports:
+            return {"price": price, "error": "no quarterly earnings reported"}
+        eps = reports[column][:4]
+        if len(eps) < 4 or np.isnan(eps).any():
+            return {"price": price, "error": f"only {int(np.count_nonzero(~np.isnan(eps)))} of 4 quarters reported"}
+        if price is None:
+            return {"error": "no price"}
+        trailing = float(np.sum(eps))
+        return {"price": round(price, 4), "eps_ttm": _round(trailing),
+                "pe_ratio": _round(price / trailing) if trailing > 0 else None,
+                **({} if trailing > 0 else {"note": "negative earnings"})}
+
+def _round(value) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
+
+if __name__ == "__main__":
+    api_key = os.getenv("POLYGON_API_KEY")
+    tool = TickerAnalytics(api_key=api_key)
+    print(tool.invoke({"tickers": ["AAPL", "META"], "metric": "price"}))
+    print(tool.invoke({"tickers": ["NFLX"], "metric": "high_low"}))
@@ -0,0 +1,290 @@
+import json
+import os
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from tools.polygon.client import PolygonError, PolygonTool
+from tools.polygon.pagination import apaginate, paginate
+
+BARS_DIR = os.getenv("POLYGON_BARS_DIR", ".cache/bars")
+
+TIMESPANS = ("minute", "hour", "day", "week", "month")
+
+# One fixed-size record per bar, as Polygon's aggregates return them; t is epoch milliseconds
+BAR_DTYPE = np.dtype([("t", "<i8"), ("o", "<f8"), ("h", "<f8"), ("l", "<f8"), ("c", "<f8"),
+                      ("v", "<f8"), ("vw", "<f8"), ("n", "<f8")])
+
+# Trading days, and so bar ranges, are dated in exchange time
+MARKET_TZ = ZoneInfo("America/New_York")
+
+
+def day_start_ms(day: date) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=MARKET_TZ).timestamp() * 1000)
+
+
+def bar_dates(bars: np.ndarray) -> list[str]:
+    return [datetime.fromtimestamp(t / 1000, MARKET_TZ).date().isoformat() for t in bars["t"].tolist()]
+
+
+def bar_times(bars: np.ndarray) -> list[str]:
+    return [datetime.fromtimestamp(t / 1000, MARKET_TZ).strftime("%Y-%m-%d %H:%M") for t in bars["t"].tolist()]
+
+
+def closed_through(timespan: str, today: date) -> date:
+    """Last day whose bars of this timespan are final; later ones may still change."""
+    if timespan == "week":
+        # Polygon's weeks start on Sunday
+        return today - timedelta(days=today.isoweekday() % 7 + 1)
+    if timespan == "month":
+        return today.replace(day=1) - timedelta(days=1)
+    return today - timedelta(days=1)
+
+
+def _to_array(rows: list[dict]) -> np.ndarray:
+    bars = np.zeros(len(rows), dtype=BAR_DTYPE)
+    for name in BAR_DTYPE.names:
+        bars[name] = [row.get(name, np.nan if name != "t" else 0) for row in rows]
+    return bars
+
+
+def _merge_ranges(ranges: list[list[str]]) -> list[list[str]]:
+    merged = []
+    for start, end in sorted(ranges):
+        # Adjacent ranges join too: 01-01..01-31 and 02-01..02-28 are one
+        if merged and date.fromisoformat(start) <= date.fromisoformat(merged[-1][1]) + timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class BarSeries:
+    """Bars of one ticker and timespan on disk, with the date ranges already fetched.
+
+    Bars live in a flat file of BAR_DTYPE records sorted by time, memory-mapped for
+    reads, so a range query is two binary searches and a slice of the map with nothing
+    copied. New bars after the last one are appended; bars filling a gap further back
+    are merged in and the file atomically replaced, which leaves maps held by readers
+    intact. The covered date ranges are kept beside it in coverage.json, including
+    weekends and holidays that have no bars.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.data_path = os.path.join(directory, "bars.bin")
+        self.coverage_path = os.path.join(directory, "coverage.json")
+        self.splits_path = os.path.join(directory, "splits.json")
+        self._lock = threading.Lock()
+        self._map = None
+        self._map_size = -1
+        self.coverage = self._load(self.coverage_path, [])
+        # When splits were last checked for, and the latest one the stored bars are adjusted for
+        self.splits = self._load(self.splits_path, {"checked": None, "latest": None})
+
+    @staticmethod
+    def _load(path: str, default):
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return default
+
+    @staticmethod
+    def _dump(path: str, data):
+        temp = path + ".tmp"
+        with open(temp, "w") as file:
+            json.dump(data, file)
+        os.replace(temp, path)
+
+    def bars(self) -> np.ndarray:
+        """Every stored bar, as a read-only memory map (an empty array before the first write)."""
+        size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        if size != self._map_size:
+            self._map = np.memmap(self.data_path, dtype=BAR_DTYPE, mode="r") if size else np.zeros(0, dtype=BAR_DTYPE)
+            self._map_size = size
+        return self._map
+
+    def read(self, start: date, end: date) -> np.ndarray:
+        """Bars dated start through end: a view of the map, not a copy."""
+        bars = self.bars()
+        times = bars["t"]
+        low = np.searchsorted(times, day_start_ms(start), side="left")
+        high = np.searchsorted(times, day_start_ms(end + timedelta(days=1)), side="left")
+        return bars[low:high]
+
+    def missing(self, start: date, end: date) -> list[tuple[date, date]]:
+        """Sub-ranges of start..end not fetched yet."""
+        gaps, cursor = [], start
+        for covered_start, covered_end in self.coverage:
+            covered_start, covered_end = date.fromisoformat(covered_start), date.fromisoformat(covered_end)
+            if covered_end < cursor:
+                continue
+            if covered_start > end:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start - timedelta(days=1)))
+            cursor = max(cursor, covered_end + timedelta(days=1))
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def write(self, new: np.ndarray, covered: Optional[tuple[date, date]] = None):
+        """Store fetched bars and mark `covered` as fetched; a re-fetched bar replaces the stored one."""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if len(new):
+                new = np.sort(new, order="t")
+                stored = self.bars()
+                if not len(stored) or new["t"][0] > stored["t"][-1]:
+                    with open(self.data_path, "ab") as file:
+                        file.write(new.tobytes())
+                else:
+                    # Fresh bars first, so unique() keeps them over stored ones with the same time
+                    combined = np.concatenate([new, np.asarray(stored)])
+                    _, first = np.unique(combined["t"], return_index=True)
+                    temp = self.data_path + ".tmp"
+                    combined[first].tofile(temp)
+                    os.replace(temp, self.data_path)
+                    self._map_size = -1
+            if covered and covered[0] <= covered[1]:
+                self.coverage = _merge_ranges(self.coverage + [[covered[0].isoformat(), covered[1].isoformat()]])
+                self._dump(self.coverage_path, self.coverage)
+
+    def mark_splits(self, checked: date, latest: Optional[str] = None, reset: bool = False):
+        """Record a split check; reset drops every stored bar, adjusted for splits before the latest."""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if reset:
+                # Readers holding the old map keep it; the next read sees an empty series
+                if os.path.exists(self.data_path):
+                    os.remove(self.data_path)
+                self._map_size = -1
+                self.coverage = []
+                self._dump(self.coverage_path, self.coverage)
+            self.splits = {"checked": checked.isoformat(), "latest": latest or self.splits.get("latest")}
+            self._dump(self.splits_path, self.splits)
+
+
+class BarStore:
+    """Local store of price bars per ticker and timespan, filled from Polygon on demand.
+
+    history() serves a date range from disk and fetches only the parts never fetched
+    before, so repeated and overlapping history questions ("4 days ago", "the past
+    month", "52-week high") turn into local reads. Bars that may still change (today's,
+    this week's, this month's) are fetched again every time, never marked as covered.
+
+    Bars are split-adjusted as of when they were fetched, so once a day per series the
+    ticker's splits since the last check are looked up; a new split executed after the
+    first stored bar makes the stored ones stale, and the series starts over.
+    """
+
+    def __init__(self, root: str = BARS_DIR):
+        self.root = root
+        self.stats = Counter()
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def series(self, ticker: str, timespan: str = "day") -> BarSeries:
+        key = (ticker.upper(), timespan)
+        with self._lock:
+            if key not in self._series:
+                self._series[key] = BarSeries(os.path.join(self.root, timespan, ticker.upper()))
+            return self._series[key]
+
+    def _plan(self, ticker: str, start: date, end: date, timespan: str) -> tuple[BarSeries, list, date]:
+        if timespan not in TIMESPANS:
+            raise ValueError(f"Unsupported timespan {timespan!r}, expected one of {', '.join(TIMESPANS)}")
+        series = self.series(ticker, timespan)
+        final = closed_through(timespan, datetime.now(MARKET_TZ).date())
+        gaps = series.missing(start, end)
+        if timespan in ("minute", "hour", "day"):
+            # Stock markets never trade on weekends, so gaps of only weekend days have nothing to fetch
+            gaps = [gap for gap in gaps if (gap[1] - gap[0]).days >= 2 or gap[0].weekday() < 5 or gap[1].weekday() < 5]
+        with self._lock:
+            self.stats["reads"] += 1
+            self.stats["local_reads" if not gaps else "gap_fills"] += 1
+            self.stats["gaps"] += len(gaps)
+        return series, gaps, final
+
+    def _split_check(self, series: BarSeries, ticker: str) -> Optional[tuple[str, dict]]:
+        """The splits request to make before reading the series, if one is due."""
+        today = datetime.now(MARKET_TZ).date()
+        if series.splits.get("checked") == today.isoformat():
+            return None
+        if not len(series.bars()):
+            # Whatever gets fetched now is adjusted for every split so far
+            series.mark_splits(today)
+            return None
+        since = series.splits.get("checked") or bar_dates(series.bars()[:1])[0]
+        return "/v3/reference/splits", {"ticker": ticker.upper(), "execution_date.gte": since, "limit": 1000}
+
+    def _apply_splits(self, series: BarSeries, rows: list[dict]):
+        today = datetime.now(MARKET_TZ).date()
+        executed = [row["execution_date"] for row in rows
+                    if row.get("execution_date") and row["execution_date"] <= today.isoformat()]
+        latest = max(executed, default=None)
+        known = series.splits.get("latest")
+        first = bar_dates(series.bars()[:1])
+        stale = bool(latest and (not known or latest > known) and first and first[0] < latest)
+        with self._lock:
+            self.stats["split_resets"] += stale
+        series.mark_splits(today, latest, reset=stale)
+
+    def _gap_request(self, ticker: str, timespan: str, gap: tuple[date, date]) -> tuple[str, dict]:
+        return (f"/v2/aggs/ticker/{ticker.upper()}/range/1/{timespan}/{gap[0].isoformat()}/{gap[1].isoformat()}",
+                {"adjusted": True, "sort": "asc", "limit": 50000})
+
+    def _store(self, series: BarSeries, rows: list[dict], gap: tuple[date, date], final: date):
+        with self._lock:
+            self.stats["bars_fetched"] += len(rows)
+        series.write(_to_array(rows), (gap[0], min(gap[1], final)))
+
+    def history(self, tool: PolygonTool, ticker: str, start: date, end: date, timespan: str = "day") -> np.ndarray:
+        """Bars dated start through end, fetching the gaps in local coverage first."""
+        check = self._split_check(self.series(ticker, timespan), ticker) if timespan in TIMESPANS else None
+        if check:
+            try:
+                self._apply_splits(self.series(ticker, timespan), list(paginate(tool, *check)))
+            except PolygonError:
+                # Checked again on the next read
+                pass
+        series, gaps, final = self._plan(ticker, start, end, timespan)
+        for gap in gaps:
+            self._store(series, list(paginate(tool, *self._gap_request(ticker, timespan, gap))), gap, final)
+        return series.read(start, end)
+
+    async def ahistory(self, tool: PolygonTool, ticker: str, start: date, end: date, timespan: str = "day") -> np.ndarray:
+        check = self._split_check(self.series(ticker, timespan), ticker) if timespan in TIMESPANS else None
+        if check:
+            try:
+                self._apply_splits(self.series(ticker, timespan), [row async for row in apaginate(tool, *check)])
+            except PolygonError:
+                pass
+        series, gaps, final = self._plan(ticker, start, end, timespan)
+        for gap in gaps:
+            rows = [row async for row in apaginate(tool, *self._gap_request(ticker, timespan, gap))]
+            self._store(series, rows, gap, final)
+        return series.read(start, end)
+
+    def stats_dict(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bar_store() -> BarStore:
+    """Store shared by every tool reading bars, under POLYGON_BARS_DIR."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BarStore(os.getenv("POLYGON_BARS_DIR", BARS_DIR))
+    return _store
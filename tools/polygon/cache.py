@@ -0,0 +1,145 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
+from typing import Optional
+from urllib.parse import urlencode, urlsplit
+
+from tools.polygon.client import PolygonResponse
+
+# Seconds a response stays fresh, by longest matching path prefix. Paths not listed aren't cached.
+DEFAULT_TTLS = {
+    "/v1/marketstatus/": 60,
+    "/v3/reference/": 24 * 60 * 60,
+    "/vX/reference/": 24 * 60 * 60,
+}
+
+# Never part of a cache key: responses don't depend on which key fetched them
+EXCLUDED_PARAMS = {"apiKey"}
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ResponseCache:
+    """TTL + LRU cache of Polygon GET responses, with an optional SQLite tier that survives restarts."""
+
+    def __init__(self, max_entries: int = 1024, ttls: Optional[dict] = None, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, expires_at REAL, status_code INTEGER, headers TEXT, content BLOB, url TEXT)"
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def key(url: str, params: dict) -> str:
+        items = sorted((k, str(v)) for k, v in params.items() if k not in EXCLUDED_PARAMS)
+        return f"{url}?{urlencode(items)}"
+
+    def ttl_for(self, url: str) -> int:
+        path = urlsplit(url).path
+        matches = [prefix for prefix in self.ttls if path.startswith(prefix)]
+        return self.ttls[max(matches, key=len)] if matches else 0
+
+    def get(self, key: str) -> Optional[PolygonResponse]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, response = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return response
+                del self._entries[key]
+                self.stats.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, status_code, headers, content, url FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[0] > now:
+                    response = PolygonResponse(row[1], row[3], json.loads(row[2]), row[4], from_cache=True)
+                    self._put(key, row[0], response)
+                    self.stats.hits += 1
+                    self.stats.disk_hits += 1
+                    return response
+
+            self.stats.misses += 1
+            return None
+
+    def set(self, key: str, response: PolygonResponse, ttl: int):
+        expires_at = time.time() + ttl
+        response = replace(response, from_cache=True)
+        with self._lock:
+            self._put(key, expires_at, response)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, expires_at, response.status_code, json.dumps(response.headers), response.content, response.url),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def _put(self, key: str, expires_at: float, response: PolygonResponse):
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def stats_dict(self) -> dict:
+        return {**asdict(self.stats), "hit_rate": self.stats.hit_rate, "size": len(self._entries)}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[ResponseCache]:
+    """Cache shared by all Polygon tools, configured from the environment.
+
+    POLYGON_CACHE=false disables it, POLYGON_CACHE_SIZE bounds the in-memory tier and
+    POLYGON_CACHE_PATH enables the SQLite tier.
+    """
+    global _default_cache
+    if os.getenv("POLYGON_CACHE", "true").lower() == "false":
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ResponseCache(
+                    max_entries=int(os.getenv("POLYGON_CACHE_SIZE", "1024")),
+                    path=os.getenv("POLYGON_CACHE_PATH"),
+                )
+    return _default_cache
@@ -0,0 +1,286 @@
+import os
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+import requests
+from langchain.tools import BaseTool
+from pydantic import Field
+from requests.adapters import HTTPAdapter
+
+from tools.polygon.coalesce import singleflight
+from tools.polygon.ratelimit import get_limiter
+
+BASE_URL = "https://api.polygon.io"
+
+# Statuses worth another attempt: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+POOL_SIZE = int(os.getenv("POLYGON_POOL_SIZE", "20"))
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+# Observers of every request and cache lookup, e.g. the per-query tracer; empty unless tracing is on
+_http_hooks = []
+
+
+def add_http_hook(hook):
+    """Call hook(event) for every Polygon request attempt ("request"), cache lookup ("cache")
+    and request answered by another caller's identical request in flight ("coalesced").
+    Request events carry the seconds the attempt queued for rate-limit quota as "queued"."""
+    if hook not in _http_hooks:
+        _http_hooks.append(hook)
+
+
+def _notify(**event):
+    for hook in _http_hooks:
+        hook(event)
+
+
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session shared by every Polygon tool."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Pooled httpx client for the running event loop (clients can't be shared across loops)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        limits = httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)
+        client = httpx.AsyncClient(limits=limits)
+        _async_clients[loop] = client
+    return client
+
+
+@dataclass
+class PolygonResponse:
+    """Transport-independent response, so sync and async paths look the same to tools."""
+    status_code: int
+    content: bytes
+    headers: dict = field(default_factory=dict)  # lower-cased names
+    url: str = ""
+    from_cache: bool = False
+
+    @classmethod
+    def from_transport(cls, response, url: str) -> "PolygonResponse":
+        # Works for both requests.Response and httpx.Response
+        headers = {k.lower(): v for k, v in response.headers.items()}
+        return cls(response.status_code, response.content, headers, url)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 300
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class PolygonError(Exception):
+    """A Polygon request that came back with a non-success status."""
+
+    def __init__(self, response: PolygonResponse):
+        super().__init__(f"Polygon request to {response.url} failed with status code {response.status_code}: {response.text[:200]}")
+        self.response = response
+
+
+def retry_delay(attempt: int, backoff: float, max_backoff: float, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before the next attempt.
+
+    Honors a Retry-After header (seconds or HTTP date) when the server sends one,
+    otherwise uses exponential backoff with full jitter.
+    """
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), max_backoff)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                return min(max(delay, 0.0), max_backoff)
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(max_backoff, backoff * (2 ** attempt)))
+
+
+def _flight_key(url: str, query: dict, headers: Optional[dict] = None) -> tuple:
+    # Unlike cache keys this keeps apiKey: different keys may be entitled to different data.
+    # Conditional headers change the answer (304 or not), so they're part of it too.
+    return url, tuple(sorted((k, str(v)) for k, v in query.items())), tuple(sorted((headers or {}).items()))
+
+
+def _default_cache():
+    # Imported lazily: the cache module builds on PolygonResponse
+    from tools.polygon.cache import get_default_cache
+    return get_default_cache()
+
+
+class PolygonTool(BaseTool):
+    """Base class for tools calling the Polygon.io REST API.
+
+    Requests share one pooled keep-alive session (httpx on the async path), carry a
+    timeout and are retried with jittered exponential backoff on 429/5xx. Successful
+    responses from reference endpoints are served from a shared TTL/LRU cache.
+    """
+    api_key: str = Field(..., exclude=True)
+    base_url: str = Field(default_factory=lambda: os.getenv("POLYGON_BASE_URL", BASE_URL), exclude=True)
+    timeout: float = Field(10.0, exclude=True)
+    max_retries: int = Field(3, exclude=True)
+    backoff: float = Field(0.5, exclude=True)
+    max_backoff: float = Field(30.0, exclude=True)
+    cache: Optional[Any] = Field(default_factory=_default_cache, exclude=True)
+
+    def __init__(self, api_key: str, **kwargs):
+        super().__init__(api_key=api_key, **kwargs)
+
+    def frame(self, tool_input: dict):
+        """Run the tool and decode its result rows into a NumPy-backed Frame for local analytics."""
+        # Imported lazily: only analytics needs numpy
+        from tools.frames import to_frame
+        return to_frame(self.name, self.invoke(tool_input))
+
+    async def aframe(self, tool_input: dict):
+        from tools.frames import to_frame
+        return to_frame(self.name, await self.ainvoke(tool_input))
+
+    def _prepare(self, path: str, params: Optional[dict]) -> tuple[str, dict]:
+        # Accept both endpoint paths and absolute URLs (e.g. a next_url from a previous page)
+        parts = urlsplit(path)
+        query = dict(parse_qsl(parts.query))
+        if parts.scheme:
+            url = f"{parts.scheme}://{parts.netloc}{parts.path}"
+        else:
+            url = self.base_url.rstrip("/") + "/" + parts.path.lstrip("/")
+        for key, value in (params or {}).items():
+            if value is None:
+                continue
+            # requests and httpx disagree on how to encode booleans; Polygon wants lowercase
+            query[key] = str(value).lower() if isinstance(value, bool) else value
+        query["apiKey"] = self.api_key
+        return url, query
+
+    def _cached(self, url: str, query: dict) -> tuple[Optional[str], int, Optional[PolygonResponse]]:
+        if self.cache is None:
+            return None, 0, None
+        ttl = self.cache.ttl_for(url)
+        if not ttl:
+            return None, 0, None
+        key = self.cache.key(url, query)
+        cached = self.cache.get(key)
+        if _http_hooks:
+            _notify(kind="cache", url=url, hit=cached is not None)
+        return key, ttl, cached
+
+    def _store(self, key: Optional[str], ttl: int, response: PolygonResponse) -> PolygonResponse:
+        if key is not None and response.ok:
+            self.cache.set(key, response, ttl)
+        return response
+
+    def _get(self, path: str, params: Optional[dict] = None, headers: Optional[dict] = None,
+             cache: bool = True) -> PolygonResponse:
+        """GET an endpoint; headers, e.g. If-None-Match for a conditional request, bypass the cache,
+        and so does cache=False, e.g. for the pages of a bulk listing."""
+        url, query = self._prepare(path, params)
+        key, ttl, cached = self._cached(url, query) if cache and not headers else (None, 0, None)
+        if cached is not None:
+            return cached
+        # Identical requests already in flight (another session, the same ticker) share one response
+        response, shared = singleflight.do(_flight_key(url, query, headers),
+                                           lambda: self._store(key, ttl, self._fetch(url, query, headers)))
+        if shared and _http_hooks:
+            _notify(kind="coalesced", url=url)
+        return response
+
+    async def _aget(self, path: str, params: Optional[dict] = None, headers: Optional[dict] = None,
+                    cache: bool = True) -> PolygonResponse:
+        url, query = self._prepare(path, params)
+        key, ttl, cached = self._cached(url, query) if cache and not headers else (None, 0, None)
+        if cached is not None:
+            return cached
+
+        async def fetch():
+            return self._store(key, ttl, await self._afetch(url, query, headers))
+
+        response, shared = await singleflight.ado(_flight_key(url, query, headers), fetch)
+        if shared and _http_hooks:
+            _notify(kind="coalesced", url=url)
+        return response
+
+    def _fetch(self, url: str, query: dict, headers: Optional[dict] = None) -> PolygonResponse:
+        session = get_session()
+        limiter = get_limiter()
+        attempt = 0
+        while True:
+            # Every attempt, retries included, spends quota; raises RateLimited past the deadline
+            queued = limiter.acquire() if limiter else 0.0
+            start = time.perf_counter()
+            try:
+                response = session.get(url, params=query, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if _http_hooks:
+                    _notify(kind="request", url=url, status=None, bytes=0, seconds=time.perf_counter() - start,
+                            attempt=attempt, queued=queued, error=type(e).__name__)
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(retry_delay(attempt, self.backoff, self.max_backoff))
+            else:
+                if _http_hooks:
+                    _notify(kind="request", url=url, status=response.status_code, bytes=len(response.content),
+                            seconds=time.perf_counter() - start, attempt=attempt, queued=queued)
+                if response.status_code == 429 and limiter:
+                    # The server's count says this window's quota is spent, whatever the bucket thinks
+                    limiter.drain()
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return PolygonResponse.from_transport(response, url)
+                time.sleep(retry_delay(attempt, self.backoff, self.max_backoff, response.headers.get("Retry-After")))
+            attempt += 1
+
+    async def _afetch(self, url: str, query: dict, headers: Optional[dict] = None) -> PolygonResponse:
+        client = get_async_client()
+        limiter = get_limiter()
+        attempt = 0
+        while True:
+            queued = await limiter.aacquire() if limiter else 0.0
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, params=query, headers=headers, timeout=self.timeout)
+            except httpx.TransportError as e:
+                if _http_hooks:
+                    _notify(kind="request", url=url, status=None, bytes=0, seconds=time.perf_counter() - start,
+                            attempt=attempt, queued=queued, error=type(e).__name__)
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(retry_delay(attempt, self.backoff, self.max_backoff))
+            else:
+                if _http_hooks:
+                    _notify(kind="request", url=url, status=response.status_code, bytes=len(response.content),
+                            seconds=time.perf_counter() - start, attempt=attempt, queued=queued)
+                if response.status_code == 429 and limiter:
+                    # The server's count says this window's quota is spent, whatever the bucket thinks
+                    limiter.drain()
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return PolygonResponse.from_transport(response, url)
+                await asyncio.sleep(retry_delay(attempt, self.backoff, self.max_backoff, response.headers.get("Retry-After")))
+            attempt += 1
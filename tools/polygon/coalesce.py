@@ -0,0 +1,159 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+# How long the first lookup of a batch waits for others to join it
+BATCH_WINDOW = float(os.getenv("POLYGON_BATCH_WINDOW", "0.01"))
+MAX_BATCH = int(os.getenv("POLYGON_MAX_BATCH", "50"))
+
+_batchers = weakref.WeakSet()
+
+
+class SingleFlight:
+    """Merges identical requests in flight at the same time into one.
+
+    The first caller for a key runs the request; callers arriving before it finishes
+    wait for and share its result, or its exception. Nothing is kept once the request
+    completes, so this complements the response cache rather than replacing it: it
+    covers uncached endpoints and the window before a cached response is stored.
+    """
+
+    def __init__(self):
+        self.stats = Counter()
+        self._flights = {}
+        self._lock = threading.Lock()
+        # Async flights are futures of one event loop, so each loop gets its own table
+        self._async_flights = weakref.WeakKeyDictionary()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> tuple[Any, bool]:
+        """fn()'s result, and whether it was shared from another caller's request."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+            self.stats["leaders" if leader else "shared"] += 1
+        if not leader:
+            return flight.result(), True
+        try:
+            flight.set_result(fn())
+        except BaseException as e:
+            flight.set_exception(e)
+        finally:
+            with self._lock:
+                del self._flights[key]
+        return flight.result(), False
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        flights = self._async_flights.setdefault(asyncio.get_running_loop(), {})
+        flight = flights.get(key)
+        if flight is not None:
+            self.stats["shared"] += 1
+            # shield: a cancelled follower mustn't cancel the request the others wait on
+            return await asyncio.shield(flight), True
+        self.stats["leaders"] += 1
+        flight = flights[key] = asyncio.ensure_future(fn())
+        try:
+            return await asyncio.shield(flight), False
+        finally:
+            if flight.done():
+                flights.pop(key, None)
+            else:
+                flight.add_done_callback(lambda _: flights.pop(key, None))
+
+
+class _Batch:
+    def __init__(self):
+        self.keys = []
+        self.result: Future = Future()
+        self.task = None
+
+
+class Batcher:
+    """Collapses single-key lookups arriving within a short window into one multi-key call.
+
+    The first lookup opens a batch and waits `window` seconds for others to join (up to
+    `max_batch` keys), then makes one call for all of them; each caller gets its own
+    key's value from the returned mapping, or None if the call didn't return it. Sync
+    and async callers can share a batch: whichever opened it makes the call, with
+    `fetch` or `afetch` respectively.
+    """
+
+    def __init__(self, name: str, fetch: Callable[[list], dict], afetch: Optional[Callable[[list], Awaitable[dict]]] = None,
+                 window: float = BATCH_WINDOW, max_batch: int = MAX_BATCH):
+        self.name = name
+        self.fetch = fetch
+        self.afetch = afetch
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = Counter()
+        self._open: Optional[_Batch] = None
+        self._lock = threading.Lock()
+        _batchers.add(self)
+
+    def _join(self, key) -> tuple[_Batch, bool]:
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+                self.stats["batches"] += 1
+            if key not in batch.keys:
+                batch.keys.append(key)
+            self.stats["lookups"] += 1
+            if len(batch.keys) >= self.max_batch:
+                # Full: later lookups start the next batch
+                self._open = None
+            return batch, leader
+
+    def _close(self, batch: _Batch) -> list:
+        with self._lock:
+            if self._open is batch:
+                self._open = None
+            return list(batch.keys)
+
+    def get(self, key) -> Any:
+        batch, leader = self._join(key)
+        if leader:
+            time.sleep(self.window)
+            keys = self._close(batch)
+            try:
+                batch.result.set_result(self.fetch(keys))
+            except BaseException as e:
+                batch.result.set_exception(e)
+        return batch.result.result().get(key)
+
+    async def _alead(self, batch: _Batch):
+        await asyncio.sleep(self.window)
+        keys = self._close(batch)
+        try:
+            result = await self.afetch(keys) if self.afetch else await asyncio.to_thread(self.fetch, keys)
+            batch.result.set_result(result)
+        except Exception as e:
+            batch.result.set_exception(e)
+
+    async def aget(self, key) -> Any:
+        batch, leader = self._join(key)
+        if leader:
+            # A task of its own, so cancelling the caller that opened the batch doesn't strand the rest
+            batch.task = asyncio.ensure_future(self._alead(batch))
+        # shield: cancelling one waiter would otherwise cancel the shared result for all of them
+        return (await asyncio.shield(asyncio.wrap_future(batch.result))).get(key)
+
+
+# Shared by every Polygon tool, see PolygonTool._get
+singleflight = SingleFlight()
+
+
+def stats() -> dict:
+    """Requests merged by the singleflight layer and lookups collapsed by each batcher."""
+    batchers = {}
+    for batcher in _batchers:
+        counts = batchers.setdefault(batcher.name, Counter())
+        counts.update(batcher.stats)
+    return {"singleflight": dict(singleflight.stats), "batchers": {name: dict(counts) for name, counts in batchers.items()}}
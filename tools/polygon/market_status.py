@@ -1,19 +1,20 @@
 import os
-from langchain.tools import BaseTool
-from pydantic import BaseModel, Field
-import requests
 import json
 
-class MarketStatus(BaseTool):
+from tools.polygon.client import PolygonTool
+
+class MarketStatus(PolygonTool):
     name: str = "market_status"
     description: str = "Get the current trading status of the exchanges and overall financial markets."
-    api_key: str = Field(..., exclude=True)
-
-    def __init__(self, api_key: str):
-        super().__init__(api_key=api_key)
 
     def _run(self):
-        response = requests.get(f"https://api.polygon.io/v1/marketstatus/now?apiKey={self.api_key}")
+        response = self._get("/v1/marketstatus/now")
+
+        data = response.json()
+        return json.dumps(data, indent=2)
+
+    async def _arun(self):
+        response = await self._aget("/v1/marketstatus/now")
 
         data = response.json()
         return json.dumps(data, indent=2)
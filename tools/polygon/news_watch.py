@@ -0,0 +1,298 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Iterable, Optional
+
+from tools.polygon.client import PolygonError, PolygonResponse, PolygonTool
+from tools.polygon.ratelimit import BATCH, scope
+
+NEWS_STATE_PATH = os.getenv("NEWS_STATE_PATH", ".cache/news.sqlite")
+# Watchlists longer than this poll the market-wide feed once rather than each ticker
+FEED_THRESHOLD = int(os.getenv("NEWS_FEED_THRESHOLD", "20"))
+# How far back a ticker's first poll reaches
+LOOKBACK_HOURS = float(os.getenv("NEWS_LOOKBACK_HOURS", "24"))
+
+NEWS_PATH = "/v2/reference/news"
+# Cursor of the market-wide feed, next to the per-ticker ones
+FEED = "*"
+
+
+def _utc(moment: datetime) -> str:
+    # The format of published_utc, so cursors compare as strings
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def article_keys(article: dict) -> list[str]:
+    """What identifies an article: its id, and a hash of its URL for the same story under another id."""
+    keys = [f"id:{article['id']}"] if article.get("id") else []
+    if article.get("article_url"):
+        keys.append("url:" + hashlib.sha1(article["article_url"].encode("utf-8")).hexdigest())
+    return keys
+
+
+class NewsWatcher:
+    """Polls Polygon news for a watchlist and hands only articles not seen before to subscribers.
+
+    Each ticker has a cursor, the publish time of the newest article its own poll (or
+    the feed) has seen, and is polled for articles published since (oldest first, so a poll cut short resumes
+    where it stopped). Past feed_threshold tickers, one market-wide poll since the
+    feed's own cursor replaces the per-ticker ones and is filtered to the watchlist;
+    only tickers new to the watchlist are polled on their own, once, to catch up. A
+    poll whose answer can't have changed (its cursor didn't move) is repeated with the
+    ETag/Last-Modified it got, and comes back as an empty 304. Either way a quiet poll
+    costs one small request or a few, and the rest is proportional to the news.
+
+    Articles are deduplicated across tickers and polls by id and URL hash: a story
+    tagged with three watched tickers is delivered once, naming all three. Cursors,
+    validators and seen keys live in SQLite at path, so a restart picks up where it
+    left off. State is committed before delivery; a subscriber that fails doesn't get
+    the article again.
+    """
+
+    def __init__(self, tool: PolygonTool, tickers: Iterable[str] = (), path: str = NEWS_STATE_PATH,
+                 feed_threshold: int = FEED_THRESHOLD, lookback: timedelta = timedelta(hours=LOOKBACK_HOURS),
+                 max_pages: int = 10, page_size: int = 1000):
+        self.tool = tool
+        self.tickers = {ticker.upper() for ticker in tickers}
+        self.feed_threshold = feed_threshold
+        self.lookback = lookback
+        self.max_pages = max_pages
+        self.page_size = page_size
+        self.subscribers: list[Callable[[dict], None]] = []
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS cursors (stream TEXT PRIMARY KEY, published_utc TEXT, etag TEXT, last_modified TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, published_utc TEXT)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_published ON seen (published_utc)")
+        self._db.commit()
+
+    def watch(self, *tickers: str):
+        with self._lock:
+            self.tickers.update(ticker.upper() for ticker in tickers)
+
+    def unwatch(self, *tickers: str):
+        with self._lock:
+            self.tickers.difference_update(ticker.upper() for ticker in tickers)
+
+    def subscribe(self, subscriber: Callable[[dict], None]) -> Callable[[], None]:
+        """Call subscriber with every new article; returns a function that stops it."""
+        self.subscribers.append(subscriber)
+        return lambda: self.subscribers.remove(subscriber)
+
+    def _cursor(self, stream: str) -> Optional[tuple]:
+        with self._lock:
+            return self._db.execute("SELECT published_utc, etag, last_modified FROM cursors WHERE stream = ?", (stream,)).fetchone()
+
+    def _streams(self) -> list[tuple[str, dict]]:
+        with self._lock:
+            tickers = sorted(self.tickers)
+            cursors = dict(self._db.execute("SELECT stream, published_utc FROM cursors").fetchall())
+        if len(tickers) <= self.feed_threshold:
+            return [(ticker, {"ticker": ticker}) for ticker in tickers]
+        # Newcomers catch up on their own; from then on the feed covers them
+        return [(FEED, {})] + [(ticker, {"ticker": ticker}) for ticker in tickers if ticker not in cursors]
+
+    def _since(self, stream: str, cursor: Optional[tuple]) -> str:
+        since = cursor[0] if cursor else _utc(datetime.now(timezone.utc) - self.lookback)
+        if stream == FEED:
+            # Back to the feed after polling tickers on their own: start from the ticker least far along
+            with self._lock:
+                watched = sorted(self.tickers)
+                row = self._db.execute(f"SELECT MIN(published_utc) FROM cursors WHERE stream IN ({','.join('?' * len(watched))})",
+                                       watched).fetchone()
+            since = max(since, row[0]) if row and row[0] else since
+        return since
+
+    def _request(self, stream: str, params: dict) -> tuple[dict, dict, str]:
+        """Query parameters and conditional headers of a stream's first page, and its cursor."""
+        cursor = self._cursor(stream)
+        since = self._since(stream, cursor)
+        # gte rather than gt: articles published in the same second as the cursor aren't
+        # lost, and the one at the cursor makes the answer repeatable for the validators
+        params = {**params, "published_utc.gte": since, "order": "asc", "sort": "published_utc", "limit": self.page_size}
+        headers = {}
+        if cursor and cursor[0] == since:
+            if cursor[1]:
+                headers["If-None-Match"] = cursor[1]
+            if cursor[2]:
+                headers["If-Modified-Since"] = cursor[2]
+        return params, headers, since
+
+    def _page(self, response: PolygonResponse) -> tuple[list, Optional[str]]:
+        self.stats["requests"] += 1
+        if not response.ok:
+            raise PolygonError(response)
+        page = response.json()
+        return page.get("results") or [], page.get("next_url")
+
+    def _poll_stream(self, stream: str, params: dict) -> list[dict]:
+        params, headers, since = self._request(stream, params)
+        response = self.tool._get(NEWS_PATH, params, headers)
+        if response.status_code == 304:
+            self.stats["requests"] += 1
+            self.stats["not_modified"] += 1
+            return []
+        articles, next_url = self._page(response)
+        for _ in range(self.max_pages - 1):
+            if not next_url:
+                break
+            results, next_url = self._page(self.tool._get(next_url))
+            articles += results
+        return self._accept(stream, since, articles, response)
+
+    async def _apoll_stream(self, stream: str, params: dict) -> list[dict]:
+        params, headers, since = self._request(stream, params)
+        response = await self.tool._aget(NEWS_PATH, params, headers)
+        if response.status_code == 304:
+            self.stats["requests"] += 1
+            self.stats["not_modified"] += 1
+            return []
+        articles, next_url = self._page(response)
+        for _ in range(self.max_pages - 1):
+            if not next_url:
+                break
+            results, next_url = self._page(await self.tool._aget(next_url))
+            articles += results
+        return self._accept(stream, since, articles, response)
+
+    def _accept(self, stream: str, since: str, articles: list[dict], first: PolygonResponse) -> list[dict]:
+        """Record a stream's articles and move its cursor; returns the ones not seen before."""
+        new = []
+        with self._lock, self._db:
+            watched = self.tickers
+            cursors = {}
+            for article in articles:
+                published = article.get("published_utc") or since
+                cursors[stream] = max(cursors.get(stream, since), published)
+                tickers = [ticker for ticker in article.get("tickers") or [] if ticker in watched]
+                if stream == FEED:
+                    # The feed covers every ticker, so it moves their cursors too. A ticker's
+                    # own poll never moves another's: that one may have older news still to come.
+                    for ticker in tickers:
+                        cursors[ticker] = max(cursors.get(ticker, ""), published)
+                if not tickers:
+                    # Market-wide feed: news about tickers nobody watches
+                    continue
+                keys = article_keys(article)
+                placeholders = ",".join("?" * len(keys))
+                if keys and self._db.execute(f"SELECT 1 FROM seen WHERE key IN ({placeholders})", keys).fetchone():
+                    self.stats["duplicates"] += 1
+                    continue
+                self._db.executemany("INSERT OR IGNORE INTO seen VALUES (?, ?)", [(key, published) for key in keys])
+                new.append({**article, "watched": tickers})
+
+            latest = cursors.pop(stream, since)
+            # The validators describe this request; they're only worth sending again while the cursor stays put
+            validators = (first.headers.get("etag"), first.headers.get("last-modified")) if latest == since else (None, None)
+            self._db.execute("INSERT OR REPLACE INTO cursors VALUES (?, ?, ?, ?)", (stream, latest, *validators))
+            for ticker, published in cursors.items():
+                # Moved by the feed: the ticker's own validators no longer apply. Tickers still
+                # to catch up have no cursor yet and get theirs from their own poll.
+                self._db.execute("UPDATE cursors SET published_utc = ?, etag = NULL, last_modified = NULL "
+                                 "WHERE stream = ? AND published_utc < ?", (published, ticker, published))
+        self.stats["articles"] += len(articles)
+        return new
+
+    def _deliver(self, new: list[dict]) -> list[dict]:
+        new.sort(key=lambda article: article.get("published_utc") or "")
+        self.stats["polls"] += 1
+        self.stats["delivered"] += len(new)
+        for article in new:
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber(article)
+                except Exception:
+                    self.stats["subscriber_errors"] += 1
+        self._prune()
+        return new
+
+    def _prune(self):
+        # Seen keys only have to outlast the window the cursors can still return
+        with self._lock, self._db:
+            oldest = self._db.execute("SELECT MIN(published_utc) FROM cursors").fetchone()[0]
+            if oldest:
+                cutoff = _utc(datetime.fromisoformat(oldest.replace("Z", "+00:00")) - timedelta(days=1))
+                self._db.execute("DELETE FROM seen WHERE published_utc < ?", (cutoff,))
+
+    def poll(self) -> list[dict]:
+        """Poll once: new articles, oldest first, after handing them to the subscribers."""
+        new = []
+        # Behind interactive queries for Polygon quota
+        with scope(BATCH):
+            for stream, params in self._streams():
+                try:
+                    new += self._poll_stream(stream, params)
+                except Exception:
+                    # One failing ticker shouldn't hold up the others; it's retried next poll
+                    self.stats["errors"] += 1
+        return self._deliver(new)
+
+    async def apoll(self) -> list[dict]:
+        with scope(BATCH):
+            results = await asyncio.gather(*(self._apoll_stream(stream, params) for stream, params in self._streams()),
+                                           return_exceptions=True)
+        self.stats["errors"] += sum(isinstance(result, BaseException) for result in results)
+        return self._deliver([article for result in results if isinstance(result, list) for article in result])
+
+    def run(self, interval: float = 60.0, stop: Optional[threading.Event] = None):
+        """Poll every interval seconds until stop is set."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            self.poll()
+            stop.wait(interval)
+
+    async def stream(self, interval: float = 60.0) -> AsyncIterator[dict]:
+        """New articles as they're found, polling every interval seconds."""
+        while True:
+            for article in await self.apoll():
+                yield article
+            await asyncio.sleep(interval)
+
+    def stats_dict(self) -> dict:
+        return {"tickers": len(self.tickers), **dict(self.stats)}
+
+    def close(self):
+        self._db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import sys
+
+    from dotenv import load_dotenv
+
+    from tools.polygon.news import TickerNews
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Print new Polygon news for a watchlist as JSONL, polling until interrupted")
+    parser.add_argument("tickers", nargs="*", help="Tickers to watch, e.g. AAPL MSFT")
+    parser.add_argument("-w", "--watchlist", help="File with more tickers, one per line")
+    parser.add_argument("-i", "--interval", type=float, default=60.0, help="Seconds between polls")
+    parser.add_argument("--once", action="store_true", help="Poll once and exit")
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.watchlist:
+        with open(args.watchlist, "r") as file:
+            tickers += [line.strip() for line in file if line.strip() and not line.startswith("#")]
+    if not tickers:
+        parser.error("no tickers to watch")
+
+    watcher = NewsWatcher(TickerNews(api_key=os.getenv("POLYGON_API_KEY")), tickers)
+    fields = ("id", "published_utc", "title", "article_url", "watched")
+    watcher.subscribe(lambda article: print(json.dumps({key: article.get(key) for key in fields}), flush=True))
+    try:
+        if args.once:
+            watcher.poll()
+        else:
+            watcher.run(args.interval)
+    except KeyboardInterrupt:
+        pass
+    print(f"News: {json.dumps(watcher.stats_dict())}", file=sys.stderr)
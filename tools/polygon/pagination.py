@@ -0,0 +1,78 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator, Optional
+
+from tools.polygon.client import PolygonError, PolygonResponse, PolygonTool
+
+
+def _check(response: PolygonResponse) -> dict:
+    if not response.ok:
+        raise PolygonError(response)
+    return response.json()
+
+
+def paginate(tool: PolygonTool, path: str, params: Optional[dict] = None,
+             max_rows: Optional[int] = None, max_bytes: Optional[int] = None) -> Iterator[dict]:
+    """Yield result rows from a Polygon list endpoint, following next_url lazily.
+
+    The next page is fetched in the background while the current one is consumed.
+    Iteration stops once max_rows rows have been yielded or max_bytes of response
+    bodies have been read, so only about two pages are held in memory at a time; pages
+    bypass the response cache, which would otherwise keep every one of them.
+    """
+    rows = 0
+    read = 0
+    executor = ThreadPoolExecutor(max_workers=1)
+    pending = executor.submit(contextvars.copy_context().run, tool._get, path, params, cache=False)
+    try:
+        while pending is not None:
+            response = pending.result()
+            pending = None
+            page = _check(response)
+            read += len(response.content)
+            results = page.get("results") or []
+
+            next_url = page.get("next_url")
+            rows_left = None if max_rows is None else max_rows - rows - len(results)
+            if next_url and (rows_left is None or rows_left > 0) and (max_bytes is None or read < max_bytes):
+                pending = executor.submit(contextvars.copy_context().run, tool._get, next_url, cache=False)
+
+            for row in results:
+                if max_rows is not None and rows >= max_rows:
+                    return
+                rows += 1
+                yield row
+    finally:
+        if pending is not None:
+            pending.cancel()
+        executor.shutdown(wait=False)
+
+
+async def apaginate(tool: PolygonTool, path: str, params: Optional[dict] = None,
+                    max_rows: Optional[int] = None, max_bytes: Optional[int] = None) -> AsyncIterator[dict]:
+    """Async counterpart of paginate, prefetching the next page as a task."""
+    rows = 0
+    read = 0
+    pending = asyncio.ensure_future(tool._aget(path, params, cache=False))
+    try:
+        while pending is not None:
+            response = await pending
+            pending = None
+            page = _check(response)
+            read += len(response.content)
+            results = page.get("results") or []
+
+            next_url = page.get("next_url")
+            rows_left = None if max_rows is None else max_rows - rows - len(results)
+            if next_url and (rows_left is None or rows_left > 0) and (max_bytes is None or read < max_bytes):
+                pending = asyncio.ensure_future(tool._aget(next_url, cache=False))
+
+            for row in results:
+                if max_rows is not None and rows >= max_rows:
+                    return
+                rows += 1
+                yield row
+    finally:
+        if pending is not None:
+            pending.cancel()
@@ -0,0 +1,237 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Requests per minute the Polygon plan allows; 0 leaves requests unlimited
+RATE_LIMIT = float(os.getenv("POLYGON_RATE_LIMIT", "0"))
+# Requests that may go out back to back; defaults to a minute's worth
+BURST = float(os.getenv("POLYGON_RATE_BURST", "0"))
+# Share of the bucket batch work leaves untouched, so interactive queries rarely wait
+RESERVE = float(os.getenv("POLYGON_RATE_RESERVE", "0.2"))
+# SQLite file holding the bucket, shared by every process using the same API key; unset keeps it in memory
+RATE_PATH = os.getenv("POLYGON_RATE_PATH")
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+_priority: ContextVar[str] = ContextVar("polygon_priority", default=INTERACTIVE)
+# time.monotonic() by which a request must have gone out, or None
+_deadline: ContextVar[Optional[float]] = ContextVar("polygon_deadline", default=None)
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+@contextmanager
+def scope(priority: Optional[str] = None, deadline: Optional[float] = None):
+    """Polygon requests made inside run at `priority`, and fail rather than wait for quota
+    past `deadline` seconds from now."""
+    tokens = []
+    if priority is not None:
+        tokens.append((_priority, _priority.set(priority)))
+    if deadline is not None:
+        tokens.append((_deadline, _deadline.set(time.monotonic() + deadline)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class RateLimited(Exception):
+    """No request quota would free up before the caller's deadline."""
+
+    def __init__(self, priority: str, wait: float):
+        super().__init__(f"Polygon rate limit: next {priority} request slot is {wait:.1f}s away, past the deadline")
+        self.priority = priority
+        self.wait = wait
+
+
+class TokenBucket:
+    """Token bucket every Polygon request draws from, with interactive requests first.
+
+    Tokens refill at the plan's per-minute rate up to `burst`. Interactive requests take
+    any token; batch requests (batch mode, index syncs) only take tokens above the
+    reserve, and none while an interactive request in this process is waiting, so
+    background work soaks up spare quota without delaying users. A request that
+    couldn't go out before its deadline fails immediately instead of waiting to.
+
+    With `path`, the bucket lives in a SQLite file and is shared across processes.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None, reserve: float = RESERVE,
+                 path: Optional[str] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst or max(rate_per_minute, 1.0))
+        if self.capacity < 1:
+            raise ValueError(f"Rate-limit burst must allow at least one request, got {burst}")
+        # Batch requests still need a whole token to go out, however small the bucket
+        self.reserve = min(reserve * self.capacity, self.capacity - 1.0)
+        self.path = path
+        self._lock = threading.Lock()
+        self._waiting = Counter()
+        self.stats = {priority: Counter() for priority in PRIORITIES}
+        self.max_wait = dict.fromkeys(PRIORITIES, 0.0)
+        if path:
+            # Wall clock: monotonic clocks aren't comparable between processes
+            self._clock = time.time
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS bucket (id INTEGER PRIMARY KEY CHECK (id = 0), tokens REAL, updated REAL)")
+            self._db.execute("INSERT OR IGNORE INTO bucket VALUES (0, ?, ?)", (self.capacity, self._clock()))
+        else:
+            self._clock = time.monotonic
+            self._db = None
+            self._tokens, self._updated = self.capacity, self._clock()
+
+    def _update(self, change):
+        """Refill the bucket, apply change(tokens) -> (tokens, result) atomically and return result."""
+        with self._lock:
+            now = self._clock()
+            if self._db is None:
+                tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._tokens, result = change(tokens)
+                self._updated = now
+                return result
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                stored, updated = self._db.execute("SELECT tokens, updated FROM bucket WHERE id = 0").fetchone()
+                tokens, result = change(min(self.capacity, stored + max(now - updated, 0.0) * self.rate))
+                self._db.execute("UPDATE bucket SET tokens = ?, updated = ? WHERE id = 0", (tokens, now))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return result
+
+    def _take(self, priority: str) -> float:
+        """Take a token if `priority` may have one now (0.0), else the seconds until it could."""
+        need = 1.0
+        if priority == BATCH:
+            need = min(need + self.reserve + self._waiting[INTERACTIVE], self.capacity)
+
+        def change(tokens: float):
+            if tokens >= need:
+                return tokens - 1.0, 0.0
+            return tokens, (need - tokens) / self.rate
+
+        return self._update(change)
+
+    def tokens(self) -> float:
+        return self._update(lambda tokens: (tokens, tokens))
+
+    def drain(self):
+        """Empty the bucket, e.g. after a 429: the server says this window's quota is gone."""
+        self._update(lambda tokens: (min(tokens, 0.0), None))
+
+    def _check_deadline(self, priority: str, deadline: Optional[float], wait: float):
+        # Fail now rather than sleep only to miss the deadline anyway
+        if deadline is not None and time.monotonic() + wait > deadline:
+            with self._lock:
+                self.stats[priority]["rejected"] += 1
+            raise RateLimited(priority, wait)
+
+    def _record(self, priority: str, waited: float):
+        with self._lock:
+            stats = self.stats[priority]
+            stats["requests"] += 1
+            if waited > 0:
+                stats["waited"] += 1
+                stats["wait_seconds"] += waited
+                self.max_wait[priority] = max(self.max_wait[priority], waited)
+
+    def acquire(self, priority: Optional[str] = None, deadline: Optional[float] = None) -> float:
+        """Block until a request may go out; returns the seconds spent waiting."""
+        priority = priority or _priority.get()
+        deadline = _deadline.get() if deadline is None else deadline
+        started = time.monotonic()
+        queued = False
+        try:
+            while True:
+                wait = self._take(priority)
+                if not wait:
+                    waited = time.monotonic() - started if queued else 0.0
+                    self._record(priority, waited)
+                    return waited
+                self._check_deadline(priority, deadline, wait)
+                if not queued:
+                    queued = True
+                    with self._lock:
+                        self._waiting[priority] += 1
+                time.sleep(wait)
+        finally:
+            if queued:
+                with self._lock:
+                    self._waiting[priority] -= 1
+
+    async def aacquire(self, priority: Optional[str] = None, deadline: Optional[float] = None) -> float:
+        priority = priority or _priority.get()
+        deadline = _deadline.get() if deadline is None else deadline
+        started = time.monotonic()
+        queued = False
+        try:
+            while True:
+                wait = self._take(priority)
+                if not wait:
+                    waited = time.monotonic() - started if queued else 0.0
+                    self._record(priority, waited)
+                    return waited
+                self._check_deadline(priority, deadline, wait)
+                if not queued:
+                    queued = True
+                    with self._lock:
+                        self._waiting[priority] += 1
+                await asyncio.sleep(wait)
+        finally:
+            if queued:
+                with self._lock:
+                    self._waiting[priority] -= 1
+
+    def stats_dict(self) -> dict:
+        with self._lock:
+            stats = {
+                priority: {**counts, "wait_seconds": round(counts["wait_seconds"], 3),
+                           "max_wait": round(self.max_wait[priority], 3), "waiting": self._waiting[priority]}
+                for priority, counts in self.stats.items()
+            }
+        return {"rate_per_minute": self.rate * 60, "capacity": self.capacity, "tokens": round(self.tokens(), 2), **stats}
+
+    def prometheus(self) -> str:
+        stats = self.stats_dict()
+        lines = [
+            "# HELP polygon_rate_tokens Request tokens left in the Polygon rate-limit bucket.",
+            "# TYPE polygon_rate_tokens gauge",
+            f"polygon_rate_tokens {stats['tokens']}",
+        ]
+        for name, key, help in (
+            ("polygon_rate_requests_total", "requests", "Polygon requests let through, by priority."),
+            ("polygon_rate_waited_total", "waited", "Polygon requests that queued for quota, by priority."),
+            ("polygon_rate_wait_seconds_total", "wait_seconds", "Time Polygon requests spent queued for quota."),
+            ("polygon_rate_rejected_total", "rejected", "Polygon requests failed for want of quota before their deadline."),
+        ):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} counter"]
+            lines += [f'{name}{{priority="{priority}"}} {stats[priority].get(key, 0)}' for priority in PRIORITIES]
+        return "\n".join(lines) + "\n"
+
+
+def get_limiter() -> Optional[TokenBucket]:
+    """The process-wide bucket from POLYGON_RATE_* settings, or None when no limit is set."""
+    global _limiter
+    if _limiter is None and RATE_LIMIT > 0:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = TokenBucket(RATE_LIMIT, BURST or None, RESERVE, RATE_PATH)
+    return _limiter
+
+
+def set_limiter(limiter: Optional[TokenBucket]):
+    """Replace the process-wide bucket, e.g. with one built from command-line settings."""
+    global _limiter
+    _limiter = limiter
@@ -0,0 +1,52 @@
+import os
+from typing import Any
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from tools.polygon.client import PolygonError, PolygonTool
+from tools.polygon.coalesce import Batcher
+
+# Takes a comma-separated tickers list, so lookups made together cost one request
+SNAPSHOT_PATH = "/v2/snapshot/locale/us/markets/stocks/tickers"
+
+class ToolInputSchema(BaseModel):
+    ticker: str = Field(..., description="The stock ticker symbol to quote, e.g. AAPL", pattern="^[A-Z.]+$", min_length=1, max_length=6)
+
+class TickerSnapshot(PolygonTool):
+    name: str = "ticker_snapshot"
+    description: str = "Price quote for a stock ticker: last trade price, today's change and trading volume"
+    args_schema: type[BaseModel] = ToolInputSchema
+
+    # Snapshots of several tickers asked for at once (comparisons, concurrent sessions) are fetched together
+    _batcher: Any = PrivateAttr(default=None)
+
+    def model_post_init(self, context: Any):
+        self._batcher = Batcher(self.name, self._fetch_many, self._afetch_many)
+
+    def _fetch_many(self, tickers: list[str]) -> dict:
+        return self._by_ticker(self._get(SNAPSHOT_PATH, params={"tickers": ",".join(sorted(tickers))}))
+
+    async def _afetch_many(self, tickers: list[str]) -> dict:
+        return self._by_ticker(await self._aget(SNAPSHOT_PATH, params={"tickers": ",".join(sorted(tickers))}))
+
+    def _by_ticker(self, response) -> dict:
+        if not response.ok:
+            raise PolygonError(response)
+        return {row["ticker"]: row for row in response.json().get("tickers") or []}
+
+    def _run(self, ticker: str):
+        return self._handle(ticker, self._batcher.get(ticker))
+
+    async def _arun(self, ticker: str):
+        return self._handle(ticker, await self._batcher.aget(ticker))
+
+    def _handle(self, ticker: str, snapshot):
+        # Shaped like the single-ticker snapshot endpoint's response
+        if snapshot is None:
+            return {"status": "NOT_FOUND", "error": f"No snapshot for {ticker}"}
+        return {"status": "OK", "ticker": snapshot}
+
+if __name__ == "__main__":
+    api_key = os.getenv("POLYGON_API_KEY")
+    tool = TickerSnapshot(api_key=api_key)
+    print(tool.invoke({"ticker": "AAPL"}))
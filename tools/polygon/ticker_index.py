@@ -0,0 +1,219 @@
+import os
+import re
+import sqlite3
+import threading
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Optional
+
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+
+from tools.polygon.client import PolygonTool
+from tools.polygon.pagination import paginate
+from tools.polygon.ratelimit import BATCH, scope
+
+INDEX_PATH = os.getenv("TICKER_INDEX_PATH", ".cache/tickers.sqlite")
+
+# Corporate boilerplate that users never type ("Apple" rather than "Apple Inc.")
+NAME_NOISE = re.compile(
+    r"\b(inc|incorporated|corp|corporation|co|company|ltd|limited|plc|sa|nv|ag|llc|lp|"
+    r"holdings?|group|class [a-z]|common stock|ordinary shares|american depositary shares)\b"
+)
+
+
+def normalize_name(name: str) -> str:
+    name = name.lower().replace("&", " and ")
+    name = re.sub(r"[^a-z0-9 ]", " ", name)
+    name = NAME_NOISE.sub(" ", name)
+    return " ".join(name.split())
+
+
+class TickerIndex:
+    """Local SQLite index of Polygon tickers for exact, prefix and fuzzy company-name lookups.
+
+    Names are indexed in an FTS5 trigram table, so prefix and fuzzy lookups only
+    rescore a few dozen candidates instead of scanning every listed company.
+    """
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS tickers (
+                ticker TEXT PRIMARY KEY, name TEXT, norm_name TEXT, market TEXT, type TEXT,
+                primary_exchange TEXT, active INTEGER, last_updated_utc TEXT);
+            CREATE INDEX IF NOT EXISTS tickers_norm_name ON tickers (norm_name);
+            CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5 (ticker UNINDEXED, norm_name, tokenize='trigram');
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM tickers").fetchone()[0]
+
+    def upsert(self, rows) -> int:
+        count = 0
+        with self._lock, self._db:
+            for row in rows:
+                ticker = row["ticker"]
+                norm_name = normalize_name(row.get("name") or "")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO tickers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (ticker, row.get("name"), norm_name, row.get("market"), row.get("type"),
+                     row.get("primary_exchange"), int(row.get("active", True)), row.get("last_updated_utc")),
+                )
+                self._db.execute("DELETE FROM names WHERE ticker = ?", (ticker,))
+                self._db.execute("INSERT INTO names VALUES (?, ?)", (ticker, norm_name))
+                count += 1
+        return count
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def exact(self, query: str) -> list[dict]:
+        rows = self._db.execute(
+            "SELECT * FROM tickers WHERE ticker = ? OR norm_name = ? ORDER BY active DESC, ticker = ? DESC",
+            (query.upper(), normalize_name(query), query.upper()),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def prefix(self, query: str, limit: int = 5) -> list[dict]:
+        norm = normalize_name(query)
+        if len(norm) < 3:
+            # Trigram tables can't serve shorter patterns
+            rows = self._db.execute(
+                "SELECT * FROM tickers WHERE norm_name LIKE ? ORDER BY active DESC, length(norm_name) LIMIT ?",
+                (norm + "%", limit),
+            ).fetchall()
+        else:
+            rows = self._db.execute(
+                "SELECT t.* FROM names n JOIN tickers t ON t.ticker = n.ticker "
+                "WHERE n.norm_name LIKE ? ORDER BY t.active DESC, length(t.norm_name) LIMIT ?",
+                (norm + "%", limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def fuzzy(self, query: str, limit: int = 5, cutoff: float = 0.6) -> list[dict]:
+        norm = normalize_name(query)
+        trigrams = {norm[i:i + 3] for i in range(len(norm) - 2)}
+        if not trigrams:
+            return []
+        match = " OR ".join('"' + t.replace('"', '""') + '"' for t in trigrams)
+        rows = self._db.execute(
+            "SELECT t.* FROM names n JOIN tickers t ON t.ticker = n.ticker "
+            "WHERE names MATCH ? ORDER BY bm25(names) LIMIT 50",
+            (match,),
+        ).fetchall()
+        scored = [(SequenceMatcher(None, norm, row["norm_name"]).ratio(), dict(row)) for row in rows]
+        scored = [item for item in scored if item[0] >= cutoff]
+        scored.sort(key=lambda item: (-item[0], -item[1]["active"]))
+        return [dict(row, score=round(score, 3)) for score, row in scored[:limit]]
+
+    def search(self, query: str, limit: int = 5) -> list[dict]:
+        """Exact matches first, then prefix, then fuzzy; each result is tagged with how it matched."""
+        matches = [("exact", row) for row in self.exact(query)]
+        matches += [("prefix", row) for row in self.prefix(query, limit)]
+        if not matches:
+            matches = [("fuzzy", row) for row in self.fuzzy(query, limit)]
+        results, seen = [], set()
+        for match, row in matches:
+            if row["ticker"] not in seen:
+                seen.add(row["ticker"])
+                results.append(dict(row, match=match))
+        return results[:limit]
+
+    def resolve(self, query: str) -> Optional[str]:
+        """The single ticker a symbol or company name refers to, or None when unknown or ambiguous."""
+        exact = [row for row in self.exact(query) if row["active"]]
+        if exact:
+            return exact[0]["ticker"]
+        candidates = [row for row in self.prefix(query, limit=2) if row["active"]]
+        if len(candidates) == 1:
+            return candidates[0]["ticker"]
+        candidates = self.fuzzy(query, limit=2, cutoff=0.8)
+        if len(candidates) == 1 or (len(candidates) > 1 and candidates[0]["score"] > candidates[1]["score"]):
+            return candidates[0]["ticker"]
+        return None
+
+    def normalize_ticker(self, value: str) -> str:
+        """Map a (possibly wrong) ticker argument to a known symbol, leaving it alone when unsure."""
+        if self._db.execute("SELECT 1 FROM tickers WHERE ticker = ?", (value.upper(),)).fetchone():
+            return value.upper()
+        return self.resolve(value) or value
+
+    def sync(self, tool: PolygonTool, market: str = "stocks", full: bool = False) -> int:
+        """Page /v3/reference/tickers into the index.
+
+        Incremental runs walk results newest-first by last_updated_utc and stop at the
+        previous watermark; delisted tickers are picked up the same way via active=false.
+        """
+        watermark = None if full else self.get_meta(f"watermark:{market}")
+        newest = watermark
+        count = 0
+        for active in (True, False):
+            params = {"market": market, "active": active, "limit": 1000,
+                      "sort": "last_updated_utc", "order": "desc"}
+            batch = []
+            for row in paginate(tool, "/v3/reference/tickers", params):
+                updated = row.get("last_updated_utc")
+                if watermark and updated and updated <= watermark:
+                    break
+                if updated and (newest is None or updated > newest):
+                    newest = updated
+                batch.append(row)
+                if len(batch) >= 1000:
+                    count += self.upsert(batch)
+                    batch = []
+            count += self.upsert(batch)
+        if newest:
+            self.set_meta(f"watermark:{market}", newest)
+        return count
+
+
+@lru_cache(maxsize=None)
+def get_index(path: str = INDEX_PATH) -> TickerIndex:
+    """Shared index per path; connections are safe to use across threads."""
+    return TickerIndex(path)
+
+
+class ToolInputSchema(BaseModel):
+    query: str = Field(..., description="A company name or ticker symbol to look up, e.g. Apple or AAPL")
+
+class TickerLookup(PolygonTool):
+    name: str = "ticker_lookup"
+    description: str = "Find the stock ticker symbol for a company name using a local index of listed companies"
+    args_schema: type[BaseModel] = ToolInputSchema
+    index_path: str = Field(INDEX_PATH, exclude=True)
+
+    def _run(self, query: str):
+        index = get_index(self.index_path)
+        return [
+            {"ticker": row["ticker"], "name": row["name"], "market": row["market"], "match": row["match"]}
+            for row in index.search(query)
+        ]
+
+    def sync(self, market: str = "stocks", full: bool = False) -> int:
+        # A backfill: it gets the Polygon quota interactive lookups leave spare
+        with scope(BATCH):
+            return get_index(self.index_path).sync(self, market=market, full=full)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Sync the local ticker index from Polygon")
+    parser.add_argument("--market", default="stocks")
+    parser.add_argument("--full", action="store_true", help="Re-page every ticker instead of only updated ones")
+    args = parser.parse_args()
+
+    tool = TickerLookup(api_key=os.getenv("POLYGON_API_KEY"))
+    print(f"Synced {tool.sync(market=args.market, full=args.full)} tickers into {tool.index_path}")
@@ -0,0 +1,177 @@
+import ast
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+from typing import Optional
+
+from langchain.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Hand-written tools, then directories the generators write into
+TOOL_DIRS = os.getenv("TOOL_DIRS", "tools,tool-generator").split(",")
+MANIFEST_PATH = os.getenv("TOOL_MANIFEST_PATH", os.path.join(ROOT, ".cache", "tool_manifest.json"))
+
+# Classes deriving from these (by name) are candidate tools
+TOOL_BASES = {"BaseTool", "PolygonTool"}
+
+API_KEY_ENV = "POLYGON_API_KEY"
+
+
+def _defines_tool(path: str) -> bool:
+    """Cheap pre-filter: parse (don't import) the file and look for a tool subclass."""
+    try:
+        with open(path, "r") as file:
+            tree = ast.parse(file.read(), filename=path)
+    except (SyntaxError, UnicodeDecodeError):
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            for base in node.bases:
+                name = base.id if isinstance(base, ast.Name) else getattr(base, "attr", None)
+                if name in TOOL_BASES:
+                    return True
+    return False
+
+
+def _module_name(path: str) -> str:
+    parts = os.path.splitext(os.path.relpath(path, ROOT))[0].split(os.sep)
+    if all(part.isidentifier() for part in parts):
+        return ".".join(parts)
+    # Generator output dirs like tool-generator/ aren't packages
+    return "generated_tools." + "_".join(part.replace("-", "_") for part in parts)
+
+
+def _import(module: str, path: str):
+    if module in sys.modules:
+        return sys.modules[module]
+    if not module.startswith("generated_tools."):
+        return importlib.import_module(module)
+    spec = importlib.util.spec_from_file_location(module, path)
+    loaded = importlib.util.module_from_spec(spec)
+    sys.modules[module] = loaded
+    spec.loader.exec_module(loaded)
+    return loaded
+
+
+def _describe(module, path: str) -> list[dict]:
+    entries = []
+    for attr in vars(module).values():
+        if not (isinstance(attr, type) and issubclass(attr, BaseTool) and attr.__module__ == module.__name__):
+            continue
+        name_field = attr.model_fields.get("name")
+        if name_field is None or not isinstance(name_field.default, str):
+            # Abstract bases such as PolygonTool don't name a tool
+            continue
+        needs_key = "api_key" in attr.model_fields
+        instance = attr(api_key="") if needs_key else attr()
+        entries.append({
+            "name": instance.name,
+            "module": module.__name__,
+            "path": os.path.relpath(path, ROOT),
+            "class": attr.__name__,
+            "api_key_env": API_KEY_ENV if needs_key else None,
+            "spec": convert_to_openai_tool(instance),
+        })
+    return entries
+
+
+class ToolRegistry:
+    """Discovers tools under the tool directories and loads them on first use.
+
+    Names, schemas and module paths are kept in a manifest on disk, fingerprinted by
+    file mtime and size, so startup only imports modules that changed since the last
+    run. A tool's module is imported, and the tool instantiated, the first time it's
+    requested; instances are shared from then on.
+    """
+
+    def __init__(self, dirs: Optional[list[str]] = None, manifest_path: str = MANIFEST_PATH):
+        self.dirs = dirs or TOOL_DIRS
+        self.manifest_path = manifest_path
+        self._instances = {}
+        self._lock = threading.Lock()
+        self.entries = self._load_manifest()
+
+    def _candidate_files(self) -> list[str]:
+        files = []
+        for directory in self.dirs:
+            for base, subdirs, names in os.walk(os.path.join(ROOT, directory)):
+                subdirs[:] = sorted(d for d in subdirs if not d.startswith((".", "__")))
+                files += [os.path.join(base, name) for name in sorted(names) if name.endswith(".py")]
+        return files
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r") as file:
+                cached = json.load(file)
+        except (OSError, ValueError):
+            cached = {}
+
+        files, changed = {}, False
+        for path in self._candidate_files():
+            rel = os.path.relpath(path, ROOT)
+            stat = os.stat(path)
+            fingerprint = [stat.st_mtime_ns, stat.st_size]
+            previous = cached.get(rel)
+            if previous and previous["fingerprint"] == fingerprint:
+                files[rel] = previous
+                continue
+            changed = True
+            module = _module_name(path)
+            try:
+                tools = _describe(_import(module, path), path) if _defines_tool(path) else []
+            except Exception:
+                if not module.startswith("generated_tools."):
+                    raise
+                # A broken generated tool shouldn't keep the rest from loading
+                sys.modules.pop(module, None)
+                tools = []
+            files[rel] = {"fingerprint": fingerprint, "tools": tools}
+        changed = changed or set(files) != set(cached)
+
+        if changed:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            with open(self.manifest_path, "w") as file:
+                json.dump(files, file, indent=1)
+
+        entries = {}
+        for rel in files:
+            for entry in files[rel]["tools"]:
+                entries.setdefault(entry["name"], entry)
+        return entries
+
+    def names(self) -> list[str]:
+        return list(self.entries)
+
+    def spec(self, name: str) -> dict:
+        return self.entries[name]["spec"]
+
+    def specs(self) -> list[dict]:
+        return [entry["spec"] for entry in self.entries.values()]
+
+    def get(self, name: str) -> Optional[BaseTool]:
+        """The shared tool instance, importing its module on first use; None for unknown names."""
+        if name in self._instances:
+            return self._instances[name]
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        with self._lock:
+            if name not in self._instances:
+                module = _import(entry["module"], os.path.join(ROOT, entry["path"]))
+                cls = getattr(module, entry["class"])
+                if entry["api_key_env"]:
+                    self._instances[name] = cls(api_key=os.getenv(entry["api_key_env"], ""))
+                else:
+                    self._instances[name] = cls()
+        return self._instances[name]
+
+
+if __name__ == "__main__":
+    registry = ToolRegistry()
+    for entry in registry.entries.values():
+        print(f"{entry['name']:<20} {entry['path']}")
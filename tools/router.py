@@ -0,0 +1,138 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Optional
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "could", "did", "do", "for", "from", "get",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "please", "provide", "show", "that",
+    "the", "this", "to", "was", "what", "whats", "which", "with", "you", "your",
+}
+
+# Expected tools for the numbered use cases in user_queries_examples.txt. Cases whose
+# tools aren't in the catalog yet are reported as uncovered rather than counted as misses.
+EVAL_LABELS = {
+    1: ["ticker_news"],
+    2: ["ticker_snapshot"],
+    3: ["date_offset", "ticker_aggregates"],
+    5: ["ticker_snapshot"],
+    6: ["ticker_analytics"],
+    8: ["ticker_analytics"],
+    9: ["ticker_analytics"],
+    10: ["ticker_analytics"],
+}
+
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "user_queries_examples.txt")
+
+
+def stem(token: str) -> str:
+    for suffix, replacement in (("ies", "y"), ("ied", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", "")):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)] + replacement
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    words = re.findall(r"[a-z0-9]+", text.lower().replace("_", " "))
+    return [stem(word) for word in words if word not in STOPWORDS]
+
+
+def tool_spec(tool) -> dict:
+    """OpenAI-style function spec for a tool object or an already converted spec."""
+    spec = tool if isinstance(tool, dict) else convert_to_openai_tool(tool)
+    return spec.get("function", spec)
+
+
+def tool_document(spec: dict) -> str:
+    parts = [spec["name"], spec.get("description", "")]
+    for arg, schema in spec.get("parameters", {}).get("properties", {}).items():
+        parts += [arg, schema.get("description", "")]
+    return " ".join(parts)
+
+
+class ToolRouter:
+    """Ranks tools against a query with BM25 over their names, descriptions and argument docs.
+
+    Only the top-k tools get bound to the model, so the tool-schema part of the prompt
+    stays the same size however large the catalog grows.
+    """
+
+    def __init__(self, tools: list, k1: float = 1.5, b: float = 0.75, always: Optional[list[str]] = None):
+        self.k1 = k1
+        self.b = b
+        self.always = always or []
+        self.tools = {tool_spec(tool)["name"]: tool for tool in tools}
+        self._docs = {name: Counter(tokenize(tool_document(tool_spec(tool)))) for name, tool in self.tools.items()}
+        self._lengths = {name: sum(doc.values()) for name, doc in self._docs.items()}
+        self._avg_length = sum(self._lengths.values()) / max(len(self._docs), 1)
+        frequencies = Counter(term for doc in self._docs.values() for term in doc)
+        n = len(self._docs)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in frequencies.items()}
+
+    def rank(self, query: str) -> list[tuple[str, float]]:
+        terms = [term for term in tokenize(query) if term in self._idf]
+        scores = {}
+        for name, doc in self._docs.items():
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[name] / self._avg_length)
+            scores[name] = sum(
+                self._idf[term] * doc[term] * (self.k1 + 1) / (doc[term] + norm)
+                for term in terms if term in doc
+            )
+        return sorted(scores.items(), key=lambda item: -item[1])
+
+    def select_names(self, query: str, k: int = 3) -> list[str]:
+        names = [name for name, score in self.rank(query)[:k] if score > 0]
+        return names + [name for name in self.always if name in self.tools and name not in names]
+
+    def select(self, query: str, k: int = 3) -> list:
+        return [self.tools[name] for name in self.select_names(query, k)]
+
+    def recall(self, cases: list[tuple[str, list[str]]], k: int = 3) -> dict:
+        """Recall@k of the expected tools over labelled (query, tools) cases."""
+        covered = [(query, expected) for query, expected in cases if all(name in self.tools for name in expected)]
+        misses = []
+        found = total = schema_chars = 0
+        for query, expected in covered:
+            selected = set(self.select_names(query, k))
+            schema_chars += sum(len(json.dumps(tool_spec(self.tools[name]))) for name in selected)
+            hit = [name for name in expected if name in selected]
+            found += len(hit)
+            total += len(expected)
+            if len(hit) < len(expected):
+                misses.append({"query": query, "expected": expected, "selected": sorted(selected)})
+        return {
+            "k": k,
+            "recall": found / total if total else 0.0,
+            "cases": len(covered),
+            "uncovered": len(cases) - len(covered),
+            # Size of the bound tool schemas, per query vs. binding the whole catalog
+            "avg_schema_chars": schema_chars / len(covered) if covered else 0,
+            "catalog_schema_chars": sum(len(json.dumps(tool_spec(tool))) for tool in self.tools.values()),
+            "misses": misses,
+        }
+
+
+def load_eval_cases(path: str = QUERIES_PATH, labels: dict = EVAL_LABELS) -> list[tuple[str, list[str]]]:
+    cases = []
+    with open(path, "r") as file:
+        for line in file:
+            match = re.match(r"\s*(\d+)\.\s+(.*\S)", line)
+            if match and int(match.group(1)) in labels:
+                cases.append((match.group(2), labels[int(match.group(1))]))
+    return cases
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tools.registry import ToolRegistry
+
+    parser = argparse.ArgumentParser(description="Report tool-router recall on user_queries_examples.txt")
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    print(json.dumps(ToolRouter(ToolRegistry().specs()).recall(load_eval_cases(), k=args.k), indent=2))
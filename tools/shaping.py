@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import os
+from typing import Any, Optional
+
+# Rough budget for a single tool result in the synthesis prompt
+TOKEN_BUDGET = int(os.getenv("TOOL_OUTPUT_TOKENS", "800"))
+
+# Per-tool projections: where the rows live in the response and which (dotted) fields to keep
+PROJECTIONS = {
+    "ticker_news": ("results.events", ["date", "type", "ticker_change.ticker"]),
+    "dividends_v3": ("results", ["ticker", "ex_dividend_date", "pay_date", "cash_amount", "currency", "frequency", "dividend_type"]),
+    "ticker_reference": ("results", ["ticker", "name", "market", "primary_exchange", "type", "market_cap", "list_date", "description"]),
+    "polygon_tickers": ("results", ["ticker", "name", "market", "type", "primary_exchange", "active"]),
+    "ticker_lookup": (None, ["ticker", "name", "market", "match"]),
+    "ticker_aggregates": ("results", ["date", "open", "high", "low", "close", "volume"]),
+    "ticker_snapshot": ("ticker", ["ticker", "lastTrade.p", "todaysChange", "todaysChangePerc", "day.o", "day.h", "day.l", "day.c", "day.v", "prevDay.c"]),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for English text and JSON
+    return (len(text) + 3) // 4
+
+
+def _decode(output: Any) -> Any:
+    if isinstance(output, (bytes, bytearray)):
+        output = output.decode("utf-8", errors="replace")
+    if isinstance(output, str):
+        try:
+            return json.loads(output)
+        except ValueError:
+            return output
+    return output
+
+
+def _lookup(data: Any, path: Optional[str]) -> Any:
+    for key in (path.split(".") if path else []):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _flatten(data: Any, prefix: str = "") -> dict:
+    if isinstance(data, dict):
+        flat = {}
+        for key, value in data.items():
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        return flat
+    if isinstance(data, list):
+        return {prefix[:-1]: json.dumps(data, separators=(",", ":"))}
+    return {prefix[:-1]: data}
+
+
+def _table(rows: list, fields: Optional[list[str]]) -> tuple[list[str], list[tuple]]:
+    """Project rows onto fields (all scalar fields when None) and drop duplicate rows."""
+    flat_rows = [_flatten(row) if isinstance(row, dict) else {"value": row} for row in rows]
+    if fields is None:
+        fields = []
+        for row in flat_rows:
+            fields += [key for key in row if key not in fields]
+    seen, projected = set(), []
+    for row in flat_rows:
+        values = tuple(row.get(field) for field in fields)
+        if values not in seen and any(value is not None for value in values):
+            seen.add(values)
+            projected.append(values)
+    # Columns that are empty in every row only cost tokens
+    keep = [i for i in range(len(fields)) if any(values[i] not in (None, "") for values in projected)]
+    return [fields[i] for i in keep], [tuple(values[i] for i in keep) for values in projected]
+
+
+def _csv(header: list[str], rows: list[tuple]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(["" if value is None else value for value in row] for row in rows)
+    return buffer.getvalue().rstrip("\n")
+
+
+def _fit_rows(header: list[str], rows: list[tuple], budget: int) -> str:
+    text = _csv(header, rows)
+    if estimate_tokens(text) <= budget:
+        return text
+    # Binary search for the longest row prefix that fits together with the marker
+    low, high = 0, len(rows)
+    while low < high:
+        mid = (low + high + 1) // 2
+        candidate = _csv(header, rows[:mid]) + f"\n... [truncated: {len(rows) - mid} of {len(rows)} rows omitted]"
+        if estimate_tokens(candidate) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return _csv(header, rows[:low]) + f"\n... [truncated: {len(rows) - low} of {len(rows)} rows omitted]"
+
+
+def _fit_text(text: str, budget: int) -> str:
+    if estimate_tokens(text) <= budget:
+        return text
+    marker = f" ... [truncated: {len(text)} chars total]"
+    return text[:max(budget * 4 - len(marker), 0)] + marker
+
+
+def shape_output(tool_name: str, output: Any, budget: int = TOKEN_BUDGET) -> str:
+    """Compact a raw tool result for the model: keep relevant fields, render rows as CSV, fit the budget."""
+    data = _decode(output)
+    if not isinstance(data, (dict, list)):
+        return _fit_text(str(data), budget)
+
+    path, fields = PROJECTIONS.get(tool_name, ("results" if isinstance(data, dict) else None, None))
+    rows = _lookup(data, path)
+    if isinstance(rows, dict) and path:
+        # Single-record endpoints, e.g. ticker details
+        rows = [rows]
+    if isinstance(rows, list) and rows:
+        header, table = _table(rows, fields)
+        if table:
+            return _fit_rows(header, table, budget)
+    if isinstance(data, dict) and data.get("error"):
+        return _fit_text(f"error: {data['error']}", budget)
+
+    if not isinstance(data, dict):
+        return _fit_text(json.dumps(data, separators=(",", ":")), budget)
+    flat = _flatten(data)
+    text = "\n".join(f"{key}={value}" for key, value in flat.items() if value not in (None, ""))
+    return _fit_text(text, budget)
@@ -14,7 +14,7 @@ class ToolInputSchema(BaseModel):
 
 class CurrentTimeTool(BaseTool):
     name: str = "current_time"
-    description: str = "Get the current time in UTC"
+    description: str = "Get the current date and time in UTC. Needed for relative dates like today, N days ago, or the past week, month or year"
     args_schema: type[BaseModel] = ToolInputSchema
 
     def _run(self, dummy: Optional[str] = None) -> str:
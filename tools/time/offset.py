@@ -0,0 +1,38 @@
+import calendar
+from datetime import datetime, timedelta
+from typing import Optional
+
+from langchain.tools import BaseTool
+from pydantic import BaseModel, Field
+
+
+class ToolInputSchema(BaseModel):
+    date: Optional[str] = Field(None, description="Date to start from with the format YYYY-MM-DD; defaults to today", pattern=r"^\d{4}-\d{2}-\d{2}$")
+    days: int = Field(0, description="Days to add; negative for the past, e.g. -4 for 4 days ago")
+    weeks: int = Field(0, description="Weeks to add; negative for the past")
+    months: int = Field(0, description="Months to add; negative for the past")
+    years: int = Field(0, description="Years to add; negative for the past, e.g. -1 for a year ago")
+
+    class Config:
+        extra = "forbid"
+
+class DateOffsetTool(BaseTool):
+    name: str = "date_offset"
+    description: str = "Compute a date relative to today or another date, e.g. 4 days ago, a week ago or a year ago, with the last weekday on or before it"
+    args_schema: type[BaseModel] = ToolInputSchema
+
+    def _run(self, date: Optional[str] = None, days: int = 0, weeks: int = 0, months: int = 0, years: int = 0) -> dict:
+        start = datetime.strptime(date, "%Y-%m-%d").date() if date else datetime.utcnow().date()
+        month = start.month - 1 + months + 12 * years
+        year, month = start.year + month // 12, month % 12 + 1
+        # Jan 31 plus a month is the last day of February
+        result = start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+        result += timedelta(days=days, weeks=weeks)
+        # Markets are closed on weekends; prices for a Saturday are Friday's
+        weekday = result - timedelta(days=max(result.weekday() - 4, 0))
+        return {"date": result.isoformat(), "weekday": result.strftime("%A"), "last_weekday": weekday.isoformat()}
+
+if __name__ == "__main__":
+    tool = DateOffsetTool()
+    print(tool.invoke({"days": -4}))
+    print(tool.invoke({"date": "2024-03-31", "months": -1}))